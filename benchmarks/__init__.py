@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# chip8 配下のモジュールは `import screen` のようにお互いを参照しているので
+# pytest の pythonpath 設定と同じく chip8 ディレクトリをパスに追加しておく
+_CHIP8_DIR = str(Path(__file__).resolve().parent.parent / "chip8")
+if _CHIP8_DIR not in sys.path:
+    sys.path.insert(0, _CHIP8_DIR)
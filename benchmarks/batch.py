@@ -0,0 +1,47 @@
+"""
+複数台の同時実行のベンチマーク。
+
+Chip8CPU を count 台並べて1台ずつ execute_instruction を呼ぶ方式と、
+BatchCPU.step で全台をまとめて1命令ずつ進める方式を同じワークロードで比較する。
+
+    python -m benchmarks.batch
+"""
+
+import time
+
+from batch import BatchCPU
+from cpu import Chip8CPU
+from rng import ByteRandom
+from screen import PackedScreen
+
+from benchmarks.workloads import WORKLOADS, create_memory
+
+
+def measure_cpus(name: str, count: int, steps: int) -> float:
+    cpus = [Chip8CPU(create_memory(name), PackedScreen(), ByteRandom(seed)) for seed in range(count)]
+    start = time.perf_counter()
+    for _ in range(steps):
+        for cpu in cpus:
+            cpu.execute_instruction()
+    return (time.perf_counter() - start) / (count * steps)
+
+
+def measure_batch(name: str, count: int, steps: int) -> float:
+    batch = BatchCPU(create_memory(name), count, list(range(count)))
+    start = time.perf_counter()
+    for _ in range(steps):
+        batch.step()
+    return (time.perf_counter() - start) / (count * steps)
+
+
+def main() -> None:
+    count, steps = 1000, 200
+    print(f"{count} machines x {steps} instructions")
+    for name in WORKLOADS:
+        cpus = measure_cpus(name, count, steps)
+        batch = measure_batch(name, count, steps)
+        print(f"{name:<8} Chip8CPU: {cpus * 1e9:7.1f} ns  BatchCPU: {batch * 1e9:7.1f} ns  ({cpus / batch:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+命令ディスパッチのベンチマーク。
+
+以前の実装 (マスクごとの dict を毎サイクル順番に引く方式) と
+Chip8CPU.dispatch_table を1回引く方式を同じ命令列で比較する。
+ディスパッチの差だけを測るために、どちらも以前と同じく命令ごとに軽量な Decoder を作る。
+
+    python -m benchmarks.dispatch
+"""
+
+import random
+import timeit
+from collections.abc import Callable
+
+from cpu import Chip8CPU
+from memory import Memory
+from screen import VirtualScreen
+
+
+class _LegacyDecoder:
+    """
+    dispatch_table 導入前の Decoder と同じく opcode だけを持ち、オペランドは参照するたびに取り出す。
+
+    現在の Decoder は生成時にすべてのオペランドを分解する (decode() で使い回す前提) ので、
+    命令ごとに作る以前の方式の計測に使うと遅く見積もってしまう。
+    命令の実装はオペランドを属性で参照するので、以前のメソッドの代わりにプロパティにしている。
+    """
+
+    __slots__ = ("opcode",)
+
+    def __init__(self, opcode: int) -> None:
+        self.opcode = opcode
+
+    @property
+    def x(self) -> int:
+        return (self.opcode & 0x0F00) >> 8
+
+    @property
+    def y(self) -> int:
+        return (self.opcode & 0x00F0) >> 4
+
+    @property
+    def n(self) -> int:
+        return self.opcode & 0x000F
+
+    @property
+    def nn(self) -> int:
+        return self.opcode & 0x00FF
+
+    @property
+    def _nnn(self) -> int:
+        return self.opcode & 0x0FFF
+
+
+def legacy_dispatch(cpu: Chip8CPU, opcode: int) -> None:
+    """
+    dispatch_table 導入前の execute_instruction と同じ手順で命令を探して実行する。
+
+    Args:
+        cpu (Chip8CPU): 実行する CPU
+        opcode (int): 実行する opcode
+    """
+    decoder = _LegacyDecoder(opcode)
+    instructions_with_mask = [
+        (cpu.instructions_FFFF, 0xFFFF),
+        (cpu.instructions_F000, 0xF000),
+        (cpu.instructions_F00F, 0xF00F),
+        (cpu.instructions_F0FF, 0xF0FF),
+    ]
+
+    for instructions, mask in instructions_with_mask:
+        match instructions.get(opcode & mask):
+            case None:
+                pass
+            case instruction:
+                instruction(decoder)
+                break
+
+    match cpu.keyboard_instructions.get(opcode & 0xF0FF):
+        case None:
+            pass
+        case keyboard_instruction:
+            keyboard_instruction(decoder)
+
+
+def table_dispatch(cpu: Chip8CPU, opcode: int) -> None:
+    cpu.dispatch_table[opcode](_LegacyDecoder(opcode))
+
+
+def make_opcodes(count: int, seed: int = 0) -> list[int]:
+    """
+    メモリや画面を壊さない ALU/分岐系の命令をランダムに並べる。
+
+    Args:
+        count (int): 命令数
+        seed (int, optional): 乱数のシード. デフォルトは 0.
+
+    Returns:
+        list[int]: opcode のリスト
+    """
+    rng = random.Random(seed)
+    templates = [0x3000, 0x4000, 0x6000, 0x7000, 0x8000, 0x8001, 0x8002, 0x8004, 0x8005, 0x800E, 0xF007, 0xF01E]
+    opcodes = []
+    for _ in range(count):
+        template = rng.choice(templates)
+        if template & 0xF000 in (0x3000, 0x4000, 0x6000, 0x7000):
+            opcodes.append(template | rng.randrange(0x1000))
+        elif template & 0xF000 == 0x8000:
+            opcodes.append(template | rng.randrange(0x100) << 4)
+        else:
+            opcodes.append(template | rng.randrange(0x10) << 8)
+    return opcodes
+
+
+def measure(dispatch: Callable[[Chip8CPU, int], None], opcodes: list[int], repeat: int) -> float:
+    cpu = Chip8CPU(Memory(), VirtualScreen())
+
+    def run() -> None:
+        for opcode in opcodes:
+            dispatch(cpu, opcode)
+
+    return min(timeit.repeat(run, number=1, repeat=repeat)) / len(opcodes)
+
+
+def main() -> None:
+    opcodes = make_opcodes(100_000)
+    legacy = measure(legacy_dispatch, opcodes, repeat=5)
+    table = measure(table_dispatch, opcodes, repeat=5)
+    print(f"legacy dispatch: {legacy * 1e9:8.1f} ns/instruction")
+    print(f"table dispatch : {table * 1e9:8.1f} ns/instruction")
+    print(f"speedup        : {legacy / table:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+スプライト描画 (DXYN) のベンチマーク。
+
+以前の Chip8CPU.draw_sprite (1バイトずつ読み込み、文字列経由でビットに分解し、
+ピクセルごとに Point を作って描画する方式) と、
+メモリを直接参照してビットのテーブルで描画する現在の方式を比較する。
+
+    python -m benchmarks.sprite
+"""
+
+import random
+import timeit
+
+from cpu import Chip8CPU, decode
+from memory import Memory
+from screen import PackedScreen, Point, Screen, Sprite, VirtualScreen
+
+
+def legacy_bytes_to_sprite(_bytes: list[int]) -> Sprite:
+    pixels = []
+    for byte in _bytes:
+        bits = [bit == "1" for bit in f"{byte:08b}"]
+        pixels.append(bits)
+    return Sprite(8, len(_bytes), pixels)
+
+
+def legacy_draw_sprite(cpu: Chip8CPU, opcode: int) -> None:
+    decoder = decode(opcode)
+    x, y, n = decoder.x, decoder.y, decoder.n
+    address = cpu.rg_i.read()
+    _bytes = [cpu.memory.read(i) for i in range(address, address + n)]
+    x_value = cpu.rg_vs[x].read()
+    y_value = cpu.rg_vs[y].read()
+    sprite = legacy_bytes_to_sprite(_bytes)
+    collision_flag = cpu.screen.draw_sprite(Point(x_value, y_value), sprite)
+    cpu.rg_vs[0xF].write(collision_flag)
+
+
+def current_draw_sprite(cpu: Chip8CPU, opcode: int) -> None:
+    cpu.draw_sprite(decode(opcode))
+
+
+def create_cpu(screen: Screen, seed: int = 0) -> Chip8CPU:
+    rng = random.Random(seed)
+    memory = Memory()
+    memory.write_bytes(0x300, [rng.randrange(0x100) for _ in range(0x10)])
+    cpu = Chip8CPU(memory, screen)
+    cpu.rg_i.write(0x300)
+    return cpu
+
+
+def measure(draw, screen: Screen, coordinates: list[tuple[int, int]], repeat: int) -> float:
+    cpu = create_cpu(screen)
+    # D01F: (v0, v1) に 15 行のスプライトを描画する
+    opcode = 0xD01F
+
+    def run() -> None:
+        for x, y in coordinates:
+            cpu.rg_vs[0].write(x)
+            cpu.rg_vs[1].write(y)
+            draw(cpu, opcode)
+
+    return min(timeit.repeat(run, number=1, repeat=repeat)) / len(coordinates)
+
+
+def main() -> None:
+    rng = random.Random(0)
+    coordinates = [(rng.randrange(0x40), rng.randrange(0x20)) for _ in range(5_000)]
+    legacy = measure(legacy_draw_sprite, VirtualScreen(), coordinates, repeat=5)
+    print(f"legacy draw_sprite (list)  : {legacy * 1e6:8.2f} us/sprite")
+    for name, screen in [("list", VirtualScreen()), ("packed", PackedScreen())]:
+        current = measure(current_draw_sprite, screen, coordinates, repeat=5)
+        print(f"draw_sprite ({name:<6})       : {current * 1e6:8.2f} us/sprite ({legacy / current:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
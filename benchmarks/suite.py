@@ -0,0 +1,152 @@
+"""
+合成 ROM のワークロードをヘッドレスで実行して IPS、FPS、ピークメモリを計測する。
+
+    python -m benchmarks run -o results.json
+    python -m benchmarks compare base.json results.json --threshold 0.1
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tracemalloc
+from typing import Any
+
+from compiler import ENGINES, create_engine
+from cpu import Chip8CPU
+from headless import run_headless
+from screen import create_screen
+
+from benchmarks.workloads import WORKLOADS, create_memory
+
+# 命令数のスループットを計るため、1フレームあたりの命令数を実機より大きくする
+INSTRUCTIONS_PER_FRAME = 1000
+
+
+def run_workload(name: str, engine_name: str, screen_backend: str, frames: int) -> dict[str, Any]:
+    """
+    1つのワークロードを計測する。
+
+    IPS と FPS は tracemalloc なしで計測し、ピークメモリは別に短く実行して計測する。
+
+    Args:
+        name (str): ワークロードの名前
+        engine_name (str): 実行エンジン
+        screen_backend (str): 画面の実装
+        frames (int): 実行するフレーム数
+
+    Returns:
+        dict[str, Any]: 計測結果
+    """
+    cpu = Chip8CPU(create_memory(name), create_screen(screen_backend))
+    result = run_headless(
+        cpu, create_engine(cpu, engine_name), max_frames=frames, instructions_per_frame=INSTRUCTIONS_PER_FRAME
+    )
+
+    tracemalloc.start()
+    cpu = Chip8CPU(create_memory(name), create_screen(screen_backend))
+    run_headless(
+        cpu,
+        create_engine(cpu, engine_name),
+        max_frames=max(1, frames // 10),
+        instructions_per_frame=INSTRUCTIONS_PER_FRAME,
+    )
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "workload": name,
+        "engine": engine_name,
+        "screen": screen_backend,
+        "instructions": result.instructions,
+        "seconds": result.seconds,
+        "ips": result.ips,
+        "fps": result.fps,
+        "peak_memory": peak_memory,
+    }
+
+
+def _key(result: dict[str, Any]) -> tuple[str, str, str]:
+    return (result["workload"], result["engine"], result["screen"])
+
+
+def compare(base: dict[str, Any], current: dict[str, Any], threshold: float) -> list[str]:
+    """
+    2回の計測結果を比べて、threshold を超えて悪化したものを返す。
+
+    IPS と FPS は減った場合、ピークメモリは増えた場合を悪化とする。
+
+    Args:
+        base (dict[str, Any]): 基準の計測結果
+        current (dict[str, Any]): 比較する計測結果
+        threshold (float): 許容する変化の割合 (0.1 なら 10%)
+
+    Returns:
+        list[str]: 悪化した項目の説明
+    """
+    base_results = {_key(result): result for result in base["results"]}
+    regressions = []
+    for result in current["results"]:
+        base_result = base_results.get(_key(result))
+        if base_result is None:
+            continue
+        name = "/".join(_key(result))
+        for metric, higher_is_better in [("ips", True), ("fps", True), ("peak_memory", False)]:
+            before, after = base_result[metric], result[metric]
+            if before == 0:
+                continue
+            change = (after - before) / before
+            if (change < -threshold) if higher_is_better else (change > threshold):
+                regressions.append(f"{name} {metric}: {before:.0f} -> {after:.0f} ({change:+.1%})")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="chip8 benchmark suite")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="ワークロードを計測して JSON に書き出す")
+    run_parser.add_argument("-o", "--output", default="benchmark_results.json", help="結果を書き出すファイル")
+    run_parser.add_argument("--frames", type=int, default=200, help="ワークロードごとのフレーム数")
+    run_parser.add_argument("--workloads", default=",".join(WORKLOADS), help="カンマ区切りのワークロード")
+    run_parser.add_argument("--engines", default=",".join(ENGINES), help="カンマ区切りの実行エンジン")
+    run_parser.add_argument("--screens", default="list,packed", help="カンマ区切りの画面の実装")
+
+    compare_parser = subparsers.add_parser("compare", help="2回の計測結果を比べる")
+    compare_parser.add_argument("base", help="基準の結果")
+    compare_parser.add_argument("current", help="比較する結果")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="許容する変化の割合")
+
+    args = parser.parse_args(argv)
+    match args.command:
+        case "run":
+            results = []
+            for name in args.workloads.split(","):
+                for engine_name in args.engines.split(","):
+                    for screen_backend in args.screens.split(","):
+                        result = run_workload(name, engine_name, screen_backend, args.frames)
+                        print(
+                            f"{name:<8} {engine_name:<7} {screen_backend:<7}"
+                            f" {result['ips']:>12.0f} ips {result['fps']:>8.1f} fps"
+                            f" {result['peak_memory'] / 1024:>8.1f} KiB"
+                        )
+                        results.append(result)
+            with open(args.output, "w") as f:
+                json.dump({"python": platform.python_version(), "results": results}, f, indent=2)
+            return 0
+        case "compare":
+            with open(args.base) as f:
+                base = json.load(f)
+            with open(args.current) as f:
+                current = json.load(f)
+            regressions = compare(base, current, args.threshold)
+            for regression in regressions:
+                print(f"REGRESSION {regression}")
+            if not regressions:
+                print("no regressions")
+            return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+ベンチマーク用の合成 ROM。
+
+どれも cpu.write_instruction で命令を書き込んだ無限ループで、ヘッドレスで上限まで実行する。
+"""
+
+from collections.abc import Callable
+
+from cpu import DEFAULT_PC_ADDRESS, FONT_START_ADDRESS, write_instruction
+from memory import Memory
+
+
+def _write_program(memory: Memory, codes: list[int], address: int = DEFAULT_PC_ADDRESS) -> int:
+    for code in codes:
+        address = write_instruction(memory, address, code)
+    return address
+
+
+def alu(memory: Memory) -> None:
+    # 算術・論理演算だけのループ
+    _write_program(
+        memory,
+        [
+            0x6001,  # 0x200: v0 := 0x01
+            0x6103,  # 0x202: v1 := 0x03
+            0x8014,  # 0x204: v0 += v1
+            0x8215,  # 0x206: v2 -= v1
+            0x8302,  # 0x208: v3 &= v0
+            0x8401,  # 0x20A: v4 |= v0
+            0x8503,  # 0x20C: v5 ^= v0
+            0x8606,  # 0x20E: v6 >>= 1
+            0x870E,  # 0x210: v7 <<= 1
+            0x7801,  # 0x212: v8 += 0x01
+            0x1204,  # 0x214: jump 0x204
+        ],
+    )
+
+
+def sprite(memory: Memory) -> None:
+    # フォントを少しずつずらしながら描画し続けるループ
+    _write_program(
+        memory,
+        [
+            0x6000,  # 0x200: v0 := 0x00
+            0x6100,  # 0x202: v1 := 0x00
+            0xF029,  # 0x204: i := font(v0)
+            0xD015,  # 0x206: draw (v0, v1), 5 行
+            0x7003,  # 0x208: v0 += 0x03
+            0x7101,  # 0x20A: v1 += 0x01
+            0x1204,  # 0x20C: jump 0x204
+        ],
+    )
+
+
+def call(memory: Memory) -> None:
+    # サブルーチンの呼び出しと復帰を繰り返すループ
+    _write_program(
+        memory,
+        [
+            0x2206,  # 0x200: call 0x206
+            0x2206,  # 0x202: call 0x206
+            0x1200,  # 0x204: jump 0x200
+            0x7001,  # 0x206: v0 += 0x01
+            0x00EE,  # 0x208: ret
+        ],
+    )
+
+
+def memcopy(memory: Memory) -> None:
+    # FX55 / FX65 で V0-VF をメモリとやりとりするループ
+    _write_program(
+        memory,
+        [
+            0xA300,  # 0x200: i := 0x300
+            0xFF55,  # 0x202: save v0..vf
+            0xFF65,  # 0x204: load v0..vf
+            0x7001,  # 0x206: v0 += 0x01
+            0x1200,  # 0x208: jump 0x200
+        ],
+    )
+
+
+def bcd(memory: Memory) -> None:
+    # FX33 で BCD に変換し続けるループ
+    _write_program(
+        memory,
+        [
+            0xA300,  # 0x200: i := 0x300
+            0xF033,  # 0x202: bcd v0
+            0x7001,  # 0x204: v0 += 0x01
+            0x1202,  # 0x206: jump 0x202
+        ],
+    )
+
+
+WORKLOADS: dict[str, Callable[[Memory], None]] = {
+    "alu": alu,
+    "sprite": sprite,
+    "call": call,
+    "memcopy": memcopy,
+    "bcd": bcd,
+}
+
+
+def create_memory(name: str) -> Memory:
+    """
+    ワークロードの ROM を書き込んだ Memory を返す。
+
+    Args:
+        name (str): ワークロードの名前
+
+    Returns:
+        Memory: ROM を書き込んだ Memory
+    """
+    memory = Memory()
+    memory.load_fonts(FONT_START_ADDRESS)
+    WORKLOADS[name](memory)
+    return memory
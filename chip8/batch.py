@@ -0,0 +1,408 @@
+from collections.abc import Callable, Iterator, Sequence
+
+import numpy as np
+import numpy.typing as npt
+from cpu import (
+    DEFAULT_PC_ADDRESS,
+    FONT_START_ADDRESS,
+    SNAPSHOT_FORMAT,
+    SNAPSHOT_MAGIC,
+    SNAPSHOT_VERSION,
+    CPUState,
+)
+from memory import MAX_SIZE, Memory
+from rng import ByteRandom
+from screen import Screen
+
+Rows = npt.NDArray[np.intp]
+Opcodes = npt.NDArray[np.int64]
+BatchInstruction = Callable[[Rows, Opcodes], None]
+
+ADDRESS_MASK = MAX_SIZE - 1
+STACK_SIZE = 16
+# FX55 / FX65 で扱うレジスタの番号、DXYN の行と列
+_REGISTER_OFFSETS = np.arange(16)
+_SPRITE_ROWS = np.arange(15)
+_SPRITE_COLUMNS = np.arange(8)
+
+Values = npt.NDArray[np.int64]
+# 8XYN の N ごとの計算。(vx に入れる値, vf に入れる値) を返し、vf が変わらない命令は None を返す
+# 減算は Chip8CPU と同じく 2 の補数の加算にして、8 ビット目を vf にする
+_ARITHMETIC: dict[int, Callable[[Values, Values], tuple[Values, Values | None]]] = {
+    0x0: lambda x_value, y_value: (y_value, None),
+    0x1: lambda x_value, y_value: (x_value | y_value, None),
+    0x2: lambda x_value, y_value: (x_value & y_value, None),
+    0x3: lambda x_value, y_value: (x_value ^ y_value, None),
+    0x4: lambda x_value, y_value: _with_carry(x_value + y_value),
+    0x5: lambda x_value, y_value: _with_carry(x_value + (~y_value & 0xFF) + 1),
+    0x6: lambda x_value, y_value: (x_value >> 1, x_value & 0x01),
+    0x7: lambda x_value, y_value: _with_carry(y_value + (~x_value & 0xFF) + 1),
+    0xE: lambda x_value, y_value: (x_value << 1, x_value >> 7),
+}
+
+
+def _with_carry(result: Values) -> tuple[Values, Values]:
+    return result, result >> 8
+
+
+def _groups(keys: Opcodes) -> Iterator[tuple[int, npt.NDArray[np.bool_] | slice]]:
+    """
+    keys の値ごとに、その値を持つ要素を選ぶインデックスを返す。
+
+    全台が同じ命令を実行していることが多いので、値が1種類の場合はマスクを作らずに全体を選ぶ。
+
+    Args:
+        keys (Opcodes): 台ごとの値
+
+    Yields:
+        Iterator[tuple[int, npt.NDArray[np.bool_] | slice]]: 値と、その値を持つ要素の bool 配列または slice
+    """
+    first = int(keys[0])
+    if (keys == first).all():
+        yield first, slice(None)
+        return
+    for key in np.unique(keys).tolist():
+        yield key, keys == key
+
+
+class BatchCPU:
+    """
+    count 台の CHIP-8 を NumPy の配列 (structure of arrays) で持ち、全台を1命令ずつ同時に進める。
+
+    ram は (count, MAX_SIZE)、v は (count, 16)、framebuffer は (count, HEIGHT, WIDTH) の uint8 の配列で、
+    pc・i・sp・dt・st・keys などは長さ count の配列、stack は (count, 16) の配列で持つ。
+    step() では全台の opcode を読み込んで上位 4 ビットで分け、種類ごとにまとめて配列演算で実行する。
+    各命令の動作は Chip8CPU と同じで、snapshot() は Chip8CPU.snapshot() と同じ形式になる。
+    ただし Chip8CPU で例外になる場合 (メモリの範囲外へのアクセス、スタックのあふれ) は、
+    アドレスやスタックの位置を折り返して実行を続ける。
+    """
+
+    def __init__(self, memory: Memory, count: int, seeds: Sequence[int] | None = None) -> None:
+        """
+        Args:
+            memory (Memory): 全台に同じ内容を書き込むメモリ (ROM とフォントを読み込んだもの)
+            count (int): 台数
+            seeds (Sequence[int] | None, optional): 各台の CXNN の乱数の seed. デフォルトは None (ランダム).
+        """
+        if seeds is not None and len(seeds) != count:
+            raise ValueError(f"seeds must have {count} items: {len(seeds)}")
+        self.count = count
+        self.ram = np.tile(np.frombuffer(memory.memory, dtype=np.uint8), (count, 1))
+        self.v = np.zeros((count, 16), dtype=np.uint8)
+        self.i = np.zeros(count, dtype=np.uint16)
+        self.pc = np.full(count, DEFAULT_PC_ADDRESS, dtype=np.uint16)
+        self.sp = np.zeros(count, dtype=np.uint8)
+        self.dt = np.zeros(count, dtype=np.uint8)
+        self.st = np.zeros(count, dtype=np.uint8)
+        self.stack = np.zeros((count, STACK_SIZE), dtype=np.uint16)
+        self.framebuffer = np.zeros((count, Screen.HEIGHT, Screen.WIDTH), dtype=np.uint8)
+        # 押されているキーのビットマスク (Keypad.pressed と同じ)
+        self.keys = np.zeros(count, dtype=np.uint16)
+        # FX0A でキー入力を待っている台 (CPUState.WAITING)
+        self.waiting = np.zeros(count, dtype=bool)
+        self._held_keys = np.zeros(count, dtype=np.uint16)
+        # CXNN は Chip8CPU と同じ乱数列にするため、台ごとに ByteRandom を持つ
+        self.rngs = [ByteRandom(seed) for seed in seeds] if seeds is not None else [ByteRandom() for _ in range(count)]
+        self.instruction_count = np.zeros(count, dtype=np.int64)
+        self.unknown_opcode_count = np.zeros(count, dtype=np.int64)
+        self._all_rows: Rows = np.arange(count)
+
+        # opcode の上位 4 ビットごとの命令
+        self.instructions: list[BatchInstruction] = [
+            self.system,  # 00E0, 00EE
+            self.jump_to_address,  # 1NNN
+            self.call_subroutine,  # 2NNN
+            self.skip_if_vx_eq_value,  # 3XNN
+            self.skip_if_vx_neq_value,  # 4XNN
+            self.skip_if_vx_eq_vy,  # 5XY0
+            self.set_value_to_vx,  # 6XNN
+            self.add_value_to_vx,  # 7XNN
+            self.arithmetic,  # 8XY0 - 8XYE
+            self.skip_if_vx_neq_vy,  # 9XY0
+            self.set_address_to_i,  # ANNN
+            self.jump_to_v0_plus,  # BNNN
+            self.set_random_to_vx,  # CXNN
+            self.draw_sprite,  # DXYN
+            self.skip_if_key,  # EX9E, EXA1
+            self.misc,  # FX07 - FX65
+        ]
+        # FXNN の NN ごとの命令
+        self.instructions_F0FF: dict[int, BatchInstruction] = {
+            0x07: self.set_dt_value_to_vx,
+            0x0A: self.wait_for_key,
+            0x15: self.set_vx_value_to_dt,
+            0x18: self.set_vx_value_to_st,
+            0x1E: self.add_vx_value_to_i,
+            0x29: self.set_font_address_to_i,
+            0x33: self.bcd,
+            0x55: self.save_vx,
+            0x65: self.load_vx,
+        }
+
+    def step(self, active: npt.NDArray[np.bool_] | None = None) -> None:
+        """
+        各台で1命令ずつ実行する。
+
+        Args:
+            active (npt.NDArray[np.bool_] | None, optional): 実行する台を True にした配列. デフォルトは None (全台).
+        """
+        rows = self._all_rows if active is None else np.flatnonzero(active)
+        if len(rows) == 0:
+            return
+        pc = self.pc[rows].astype(np.int64)
+        opcodes = self.ram[rows, pc & ADDRESS_MASK].astype(np.int64) << 8 | self.ram[rows, (pc + 1) & ADDRESS_MASK]
+        self.pc[rows] = pc + 2
+        self.instruction_count[rows] += 1
+
+        for kind, selected in _groups(opcodes >> 12):
+            self.instructions[kind](rows[selected], opcodes[selected])
+
+    def run_frame(self, instructions_per_frame: int) -> None:
+        """
+        FrameScheduler.run_frame() と同じく、各台で instructions_per_frame 命令を実行してからタイマーを減らす。
+
+        FX0A でキー入力待ちになった台は、そのフレームの残りの命令を実行しない。
+        キーの状態は keys から読む。
+
+        Args:
+            instructions_per_frame (int): 1フレームあたりの命令数
+        """
+        running = np.ones(self.count, dtype=bool)
+        for _ in range(instructions_per_frame):
+            self.step(None if running.all() else running)
+            running &= ~self.waiting
+            if not running.any():
+                break
+        self.tick_timers()
+
+    def tick_timers(self) -> None:
+        """
+        全台の delay timer と sound timer を1つ減らす。60Hz で呼び出す。
+        """
+        self.dt[self.dt > 0] -= 1
+        self.st[self.st > 0] -= 1
+
+    def snapshot(self, index: int) -> bytes:
+        """
+        index 番目の台の状態を Chip8CPU.snapshot() と同じ形式のバイト列にする。
+
+        Args:
+            index (int): 台の番号
+
+        Returns:
+            bytes: Chip8CPU.restore() や restore() で復元できるバイト列
+        """
+        state = CPUState.WAITING if self.waiting[index] else CPUState.RUNNING
+        rng = self.rngs[index]
+        return SNAPSHOT_FORMAT.pack(
+            SNAPSHOT_MAGIC,
+            SNAPSHOT_VERSION,
+            self.v[index].tobytes(),
+            int(self.i[index]),
+            int(self.pc[index]),
+            int(self.sp[index]),
+            int(self.dt[index]),
+            int(self.st[index]),
+            state.value,
+            *self.stack[index].tolist(),
+            rng.seed,
+            rng.position,
+            self.ram[index].tobytes(),
+            # 1行 64 ピクセルを詰めると、左端が最上位ビットのビッグエンディアンの整数になる
+            np.packbits(self.framebuffer[index], axis=1).tobytes(),
+        )
+
+    def restore(self, index: int, data: bytes | bytearray | memoryview) -> None:
+        """
+        snapshot() や Chip8CPU.snapshot() のバイト列から index 番目の台の状態を復元する。
+
+        Args:
+            index (int): 台の番号
+            data (bytes | bytearray | memoryview): スナップショット
+
+        Raises:
+            ValueError: 形式やバージョンが違う場合
+        """
+        if len(data) != SNAPSHOT_FORMAT.size:
+            raise ValueError(f"snapshot must be {SNAPSHOT_FORMAT.size} bytes: {len(data)}")
+        magic, version, vs, i, pc, sp, dt, st, state, *rest = SNAPSHOT_FORMAT.unpack(data)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"not a snapshot: {magic!r}")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"unsupported snapshot version: {version}")
+        stack, (seed, position, ram, framebuffer) = rest[:STACK_SIZE], rest[STACK_SIZE:]
+
+        self.v[index] = np.frombuffer(vs, dtype=np.uint8)
+        self.i[index], self.pc[index], self.sp[index], self.dt[index], self.st[index] = i, pc, sp, dt, st
+        self.waiting[index] = state == CPUState.WAITING.value
+        self._held_keys[index] = self.keys[index]
+        self.stack[index] = stack
+        self.rngs[index].set_state(seed, position)
+        self.ram[index] = np.frombuffer(ram, dtype=np.uint8)
+        packed = np.frombuffer(framebuffer, dtype=np.uint8).reshape(Screen.HEIGHT, -1)
+        self.framebuffer[index] = np.unpackbits(packed, axis=1)
+
+    def unknown_instruction(self, rows: Rows, opcodes: Opcodes) -> None:
+        self.unknown_opcode_count[rows] += 1
+
+    def system(self, rows: Rows, opcodes: Opcodes) -> None:
+        clear = opcodes == 0x00E0
+        self.framebuffer[rows[clear]] = 0
+
+        ret = opcodes == 0x00EE
+        returning = rows[ret]
+        sp = self.sp[returning] - 1
+        self.sp[returning] = sp
+        self.pc[returning] = self.stack[returning, sp % STACK_SIZE]
+
+        self.unknown_instruction(rows[~(clear | ret)], opcodes)
+
+    def jump_to_address(self, rows: Rows, opcodes: Opcodes) -> None:
+        self.pc[rows] = opcodes & 0xFFF
+
+    def call_subroutine(self, rows: Rows, opcodes: Opcodes) -> None:
+        sp = self.sp[rows]
+        self.stack[rows, sp % STACK_SIZE] = self.pc[rows]
+        self.sp[rows] = sp + 1
+        self.pc[rows] = opcodes & 0xFFF
+
+    def _skip(self, rows: Rows, condition: npt.NDArray[np.bool_]) -> None:
+        self.pc[rows[condition]] += 2
+
+    def skip_if_vx_eq_value(self, rows: Rows, opcodes: Opcodes) -> None:
+        self._skip(rows, self.v[rows, opcodes >> 8 & 0xF] == opcodes & 0xFF)
+
+    def skip_if_vx_neq_value(self, rows: Rows, opcodes: Opcodes) -> None:
+        self._skip(rows, self.v[rows, opcodes >> 8 & 0xF] != opcodes & 0xFF)
+
+    def skip_if_vx_eq_vy(self, rows: Rows, opcodes: Opcodes) -> None:
+        # 5XY1 - 5XYF は未対応の命令
+        known = opcodes & 0xF == 0
+        self.unknown_instruction(rows[~known], opcodes)
+        rows, opcodes = rows[known], opcodes[known]
+        self._skip(rows, self.v[rows, opcodes >> 8 & 0xF] == self.v[rows, opcodes >> 4 & 0xF])
+
+    def skip_if_vx_neq_vy(self, rows: Rows, opcodes: Opcodes) -> None:
+        known = opcodes & 0xF == 0
+        self.unknown_instruction(rows[~known], opcodes)
+        rows, opcodes = rows[known], opcodes[known]
+        self._skip(rows, self.v[rows, opcodes >> 8 & 0xF] != self.v[rows, opcodes >> 4 & 0xF])
+
+    def set_value_to_vx(self, rows: Rows, opcodes: Opcodes) -> None:
+        self.v[rows, opcodes >> 8 & 0xF] = opcodes & 0xFF
+
+    def add_value_to_vx(self, rows: Rows, opcodes: Opcodes) -> None:
+        x = opcodes >> 8 & 0xF
+        self.v[rows, x] = (self.v[rows, x] + (opcodes & 0xFF)) & 0xFF
+
+    def arithmetic(self, rows: Rows, opcodes: Opcodes) -> None:
+        n = opcodes & 0xF
+        for value, selected in _groups(n):
+            operation = _ARITHMETIC.get(value)
+            if operation is None:
+                self.unknown_instruction(rows[selected], opcodes)
+                continue
+            selected_rows, selected_opcodes = rows[selected], opcodes[selected]
+            x = selected_opcodes >> 8 & 0xF
+            x_value = self.v[selected_rows, x].astype(np.int64)
+            y_value = self.v[selected_rows, selected_opcodes >> 4 & 0xF].astype(np.int64)
+            result, flag = operation(x_value, y_value)
+            self.v[selected_rows, x] = result & 0xFF
+            # vx の後に vf を書き込むので、X が F の場合は vf が残る
+            if flag is not None:
+                self.v[selected_rows, 0xF] = flag
+
+    def set_address_to_i(self, rows: Rows, opcodes: Opcodes) -> None:
+        self.i[rows] = opcodes & 0xFFF
+
+    def jump_to_v0_plus(self, rows: Rows, opcodes: Opcodes) -> None:
+        self.pc[rows] = self.v[rows, 0] + (opcodes & 0xFFF)
+
+    def set_random_to_vx(self, rows: Rows, opcodes: Opcodes) -> None:
+        # 乱数だけは台ごとの ByteRandom から1バイトずつ取る
+        rngs = self.rngs
+        values = np.fromiter((rngs[row].next_byte() for row in rows.tolist()), dtype=np.int64, count=len(rows))
+        self.v[rows, opcodes >> 8 & 0xF] = values & opcodes & 0xFF
+
+    def draw_sprite(self, rows: Rows, opcodes: Opcodes) -> None:
+        # 全台のスプライトを最も大きい N 行分読み込み、それぞれの N 行目以降は 0 にして XOR する
+        v = self.v
+        n = opcodes & 0xF
+        sprite_rows = _SPRITE_ROWS[: int(n.max())]
+        x_value = v[rows, opcodes >> 8 & 0xF].astype(np.intp)
+        y_value = v[rows, opcodes >> 4 & 0xF].astype(np.intp)
+        addresses = (self.i[rows, None].astype(np.intp) + sprite_rows) & ADDRESS_MASK
+        sprites = self.ram[rows[:, None], addresses]
+        sprites[sprite_rows >= n[:, None]] = 0
+        bits = np.unpackbits(sprites[:, :, None], axis=2)
+
+        # はみ出した部分は反対側に折り返す
+        ys = (y_value[:, None] + sprite_rows) % Screen.HEIGHT
+        xs = (x_value[:, None] + _SPRITE_COLUMNS) % Screen.WIDTH
+        index = (rows[:, None, None], ys[:, :, None], xs[:, None, :])
+        region = self.framebuffer[index]
+        v[rows, 0xF] = (region & bits).any(axis=(1, 2))
+        self.framebuffer[index] = region ^ bits
+
+    def skip_if_key(self, rows: Rows, opcodes: Opcodes) -> None:
+        nn = opcodes & 0xFF
+        known = (nn == 0x9E) | (nn == 0xA1)
+        self.unknown_instruction(rows[~known], opcodes)
+        rows, opcodes, nn = rows[known], opcodes[known], nn[known]
+        # vx が 16 以上の場合は押されていない扱いになる
+        key = self.v[rows, opcodes >> 8 & 0xF].astype(np.int64)
+        pressed = (key < 16) & (self.keys[rows].astype(np.int64) >> np.minimum(key, 15) & 1 == 1)
+        self._skip(rows, pressed == (nn == 0x9E))
+
+    def misc(self, rows: Rows, opcodes: Opcodes) -> None:
+        for value, selected in _groups(opcodes & 0xFF):
+            instruction = self.instructions_F0FF.get(value, self.unknown_instruction)
+            instruction(rows[selected], opcodes[selected])
+
+    def set_dt_value_to_vx(self, rows: Rows, opcodes: Opcodes) -> None:
+        self.v[rows, opcodes >> 8 & 0xF] = self.dt[rows]
+
+    def wait_for_key(self, rows: Rows, opcodes: Opcodes) -> None:
+        # Chip8CPU.wait_for_key と同じく、待ち始めたときに押されていたキーは一度離すまで入力とみなさない
+        pressed = self.keys[rows].astype(np.int64)
+        held = np.where(self.waiting[rows], self._held_keys[rows], pressed)
+        new_keys = pressed & ~held
+        self._held_keys[rows] = held & pressed
+        found = new_keys != 0
+        lowest = new_keys[found] & -new_keys[found]
+        self.v[rows[found], opcodes[found] >> 8 & 0xF] = np.log2(lowest).astype(np.uint8)
+        self.waiting[rows] = ~found
+        self.pc[rows[~found]] -= 2
+
+    def set_vx_value_to_dt(self, rows: Rows, opcodes: Opcodes) -> None:
+        self.dt[rows] = self.v[rows, opcodes >> 8 & 0xF]
+
+    def set_vx_value_to_st(self, rows: Rows, opcodes: Opcodes) -> None:
+        self.st[rows] = self.v[rows, opcodes >> 8 & 0xF]
+
+    def add_vx_value_to_i(self, rows: Rows, opcodes: Opcodes) -> None:
+        self.i[rows] = (self.i[rows].astype(np.int64) + self.v[rows, opcodes >> 8 & 0xF]) & 0xFFFF
+
+    def set_font_address_to_i(self, rows: Rows, opcodes: Opcodes) -> None:
+        self.i[rows] = FONT_START_ADDRESS + (self.v[rows, opcodes >> 8 & 0xF] & 0xF).astype(np.uint16) * 5
+
+    def bcd(self, rows: Rows, opcodes: Opcodes) -> None:
+        x_value = self.v[rows, opcodes >> 8 & 0xF]
+        i = self.i[rows].astype(np.intp)
+        for offset, digit in enumerate([x_value // 100, x_value // 10 % 10, x_value % 10]):
+            self.ram[rows, (i + offset) & ADDRESS_MASK] = digit
+
+    def _register_range(self, rows: Rows, opcodes: Opcodes) -> tuple[npt.NDArray[np.bool_], npt.NDArray[np.intp]]:
+        # FX55 / FX65 の対象のレジスタと、それぞれのメモリのアドレス
+        selected = _REGISTER_OFFSETS <= (opcodes[:, None] >> 8 & 0xF)
+        addresses = (self.i[rows, None].astype(np.intp) + _REGISTER_OFFSETS) & ADDRESS_MASK
+        return selected, addresses
+
+    def save_vx(self, rows: Rows, opcodes: Opcodes) -> None:
+        selected, addresses = self._register_range(rows, opcodes)
+        index = (rows[:, None], addresses)
+        self.ram[index] = np.where(selected, self.v[rows], self.ram[index])
+
+    def load_vx(self, rows: Rows, opcodes: Opcodes) -> None:
+        selected, addresses = self._register_range(rows, opcodes)
+        self.v[rows] = np.where(selected, self.ram[rows[:, None], addresses], self.v[rows])
@@ -0,0 +1,267 @@
+"""
+ヘッドレス実行の画面をフレームごとに PBM / PPM のストリームやアニメーション GIF に書き出す。
+
+FrameScheduler.frame_listeners に登録すると、フレームの終わりごとに呼び出される。
+同じ画面が続くフレームはまとめて1枚にし、その枚数を表示時間として書く。
+保持するのは直前の1フレームだけなので、長時間実行してもメモリは増えない。
+"""
+
+import os
+import struct
+from abc import ABC, abstractmethod
+from typing import BinaryIO
+
+from scheduler import FRAME_RATE
+from screen import Screen
+
+CAPTURE_FORMATS = ("pbm", "ppm", "gif")
+# 点灯しているピクセルと消えているピクセルの色
+ON_COLOR = (0xFF, 0xFF, 0xFF)
+OFF_COLOR = (0x00, 0x00, 0x00)
+# GIF の表示時間の単位 (1/100 秒) と、1フレームの表示時間の上限
+GIF_TIME_UNIT = 100
+GIF_MAX_DELAY = 0xFFFF
+
+# PBM は 1 が黒なので、点灯しているピクセル (1) を白にするためにビットを反転する
+_INVERT = bytes(~byte & 0xFF for byte in range(0x100))
+
+
+def _bits_to_pixels(byte: int, on: bytes, off: bytes) -> bytes:
+    return b"".join(on if byte >> shift & 1 else off for shift in range(7, -1, -1))
+
+
+class FrameCapture(ABC):
+    """
+    フレームの終わりごとに画面を受け取り、直前と違う画面になったときに直前の画面を表示時間付きで書き出す。
+
+    画面は scale 倍に拡大し、1行を左端が最上位ビットのバイト列 (1ピクセル1ビット) にしてから各形式に変換する。
+    """
+
+    def __init__(self, output: BinaryIO, scale: int = 1, frame_rate: int = FRAME_RATE) -> None:
+        """
+        Args:
+            output (BinaryIO): 出力先
+            scale (int, optional): 拡大する倍率. デフォルトは 1.
+            frame_rate (int, optional): 1秒あたりのフレーム数. デフォルトは FRAME_RATE.
+        """
+        if scale < 1:
+            raise ValueError(f"scale must be positive: {scale}")
+        self.output = output
+        self.scale = scale
+        self.frame_rate = frame_rate
+        self.width = Screen.WIDTH * scale
+        self.height = Screen.HEIGHT * scale
+        # 1バイト (8ピクセル) を横に scale 倍にしたバイト列
+        self._scaled_bytes = [
+            int("".join(bit * scale for bit in f"{byte:08b}"), 2).to_bytes(scale, "big") for byte in range(0x100)
+        ]
+        self.frame_count = 0
+        self.written_count = 0
+        self._rows: list[int] | None = None
+        self._first_frame = 0
+        self._started = False
+
+    def __call__(self, screen: Screen) -> None:
+        """
+        1フレーム分の画面を受け取る。FrameScheduler.frame_listeners に登録して使う。
+
+        Args:
+            screen (Screen): フレームの終わりの画面
+        """
+        rows = screen.packed_rows()
+        if rows != self._rows:
+            self._flush()
+            self._rows = rows
+            self._first_frame = self.frame_count
+        self.frame_count += 1
+
+    def close(self) -> None:
+        """
+        残っているフレームを書き出して出力を閉じる。
+        """
+        self._flush()
+        if self._started:
+            self._write_trailer()
+        self.output.close()
+
+    def _flush(self) -> None:
+        if self._rows is None:
+            return
+        if not self._started:
+            self._write_header()
+            self._started = True
+        self._write_frame(self._pack(self._rows), self._first_frame, self.frame_count)
+        self.written_count += 1
+
+    def _pack(self, rows: list[int]) -> bytes:
+        """
+        各行を scale 倍に拡大して、1ピクセル1ビットのバイト列にする。
+        """
+        row_bytes = Screen.WIDTH // 8
+        if self.scale == 1:
+            return b"".join(row.to_bytes(row_bytes, "big") for row in rows)
+        scaled_bytes = self._scaled_bytes
+        scaled_rows = (b"".join(map(scaled_bytes.__getitem__, row.to_bytes(row_bytes, "big"))) for row in rows)
+        return b"".join(row * self.scale for row in scaled_rows)
+
+    def _write_header(self) -> None:
+        pass
+
+    def _write_trailer(self) -> None:
+        pass
+
+    @abstractmethod
+    def _write_frame(self, bits: bytes, first_frame: int, end_frame: int) -> None:
+        """
+        1枚の画面を書き出す。
+
+        Args:
+            bits (bytes): 拡大した画面 (1行 width // 8 バイト)
+            first_frame (int): この画面になった最初のフレームの番号
+            end_frame (int): 次の画面になったフレームの番号 (end_frame - first_frame が表示するフレーム数)
+        """
+        pass
+
+
+class PnmCapture(FrameCapture):
+    """
+    raw の PBM (P4) または PPM (P6) の画像を連結したストリームを書き出す。
+
+    表示するフレーム数はヘッダのコメント (# frames N) に書く。
+    """
+
+    def __init__(self, output: BinaryIO, kind: str = "pbm", scale: int = 1, frame_rate: int = FRAME_RATE) -> None:
+        """
+        Args:
+            output (BinaryIO): 出力先
+            kind (str, optional): "pbm" または "ppm". デフォルトは "pbm".
+            scale (int, optional): 拡大する倍率. デフォルトは 1.
+            frame_rate (int, optional): 1秒あたりのフレーム数. デフォルトは FRAME_RATE.
+        """
+        super().__init__(output, scale, frame_rate)
+        if kind not in ("pbm", "ppm"):
+            raise ValueError(f"unknown pnm kind: {kind}")
+        self.kind = kind
+        on, off = bytes(ON_COLOR), bytes(OFF_COLOR)
+        # 1バイト (8ピクセル) を RGB 24 バイトにする
+        self._byte_to_rgb = [_bits_to_pixels(byte, on, off) for byte in range(0x100)]
+
+    def _write_frame(self, bits: bytes, first_frame: int, end_frame: int) -> None:
+        magic = b"P4" if self.kind == "pbm" else b"P6"
+        header = b"%s\n# frames %d\n%d %d\n" % (magic, end_frame - first_frame, self.width, self.height)
+        if self.kind == "pbm":
+            self.output.write(header + bits.translate(_INVERT))
+        else:
+            self.output.write(header + b"255\n" + b"".join(map(self._byte_to_rgb.__getitem__, bits)))
+
+
+def _gif_codes(byte: int) -> int:
+    """
+    8ピクセルを、2ピクセルごとにクリアコードを挟んだ 3 ビットの LZW のコード 12 個 (36 ビット) にする。
+    """
+    value = 0
+    for pair in range(4):
+        first = byte >> (7 - pair * 2) & 1
+        second = byte >> (6 - pair * 2) & 1
+        # クリアコード (4), 1ピクセル目, 2ピクセル目。下位ビットから詰める
+        value |= (4 | first << 3 | second << 6) << (pair * 9)
+    return value
+
+
+class GifCapture(FrameCapture):
+    """
+    無限ループするアニメーション GIF を書き出す。表示時間は GIF のフレームの delay (1/100 秒単位) にする。
+
+    画像データは LZW の辞書を使わず、2ピクセルごとにクリアコードを入れてコードの幅を 3 ビットに保つ。
+    圧縮はされない (1ピクセルあたり 4.5 ビット) が、16ピクセル (2バイト) がちょうど 9 バイトになるので、
+    ピクセルごとではなく 2 バイトごとの表引きで作れる。
+    """
+
+    # 2色なので LZW の最小コードサイズは GIF で使える最小の 2 (クリアコード 4、終了コード 5)
+    _MIN_CODE_SIZE = 2
+    _END_CODE = 5
+
+    def __init__(self, output: BinaryIO, scale: int = 1, frame_rate: int = FRAME_RATE) -> None:
+        super().__init__(output, scale, frame_rate)
+        self._byte_to_codes = [_gif_codes(byte) for byte in range(0x100)]
+
+    def _write_header(self) -> None:
+        # グローバルカラーテーブルあり (2色)
+        screen_descriptor = struct.pack("<HHBBB", self.width, self.height, 0xF0, 0, 0)
+        color_table = bytes(OFF_COLOR + ON_COLOR)
+        loop = b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00"
+        self.output.write(b"GIF89a" + screen_descriptor + color_table + loop)
+
+    def _write_trailer(self) -> None:
+        self.output.write(b"\x3b")
+
+    def _delay(self, frame: int) -> int:
+        # 切り捨ての誤差が積み重ならないように、フレーム番号から時刻を計算する
+        return frame * GIF_TIME_UNIT // self.frame_rate
+
+    def _encode_row(self, row: bytes) -> bytes:
+        codes = self._byte_to_codes
+        return b"".join((codes[row[i]] | codes[row[i + 1]] << 36).to_bytes(9, "little") for i in range(0, len(row), 2))
+
+    def _write_frame(self, bits: bytes, first_frame: int, end_frame: int) -> None:
+        # 1行は偶数バイト (8 * scale) なので行ごとに 9 バイト単位で区切れる。
+        # 拡大で繰り返す行や空白の行は1回だけ変換する
+        row_bytes = self.width // 8
+        encoded: dict[bytes, bytes] = {}
+        rows = [bits[i : i + row_bytes] for i in range(0, len(bits), row_bytes)]
+        data = b"".join(encoded.get(row) or encoded.setdefault(row, self._encode_row(row)) for row in rows)
+        data += bytes([self._END_CODE])
+        # 255 バイトごとのサブブロックに分ける
+        blocks = b"".join(bytes([len(data[i : i + 255])]) + data[i : i + 255] for i in range(0, len(data), 255))
+        image = (
+            struct.pack("<BHHHHB", 0x2C, 0, 0, self.width, self.height, 0)
+            + bytes([self._MIN_CODE_SIZE])
+            + blocks
+            + b"\x00"
+        )
+
+        delay = self._delay(end_frame) - self._delay(first_frame)
+        # delay の上限を超える場合は同じ画像を続けて書く
+        while True:
+            chunk = min(delay, GIF_MAX_DELAY)
+            self.output.write(struct.pack("<BBBBHBB", 0x21, 0xF9, 4, 0x04, chunk, 0, 0) + image)
+            delay -= chunk
+            if delay <= 0:
+                break
+
+
+def capture_format(path: str) -> str | None:
+    """
+    ファイルの拡張子から書き出す形式を決める。
+
+    Args:
+        path (str): 出力先のファイル
+
+    Returns:
+        str | None: CAPTURE_FORMATS のいずれか。拡張子が対応していない場合は None
+    """
+    suffix = os.path.splitext(path)[1].lower().lstrip(".")
+    return suffix if suffix in CAPTURE_FORMATS else None
+
+
+def create_capture(kind: str, path: str, scale: int = 1) -> FrameCapture:
+    """
+    フレームの書き出し先を作る。
+
+    Args:
+        kind (str): "pbm"、"ppm" または "gif"
+        path (str): 出力先のファイル
+        scale (int, optional): 拡大する倍率. デフォルトは 1.
+
+    Returns:
+        FrameCapture: FrameScheduler.frame_listeners に登録できる書き出し先
+
+    Raises:
+        ValueError: kind が対応していない形式の場合
+    """
+    if kind not in CAPTURE_FORMATS:
+        raise ValueError(f"unknown capture format: {kind}")
+    output = open(path, "wb")
+    if kind == "gif":
+        return GifCapture(output, scale)
+    return PnmCapture(output, kind, scale)
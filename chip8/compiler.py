@@ -0,0 +1,349 @@
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Protocol, TypeAlias
+
+from cpu import DEFAULT_PC_ADDRESS, FONT_START_ADDRESS, Chip8CPU, Decoder, decode
+from keypad import KEEP_KEYPAD, PressedKey, key_to_mask
+from memory import MAX_SIZE
+
+# 1ブロックに含める命令数の上限
+MAX_BLOCK_INSTRUCTIONS = 32
+
+ENGINES = ("interp", "block")
+
+
+class Engine(Protocol):
+    def step(self, pressed_key: PressedKey = KEEP_KEYPAD) -> int:
+        """
+        命令を実行する。
+
+        Args:
+            pressed_key (PressedKey, optional): 押されているキーの文字. 渡した場合は cpu.keypad をそのキーだけが
+                押された状態にし、None ならすべて離す (以前の API との互換用).
+                デフォルトは KEEP_KEYPAD (cpu.keypad を変更しない).
+
+        Returns:
+            int: 実行した命令数
+        """
+        ...
+
+
+class InterpreterEngine:
+    """
+    Chip8CPU.execute_instruction で1命令ずつ実行するエンジン。
+    """
+
+    def __init__(self, cpu: Chip8CPU) -> None:
+        self.cpu = cpu
+
+    def step(self, pressed_key: PressedKey = KEEP_KEYPAD) -> int:
+        self.cpu.execute_instruction(pressed_key)
+        return 1
+
+
+@dataclass
+class Block:
+    """
+    コンパイル済みの基本ブロック。
+
+    start から end (含まない) までの命令を function(cpu) の1回の呼び出しで実行する。
+    """
+
+    start: int
+    end: int
+    length: int
+    source: str
+    function: Callable[[Chip8CPU], None]
+
+
+class _BlockBuilder:
+    """
+    基本ブロックの Python ソースを組み立てる。
+
+    V レジスタと I は最初に使うときにローカル変数へ読み込み、
+    ブロックの最後 (終端命令の前) で変更したものだけ書き戻す。
+    """
+
+    def __init__(self) -> None:
+        self.lines: list[str] = []
+        self.loaded_vs: set[int] = set()
+        self.dirty_vs: set[int] = set()
+        self.i_loaded = False
+        self.i_dirty = False
+
+        # Chip8CPU の命令テーブルと同じ並びで、ブロック内に展開できる命令だけを持つ
+        Emitter: TypeAlias = Callable[[Decoder], None]
+        emitters_FFFF: dict[int, Emitter] = {
+            0x00E0: self.clear_screen,
+        }
+        emitters_F000: dict[int, Emitter] = {
+            0x6000: self.set_value_to_vx,
+            0x7000: self.add_value_to_vx,
+            0xA000: self.set_address_to_i,
+            0xC000: self.set_random_to_vx,
+        }
+        emitters_F00F: dict[int, Emitter] = {
+            0x8000: self.set_vy_value_to_vx,
+            0x8001: self.logical_operation_to_vx,
+            0x8002: self.logical_operation_to_vx,
+            0x8003: self.logical_operation_to_vx,
+            0x8004: self.add_vy_value_to_vx,
+            0x8005: self.subtract_vy_value_from_vx,
+            0x8006: self.right_shift,
+            0x8007: self.subtract_vx_value_from_vy,
+            0x800E: self.left_shift,
+        }
+        emitters_F0FF: dict[int, Emitter] = {
+            0xF007: self.set_dt_value_to_vx,
+            0xF015: self.set_vx_value_to_dt,
+            0xF018: self.set_vx_value_to_st,
+            0xF01E: self.add_vx_value_to_i,
+            0xF029: self.set_font_address_to_i,
+            0xF065: self.load_vx,
+        }
+        self.emitters_with_mask = [
+            (emitters_FFFF, 0xFFFF),
+            (emitters_F000, 0xF000),
+            (emitters_F00F, 0xF00F),
+            (emitters_F0FF, 0xF0FF),
+        ]
+
+    def emit(self, line: str) -> None:
+        self.lines.append(line)
+
+    def v(self, index: int) -> str:
+        # 読み込み前に参照するときだけ cpu から読む
+        if index not in self.loaded_vs:
+            self.emit(f"v{index:x} = vs[{index}]")
+            self.loaded_vs.add(index)
+        return f"v{index:x}"
+
+    def set_v(self, index: int) -> str:
+        self.loaded_vs.add(index)
+        self.dirty_vs.add(index)
+        return f"v{index:x}"
+
+    def i(self) -> str:
+        if not self.i_loaded:
+            self.emit("i = registers.i")
+            self.i_loaded = True
+        return "i"
+
+    def set_i(self) -> str:
+        self.i_loaded = True
+        self.i_dirty = True
+        return "i"
+
+    def write_back(self) -> None:
+        for index in sorted(self.dirty_vs):
+            self.emit(f"vs[{index}] = v{index:x}")
+        if self.i_dirty:
+            self.emit("registers.i = i")
+
+    def emit_instruction(self, opcode: int) -> bool:
+        """
+        opcode をブロック内に展開する。
+
+        Args:
+            opcode (int): 展開する opcode
+
+        Returns:
+            bool: 展開できた場合は True。ブロックを終わらせる命令の場合は False
+        """
+        # 分岐・スキップ・描画・メモリへの書き込み・未対応の命令などはブロックを終わらせる
+        for emitters, mask in self.emitters_with_mask:
+            emitter = emitters.get(opcode & mask)
+            if emitter is not None:
+                emitter(decode(opcode))
+                return True
+        return False
+
+    def clear_screen(self, decoder: Decoder) -> None:
+        self.emit("cpu.screen.clear()")
+
+    def set_value_to_vx(self, decoder: Decoder) -> None:
+        self.emit(f"{self.set_v(decoder.x)} = {decoder.nn:#04x}")
+
+    def add_value_to_vx(self, decoder: Decoder) -> None:
+        vx = self.v(decoder.x)
+        self.emit(f"{self.set_v(decoder.x)} = ({vx} + {decoder.nn:#04x}) & 0xFF")
+
+    def set_vy_value_to_vx(self, decoder: Decoder) -> None:
+        vy = self.v(decoder.y)
+        self.emit(f"{self.set_v(decoder.x)} = {vy}")
+
+    def logical_operation_to_vx(self, decoder: Decoder) -> None:
+        operator = {0x1: "|", 0x2: "&", 0x3: "^"}[decoder.n]
+        vx, vy = self.v(decoder.x), self.v(decoder.y)
+        self.emit(f"{self.set_v(decoder.x)} = {vx} {operator} {vy}")
+
+    def add_vy_value_to_vx(self, decoder: Decoder) -> None:
+        vx, vy = self.v(decoder.x), self.v(decoder.y)
+        self.emit(f"t = {vx} + {vy}")
+        self.emit(f"{self.set_v(decoder.x)} = t & 0xFF")
+        self.emit(f"{self.set_v(0xF)} = t >> 8")
+
+    def subtract_vy_value_from_vx(self, decoder: Decoder) -> None:
+        # 2の補数表現を使って vx - vy を計算し、bit8 を carry とする
+        vx, vy = self.v(decoder.x), self.v(decoder.y)
+        self.emit(f"t = {vx} + ({vy} ^ 0xFF) + 1")
+        self.emit(f"{self.set_v(decoder.x)} = t & 0xFF")
+        self.emit(f"{self.set_v(0xF)} = t >> 8")
+
+    def right_shift(self, decoder: Decoder) -> None:
+        vx = self.v(decoder.x)
+        self.emit(f"t = {vx} & 0x01")
+        self.emit(f"{self.set_v(decoder.x)} = {vx} >> 1")
+        self.emit(f"{self.set_v(0xF)} = t")
+
+    def subtract_vx_value_from_vy(self, decoder: Decoder) -> None:
+        vx, vy = self.v(decoder.x), self.v(decoder.y)
+        self.emit(f"t = {vy} + ({vx} ^ 0xFF) + 1")
+        self.emit(f"{self.set_v(decoder.x)} = t & 0xFF")
+        self.emit(f"{self.set_v(0xF)} = t >> 8")
+
+    def left_shift(self, decoder: Decoder) -> None:
+        vx = self.v(decoder.x)
+        self.emit(f"t = {vx} >> 7")
+        self.emit(f"{self.set_v(decoder.x)} = ({vx} << 1) & 0xFF")
+        self.emit(f"{self.set_v(0xF)} = t")
+
+    def set_address_to_i(self, decoder: Decoder) -> None:
+        self.emit(f"{self.set_i()} = {decoder.nnn():#05x}")
+
+    def set_random_to_vx(self, decoder: Decoder) -> None:
+        self.emit(f"{self.set_v(decoder.x)} = cpu.rng.next_byte() & {decoder.nn:#04x}")
+
+    def set_dt_value_to_vx(self, decoder: Decoder) -> None:
+        self.emit(f"{self.set_v(decoder.x)} = registers.dt")
+
+    def set_vx_value_to_dt(self, decoder: Decoder) -> None:
+        self.emit(f"registers.dt = {self.v(decoder.x)}")
+
+    def set_vx_value_to_st(self, decoder: Decoder) -> None:
+        self.emit(f"registers.st = {self.v(decoder.x)}")
+
+    def add_vx_value_to_i(self, decoder: Decoder) -> None:
+        vx, i = self.v(decoder.x), self.i()
+        self.emit(f"{self.set_i()} = ({i} + {vx}) & 0xFFFF")
+
+    def set_font_address_to_i(self, decoder: Decoder) -> None:
+        vx = self.v(decoder.x)
+        self.emit(f"{self.set_i()} = {FONT_START_ADDRESS:#05x} + ({vx} & 0xF) * 5")
+
+    def load_vx(self, decoder: Decoder) -> None:
+        i = self.i()
+        for index in range(decoder.x + 1):
+            self.emit(f"{self.set_v(index)} = ram[{i} + {index}]")
+
+
+def compile_block(cpu: Chip8CPU, start: int) -> Block:
+    """
+    start から始まる基本ブロックを1つの Python 関数にコンパイルする。
+
+    ブロックは分岐・スキップ・サブルーチン呼び出し/復帰・描画・メモリへの書き込みのいずれかで終わり、
+    終端の命令は Chip8CPU の命令をそのまま呼び出して実行する。
+
+    Args:
+        cpu (Chip8CPU): 実行する CPU
+        start (int): ブロックの先頭アドレス
+
+    Returns:
+        Block: コンパイル済みのブロック
+    """
+    builder = _BlockBuilder()
+    address = start
+    length = 0
+    terminator: int | None = None
+    while length < MAX_BLOCK_INSTRUCTIONS and address + 1 < MAX_SIZE:
+        opcode = cpu.memory.read(address) << 8 | cpu.memory.read(address + 1)
+        address += 2
+        length += 1
+        if not builder.emit_instruction(opcode):
+            terminator = opcode
+            break
+
+    builder.write_back()
+    builder.emit(f"cpu.instruction_count += {length}")
+    builder.emit(f"cpu.compiled_instruction_count += {length}")
+    builder.emit(f"registers.pc = {address:#05x}")
+    if terminator is not None:
+        # 命令は pc が次の命令を指している前提で実行する
+        builder.emit(f"cpu.dispatch_table[{terminator:#06x}](decode({terminator:#06x}))")
+
+    body = "\n".join(f"    {line}" for line in builder.lines)
+    prologue = "    registers = cpu.registers\n    vs = cpu.v\n    ram = cpu.memory.memory\n"
+    source = f"def block_{start:03x}(cpu):\n{prologue}{body}\n"
+    namespace = {"decode": decode}
+    exec(compile(source, f"<block {start:#05x}>", "exec"), namespace)
+    return Block(start, address, length, source, namespace[f"block_{start:03x}"])
+
+
+class BlockEngine:
+    """
+    基本ブロック単位でコンパイルして実行するエンジン。
+
+    コンパイル済みのブロックが読んでいるメモリに書き込みがあった場合はそのブロックを破棄する。
+    """
+
+    def __init__(self, cpu: Chip8CPU) -> None:
+        self.cpu = cpu
+        self.blocks: dict[int, Block] = {}
+        cpu.memory.write_listeners.append(self.invalidate)
+
+    def step(self, pressed_key: PressedKey = KEEP_KEYPAD) -> int:
+        cpu = self.cpu
+        program_counter = cpu.registers.pc
+        if program_counter < DEFAULT_PC_ADDRESS:
+            # プログラム領域より前はインタプリタで実行する
+            cpu.execute_instruction(pressed_key)
+            return 1
+
+        block = self.blocks.get(program_counter)
+        if block is None:
+            block = self.blocks[program_counter] = compile_block(cpu, program_counter)
+            cpu.memory.watched[block.start : block.end] = b"\x01" * (block.end - block.start)
+
+        if pressed_key is not KEEP_KEYPAD:
+            cpu.keypad.set_state(key_to_mask(pressed_key))
+        block.function(cpu)
+        return block.length
+
+    def invalidate(self, address: int, length: int) -> None:
+        """
+        address から length バイトの範囲にかかるブロックを破棄する。
+
+        Args:
+            address (int): 書き込みの先頭アドレス
+            length (int): 書き込んだバイト数
+        """
+        end = address + length
+        stale = [block for block in self.blocks.values() if block.start < end and address < block.end]
+        watched = self.cpu.memory.watched
+        for block in stale:
+            del self.blocks[block.start]
+            watched[block.start : block.end] = bytes(block.end - block.start)
+        # 破棄したブロックと重なっている残りのブロックの範囲を付け直す
+        for block in self.blocks.values():
+            if any(block.start < stale_block.end and stale_block.start < block.end for stale_block in stale):
+                watched[block.start : block.end] = b"\x01" * (block.end - block.start)
+
+
+def create_engine(cpu: Chip8CPU, name: str) -> Engine:
+    """
+    名前に対応する実行エンジンを作る。
+
+    Args:
+        cpu (Chip8CPU): 実行する CPU
+        name (str): "interp" または "block"
+
+    Returns:
+        Engine: 実行エンジン
+    """
+    match name:
+        case "interp":
+            return InterpreterEngine(cpu)
+        case "block":
+            return BlockEngine(cpu)
+        case _:
+            raise ValueError(f"unknown engine: {name}")
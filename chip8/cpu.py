@@ -1,22 +1,61 @@
-import random
+import struct
 import time
 from collections.abc import Callable
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum, auto
 from typing import TypeAlias
 
 import screen
-from memory import Memory
-from register import Register8, Register16
-from screen import Point, VirtualScreen
+from keypad import KEEP_KEYPAD, Keypad, PressedKey, key_to_mask
+from memory import MAX_SIZE, Memory
+from register import FieldRegisterView, RegisterFile, VRegisterView
+from rng import ByteRandom
+from screen import Screen, VirtualScreen
+from tracing import TextSink, TraceSink
 
 DEFAULT_PC_ADDRESS = 0x200
 FONT_START_ADDRESS = 0x000
+OPCODE_COUNT = 0x10000
+# _idle_loop の値のうち、自分自身へのジャンプを表すもの (0-15 は delay timer を待つループの X)
+_JUMP_TO_SELF = 0x10
+
+SNAPSHOT_MAGIC = b"C8SS"
+SNAPSHOT_VERSION = 2
+SNAPSHOT_ROW_BYTES = Screen.WIDTH // 8
+# magic, version, V0-VF, I, PC, SP, DT, ST, state, stack, 乱数の seed と position,
+# メモリ, 画面 (1行 SNAPSHOT_ROW_BYTES バイト)
+# メモリと画面は常に末尾に置く (rewind.py はこの位置で差分を取る)
+SNAPSHOT_FORMAT = struct.Struct(f"<4sB16sHHBBBB16HQQ{MAX_SIZE}s{Screen.HEIGHT * SNAPSHOT_ROW_BYTES}s")
+SNAPSHOT_FRAMEBUFFER_OFFSET = SNAPSHOT_FORMAT.size - Screen.HEIGHT * SNAPSHOT_ROW_BYTES
+SNAPSHOT_RAM_OFFSET = SNAPSHOT_FRAMEBUFFER_OFFSET - MAX_SIZE
+# 画面の各行は左端を最上位ビットとするビッグエンディアンの 64 ビット整数
+_FRAMEBUFFER_FORMAT = struct.Struct(f">{Screen.HEIGHT}Q")
+
+
+@dataclass(frozen=True, slots=True)
+class Decoder:
+    """
+    opcode を X, Y, N, NN, NNN に分解したもの。
 
+    分解は生成時に1回だけ行う。同じ opcode の Decoder は decode() で使い回すので、
+    命令の実行ごとにオブジェクトやタプルを作らずにオペランドを参照できる。
+    """
 
-@dataclass
-class Decoder:
     opcode: int
+    x: int = field(init=False)
+    y: int = field(init=False)
+    n: int = field(init=False)
+    nn: int = field(init=False)
+    # nnn() はメソッドなので、ハンドラはこちらを参照する
+    _nnn: int = field(init=False)
+
+    def __post_init__(self) -> None:
+        # frozen なので object.__setattr__ で初期化する
+        object.__setattr__(self, "x", (self.opcode & 0x0F00) >> 8)
+        object.__setattr__(self, "y", (self.opcode & 0x00F0) >> 4)
+        object.__setattr__(self, "n", self.opcode & 0x000F)
+        object.__setattr__(self, "nn", self.opcode & 0x00FF)
+        object.__setattr__(self, "_nnn", self.opcode & 0x0FFF)
 
     def x_y(self) -> tuple[int, int]:
         """
@@ -25,9 +64,7 @@ class Decoder:
         Returns:
             tuple[int, int]: X, Y
         """
-        x = (self.opcode & 0x0F00) >> 8
-        y = (self.opcode & 0x00F0) >> 4
-        return (x, y)
+        return (self.x, self.y)
 
     def x_y_n(self) -> tuple[int, int, int]:
         """
@@ -36,10 +73,7 @@ class Decoder:
         Returns:
             tuple[int, int, int]: X, Y, N
         """
-        x = (self.opcode & 0x0F00) >> 8
-        y = (self.opcode & 0x00F0) >> 4
-        n = self.opcode & 0x000F
-        return (x, y, n)
+        return (self.x, self.y, self.n)
 
     def x_nn(self) -> tuple[int, int]:
         """
@@ -48,29 +82,48 @@ class Decoder:
         Returns:
             tuple[int, int]: X, NN
         """
-        x = (self.opcode & 0x0F00) >> 8
-        nn = self.opcode & 0x00FF
-        return (x, nn)
+        return (self.x, self.nn)
 
-    def nnn(self) -> int:
+    def x_only(self) -> int:
         """
-        16ビットの opecode (0x_NNN) から NNN を取得する。
+        16ビットの opecode (0x_X__) から X を取得する。
 
 
         Returns:
-            int: NNN
+            int: X
         """
-        return self.opcode & 0x0FFF
+        return self.x
 
-    def x_only(self) -> int:
+    def nnn(self) -> int:
         """
-        16ビットの opecode (0x_X__) から X を取得する。
+        16ビットの opecode (0x_NNN) から NNN を取得する。
 
 
         Returns:
-            int: X
+            int: NNN
         """
-        return (self.opcode & 0x0F00) >> 8
+        return self._nnn
+
+
+_DECODERS: list[Decoder | None] = [None] * OPCODE_COUNT
+
+
+def decode(opcode: int) -> Decoder:
+    """
+    opcode の Decoder を返す。
+
+    Decoder は opcode ごとに1回だけ作ってキャッシュする。
+
+    Args:
+        opcode (int): 16ビットの opcode
+
+    Returns:
+        Decoder: opcode を分解したもの
+    """
+    decoder = _DECODERS[opcode]
+    if decoder is None:
+        decoder = _DECODERS[opcode] = Decoder(opcode)
+    return decoder
 
 
 class CPUState(Enum):
@@ -78,49 +131,48 @@ class CPUState(Enum):
     WAITING = auto()
 
 
-KEY_MAP = {
-    "1": 0x1,
-    "2": 0x2,
-    "3": 0x3,
-    "4": 0xC,
-    "q": 0x4,
-    "w": 0x5,
-    "e": 0x6,
-    "r": 0xD,
-    "a": 0x7,
-    "s": 0x8,
-    "d": 0x9,
-    "f": 0xE,
-    "z": 0xA,
-    "x": 0x0,
-    "c": 0xB,
-    "v": 0xF,
-}
-
-
-def _get_key_value(key: str | None) -> int | None:
-    match key:
-        case None:
-            return None
-        case _:
-            key_lowered = key.lower()
-            if key_lowered not in KEY_MAP.keys():
-                return None
-            return KEY_MAP[key_lowered]
+def _matching_opcodes(key: int, mask: int) -> slice:
+    """
+    opcode & mask == key となる opcode の範囲を slice で返す。
+
+    mask で 0 になっているビットは連続している必要がある (0xF000, 0xF00F, 0xF0FF, 0xFFFF など)。
+
+    Args:
+        key (int): マスク後の opcode
+        mask (int): opcode のマスク
+
+    Returns:
+        slice: 対象となる opcode の範囲
+    """
+    free_bits = ~mask & 0xFFFF
+    if free_bits == 0:
+        return slice(key, key + 1)
+    step = free_bits & -free_bits
+    if (free_bits + step) & free_bits != 0:
+        raise ValueError(f"mask must have contiguous free bits: {mask:#06x}")
+    return slice(key, key + free_bits + step, step)
 
 
 class Chip8CPU:
-    def __init__(self, memory: Memory, screen: VirtualScreen) -> None:
+    def __init__(
+        self, memory: Memory, screen: Screen, rng: ByteRandom | None = None, keypad: Keypad | None = None
+    ) -> None:
         self.memory = memory
         self.screen = screen
+        # CXNN の乱数。同じ seed なら同じ実行になる
+        self.rng = rng or ByteRandom()
+        self.keypad = keypad or Keypad()
 
         self.stack = [0] * 16
-        self.rg_vs = [Register8() for _ in range(16)]
-        self.rg_i = Register16()
-        self.rg_pc = Register16(DEFAULT_PC_ADDRESS)
-        self.rg_sp = Register8()
-        self.rg_dt = Register8()
-        self.rg_st = Register8()
+        # 命令は registers と v を直接読み書きする。rg_* は外から Register として扱うためのもの
+        self.registers = RegisterFile(DEFAULT_PC_ADDRESS)
+        self.v = self.registers.v
+        self.rg_vs = [VRegisterView(self.registers, index) for index in range(16)]
+        self.rg_i = FieldRegisterView(self.registers, "i", 16)
+        self.rg_pc = FieldRegisterView(self.registers, "pc", 16)
+        self.rg_sp = FieldRegisterView(self.registers, "sp", 8)
+        self.rg_dt = FieldRegisterView(self.registers, "dt", 8)
+        self.rg_st = FieldRegisterView(self.registers, "st", 8)
 
         self.state = CPUState.RUNNING
 
@@ -161,7 +213,7 @@ class Chip8CPU:
 
         self.instructions_F0FF: InstructionTable = {
             0xF007: self.set_dt_value_to_vx,  # FX07 - ld vx, dt
-            0xF00A: self.wait_for_key,  # FX0A - ld vx, key TODO
+            0xF00A: self.wait_for_key,  # FX0A - ld vx, key
             0xF015: self.set_vx_value_to_dt,  # FX15 - ld dt, vx
             0xF018: self.set_vx_value_to_st,  # FX18 - ld st, vx
             0xF01E: self.add_vx_value_to_i,  # FX1E - add i, vx
@@ -171,12 +223,54 @@ class Chip8CPU:
             0xF065: self.load_vx,  # FX65 - ld vx, [i]
         }
 
-        KeyboardInstruction: TypeAlias = Callable[[Decoder, str | None], None]
-        self.keyboard_instructions: dict[int, KeyboardInstruction] = {
+        # キーボード命令は self.keypad を参照する
+        self.keyboard_instructions: InstructionTable = {
             0xE09E: self.skip_if_key_pressed,  # E09E - skp vx
             0xE0A1: self.skip_if_key_not_pressed,  # E0A1 - sknp vx
         }
 
+        # FX0A で待ち始めたときに押されていたキー。これらは一度離すまで入力とみなさない
+        self._held_keys = 0
+        # 命令がスケジューラに今のフレームの実行を中断してほしいとき True にする
+        # (FX0A のキー入力待ち、アイドルループの検出)
+        self.yielded = False
+        self._idle_loop: int | None = None
+        self.tracer: TraceSink | None = None
+        self.unknown_opcode_count = 0
+        self.instruction_count = 0
+        # skip_idle_loop() で実行したことにした命令数 (instruction_count にも含む)
+        self.skipped_instruction_count = 0
+        # コンパイル済みのブロックで実行した命令数 (instruction_count にも含む)
+        self.compiled_instruction_count = 0
+        self.cache_misses = 0
+        self.dispatch_table = self._build_dispatch_table()
+        # memory.decoded には self の命令が入るので、他の CPU が残したものは捨てる
+        self.memory.clear_decoded()
+
+    def _build_dispatch_table(self) -> list[Callable[[Decoder], None]]:
+        """
+        全 65536 通りの opcode に対応する命令を引けるテーブルを作る。
+
+        優先度の低いマスクから順に書き込み、優先度の高いマスクで上書きする。
+        どのテーブルにも一致しない opcode は unknown_instruction になる。
+
+        Returns:
+            list[Callable[[Decoder], None]]: opcode をインデックスとする命令のテーブル
+        """
+        table: list[Callable[[Decoder], None]] = [self.unknown_instruction] * OPCODE_COUNT
+        instructions_with_mask = [
+            (self.keyboard_instructions, 0xF0FF),
+            (self.instructions_F0FF, 0xF0FF),
+            (self.instructions_F00F, 0xF00F),
+            (self.instructions_F000, 0xF000),
+            (self.instructions_FFFF, 0xFFFF),
+        ]
+        for instructions, mask in instructions_with_mask:
+            for key, instruction in instructions.items():
+                opcodes = _matching_opcodes(key, mask)
+                table[opcodes] = [instruction] * len(table[opcodes])
+        return table
+
     def __str__(self) -> str:
         return "\n".join(
             [
@@ -190,264 +284,370 @@ class Chip8CPU:
             ]
         )
 
-    def _get_opcode(self) -> int:
+    @property
+    def is_waiting(self) -> bool:
+        """
+        FX0A でキー入力を待っているかどうか。
+        """
+        return self.state is CPUState.WAITING
+
+    @property
+    def cache_hits(self) -> int:
+        # skip_idle_loop() で実行したことにした命令とコンパイル済みのブロックで実行した命令は
+        # memory.decoded を引いていないので数えない
+        interpreted = self.instruction_count - self.skipped_instruction_count - self.compiled_instruction_count
+        return interpreted - self.cache_misses
+
+    def _fetch_decoded(self, program_counter: int) -> tuple[Callable[[Decoder], None], Decoder]:
         """
-        メモリから pc + 2 分読み込んで opcode を取得する。
+        program_counter の命令をメモリから読み込んでデコードする。
 
-        この関数実行後に pc は2インクリメントされる。
+        DEFAULT_PC_ADDRESS 以降の命令は memory.decoded にキャッシュする。
+
+        Args:
+            program_counter (int): 命令のアドレス
 
         Returns:
-            int: opcode
+            tuple[Callable[[Decoder], None], Decoder]: 実行する命令とそのオペランド
         """
-        program_counter = self.rg_pc.read()
-        # メモリは8bitずつ入っているので1命令のために2回読み込む
+        self.cache_misses += 1
         opcode = self.memory.read(program_counter) << 8 | self.memory.read(program_counter + 1)
-        self.rg_pc.write(program_counter + 2)
-        return opcode
+        decoded = (self.dispatch_table[opcode], _DECODERS[opcode] or decode(opcode))
+        if program_counter >= DEFAULT_PC_ADDRESS:
+            self.memory.decoded[program_counter] = decoded
+        return decoded
+
+    def execute_instruction(self, pressed_key: PressedKey = KEEP_KEYPAD) -> None:
+        registers = self.registers
+        program_counter = registers.pc
+        instruction, decoder = self.memory.decoded[program_counter] or self._fetch_decoded(program_counter)
+        registers.pc = program_counter + 2
+        self.instruction_count += 1
+        if pressed_key is not KEEP_KEYPAD:
+            # 文字でキーを渡す以前の API との互換用。そのキーだけが押されている状態にし、None ならすべて離す
+            self.keypad.set_state(key_to_mask(pressed_key))
+        instruction(decoder)
+
+    def set_tracer(self, tracer: TraceSink | None) -> None:
+        """
+        命令の実行ごとに状態を記録する出力先を設定する。
 
-    def execute_instruction(self, pressed_key: str | None = None) -> None:
-        opcode = self._get_opcode()
-        print(f"[DEBUG] pressed_key: {pressed_key}")
-        print(f"[DEBUG] opecode: {opcode:04x}")
+        記録するかどうかは毎回判定せず、execute_instruction を記録付きのものに差し替える。
+        None を渡すと記録なしの execute_instruction に戻す。
 
-        decoder = Decoder(opcode)
-        instructions_with_mask = [
-            (self.instructions_FFFF, 0xFFFF),
-            (self.instructions_F000, 0xF000),
-            (self.instructions_F00F, 0xF00F),
-            (self.instructions_F0FF, 0xF0FF),
-        ]
+        Args:
+            tracer (TraceSink | None): 記録の出力先
+        """
+        self.tracer = tracer
+        if tracer is None:
+            self.__dict__.pop("execute_instruction", None)
+        else:
+            self.execute_instruction = self._execute_instruction_traced  # type: ignore[method-assign]
+
+    def _execute_instruction_traced(self, pressed_key: PressedKey = KEEP_KEYPAD) -> None:
+        registers = self.registers
+        program_counter = registers.pc
+        opcode = self.memory.read(program_counter) << 8 | self.memory.read(program_counter + 1)
+        self.tracer.write(program_counter, opcode, registers.i, bytes(self.v))  # type: ignore[union-attr]
+        Chip8CPU.execute_instruction(self, pressed_key)
 
-        for instructions, mask in instructions_with_mask:
-            match instructions.get(opcode & mask):
-                case None:
-                    pass
-                case instruction:
-                    instruction(decoder)
-                    break
-
-        match self.keyboard_instructions.get(opcode & 0xF0FF):
-            case None:
-                pass
-            case keyboard_instruction:
-                keyboard_instruction(decoder, pressed_key)
+    def snapshot(self) -> bytes:
+        """
+        CPU・メモリ・画面の状態を SNAPSHOT_FORMAT のバイト列にする。
+
+        Returns:
+            bytes: restore() で復元できるバイト列
+        """
+        registers = self.registers
+        return SNAPSHOT_FORMAT.pack(
+            SNAPSHOT_MAGIC,
+            SNAPSHOT_VERSION,
+            bytes(self.v),
+            registers.i,
+            registers.pc,
+            registers.sp,
+            registers.dt,
+            registers.st,
+            self.state.value,
+            *self.stack,
+            self.rng.seed,
+            self.rng.position,
+            bytes(self.memory.memory),
+            _FRAMEBUFFER_FORMAT.pack(*self.screen.packed_rows()),
+        )
+
+    def restore(self, data: bytes | bytearray | memoryview) -> None:
+        """
+        snapshot() で作ったバイト列から CPU・メモリ・画面の状態を復元する。
+
+        Args:
+            data (bytes | bytearray | memoryview): snapshot() の戻り値
+
+        Raises:
+            ValueError: 形式やバージョンが違う場合
+        """
+        if len(data) != SNAPSHOT_FORMAT.size:
+            raise ValueError(f"snapshot must be {SNAPSHOT_FORMAT.size} bytes: {len(data)}")
+        magic, version, vs, i, pc, sp, dt, st, state, *rest = SNAPSHOT_FORMAT.unpack(data)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"not a snapshot: {magic!r}")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"unsupported snapshot version: {version}")
+        stack, (seed, position, ram, framebuffer) = rest[:16], rest[16:]
+
+        registers = self.registers
+        # v は rg_vs や生成したブロックと共有しているので中身だけ書き換える
+        self.v[:] = vs
+        registers.i, registers.pc, registers.sp, registers.dt, registers.st = i, pc, sp, dt, st
+        self.state = CPUState(state)
+        self.stack[:] = stack
+        self.rng.set_state(seed, position)
+        self._held_keys = self.keypad.pressed
+        self.memory.restore(ram)
+        self.screen.load_packed_rows(_FRAMEBUFFER_FORMAT.unpack(framebuffer))
+
+    def tick_timers(self) -> None:
+        """
+        delay timer と sound timer を1つ減らす。60Hz で呼び出す。
+        """
+        registers = self.registers
+        if registers.dt > 0:
+            registers.dt -= 1
+        if registers.st > 0:
+            registers.st -= 1
+
+    def unknown_instruction(self, decoder: Decoder) -> None:
+        # 0NNN (SYS addr) など未対応の命令は何もせず、回数だけ数えておく
+        self.unknown_opcode_count += 1
 
     def clear_screen(self, decoder: Decoder) -> None:
         self.screen.clear()
 
     def return_from_subroutine(self, decoder: Decoder) -> None:
-        sp = self.rg_sp.read() - 1
-        return_address = self.stack[sp]
-        self.rg_pc.write(return_address)
-        self.rg_sp.write(sp)
+        registers = self.registers
+        sp = registers.sp - 1
+        if sp < 0:
+            raise IndexError(f"stack underflow at {registers.pc - 2:#05x}")
+        registers.sp = sp
+        registers.pc = self.stack[sp]
 
     def jump_to_address(self, decoder: Decoder) -> None:
-        address = decoder.nnn()
-        self.rg_pc.write(address)
+        registers = self.registers
+        address = decoder._nnn
+        # 自分自身へのジャンプと FX07; 3X00; 1NNN のループはタイマーが進むまで状態が変わらない
+        if address == registers.pc - 2:
+            self._idle_loop = _JUMP_TO_SELF
+            self.yielded = True
+        elif address == registers.pc - 6:
+            self._detect_timer_wait_loop(address)
+        registers.pc = address
+
+    def _detect_timer_wait_loop(self, address: int) -> None:
+        # address: FX07, address + 2: 3X00 (address + 4 の 1NNN で address に戻る)
+        ram = self.memory.memory
+        x = ram[address] & 0xF
+        if ram[address : address + 4] == bytes((0xF0 | x, 0x07, 0x30 | x, 0x00)):
+            self._idle_loop = x
+            self.yielded = True
+
+    def skip_idle_loop(self, max_instructions: int) -> int:
+        """
+        直前の 1NNN で検出したアイドルループを、max_instructions 命令以内で何周か実行したことにする。
+
+        ループを1周しても状態は変わらない (delay timer を待つループは vx に dt が入るだけ) ので、
+        周回分の命令を数えるだけで、実際に実行した場合と同じ状態になる。
+        命令を記録している場合は、すべての命令を記録するために何もしない。
+
+        Args:
+            max_instructions (int): 実行したことにする命令数の上限
+
+        Returns:
+            int: 実行したことにした命令数
+        """
+        idle_loop = self._idle_loop
+        self._idle_loop = None
+        if idle_loop is None or self.tracer is not None:
+            return 0
+        if idle_loop == _JUMP_TO_SELF:
+            count = max_instructions
+        else:
+            # dt が 0 なら次の周でループを抜ける
+            dt = self.registers.dt
+            count = max_instructions // 3 * 3 if dt > 0 else 0
+            if count:
+                self.v[idle_loop] = dt
+        self.instruction_count += count
+        self.skipped_instruction_count += count
+        return count
 
     def call_subroutine(self, decoder: Decoder) -> None:
-        subroutine_address = decoder.nnn()
-        sp = self.rg_sp.read()
-        self.stack[sp] = self.rg_pc.read()
-        self.rg_sp.write(sp + 1)
-        self.rg_pc.write(subroutine_address)
+        registers = self.registers
+        sp = registers.sp
+        if sp >= len(self.stack):
+            raise IndexError(f"stack overflow at {registers.pc - 2:#05x}")
+        self.stack[sp] = registers.pc
+        registers.sp = sp + 1
+        registers.pc = decoder._nnn
 
     def skip_if_vx_eq_value(self, decoder: Decoder) -> None:
-        x, value = decoder.x_nn()
-        if self.rg_vs[x].read() == value:
-            self.rg_pc.write(self.rg_pc.read() + 2)
+        if self.v[decoder.x] == decoder.nn:
+            self.registers.pc += 2
 
     def skip_if_vx_neq_value(self, decoder: Decoder) -> None:
-        x, value = decoder.x_nn()
-        if self.rg_vs[x].read() != value:
-            self.rg_pc.write(self.rg_pc.read() + 2)
+        if self.v[decoder.x] != decoder.nn:
+            self.registers.pc += 2
 
     def skip_if_vx_eq_vy(self, decoder: Decoder) -> None:
-        x, y = decoder.x_y()
-        if self.rg_vs[x].read() == self.rg_vs[y].read():
-            self.rg_pc.write(self.rg_pc.read() + 2)
+        v = self.v
+        if v[decoder.x] == v[decoder.y]:
+            self.registers.pc += 2
 
     def set_value_to_vx(self, decoder: Decoder) -> None:
-        x, value = decoder.x_nn()
-        self.rg_vs[x].write(value)
+        self.v[decoder.x] = decoder.nn
 
     def add_value_to_vx(self, decoder: Decoder) -> None:
-        x, value = decoder.x_nn()
-        self.rg_vs[x].write(self.rg_vs[x].read() + value)
+        v, x = self.v, decoder.x
+        v[x] = (v[x] + decoder.nn) & 0xFF
 
     def set_vy_value_to_vx(self, decoder: Decoder) -> None:
-        x, y = decoder.x_y()
-        self.rg_vs[x].write(self.rg_vs[y].read())
+        v = self.v
+        v[decoder.x] = v[decoder.y]
 
     def logical_or_to_vx(self, decoder: Decoder) -> None:
-        x, y = decoder.x_y()
-        result = self.rg_vs[x].read() | self.rg_vs[y].read()
-        self.rg_vs[x].write(result)
+        v = self.v
+        v[decoder.x] |= v[decoder.y]
 
     def logical_and_to_vx(self, decoder: Decoder) -> None:
-        x, y = decoder.x_y()
-        result = self.rg_vs[x].read() & self.rg_vs[y].read()
-        self.rg_vs[x].write(result)
+        v = self.v
+        v[decoder.x] &= v[decoder.y]
 
     def xor_to_vx(self, decoder: Decoder) -> None:
-        x, y = decoder.x_y()
-        result = self.rg_vs[x].read() ^ self.rg_vs[y].read()
-        self.rg_vs[x].write(result)
+        v = self.v
+        v[decoder.x] ^= v[decoder.y]
 
     def add_vy_value_to_vx(self, decoder: Decoder) -> None:
         # carry があったとき vf に 1 をセットする
-        x, y = decoder.x_y()
-        result = self.rg_vs[x].read() + self.rg_vs[y].read()
-        carry = 1 if (result & 0x100) == 0x100 else 0
-        self.rg_vs[x].write(result & 0xFF)
-        self.rg_vs[0xF].write(carry)
+        v = self.v
+        result = v[decoder.x] + v[decoder.y]
+        v[decoder.x] = result & 0xFF
+        v[0xF] = result >> 8
 
     def subtract_vy_value_from_vx(self, decoder: Decoder) -> None:
         # 8XY5 - vx -= vy, if vx > vy then vf = 1 else vf = 0
         # vf は carry フラグと考えると加算のときと合う
-        x, y = decoder.x_y()
-        x_value = self.rg_vs[x].read()
-        y_value = self.rg_vs[y].read()
+        v = self.v
+        x_value = v[decoder.x]
+        y_value = v[decoder.y]
 
         # 2の補数表現を使って vx - yv を計算
         # python のビット反転は -(x + 1) と同じ
         # https://docs.python.org/ja/3/reference/expressions.html#unary-arithmetic-and-bitwise-operations
         result = x_value + (~y_value & 0xFF) + 1
-        carry = 1 if (result & 0x100) == 0x100 else 0
-        self.rg_vs[x].write(result & 0xFF)
-        self.rg_vs[0xF].write(carry)
+        v[decoder.x] = result & 0xFF
+        v[0xF] = result >> 8
 
     def right_shift(self, decoder: Decoder) -> None:
         # 8XY6 - vx >>= 1, vf には vx の最下位ビットを格納
-        x, _ = decoder.x_y()
-        x_value = self.rg_vs[x].read()
-
-        rightmost_bit = x_value & 0x01
-        result = x_value >> 1
-        self.rg_vs[x].write(result & 0xFF)
-        self.rg_vs[0xF].write(rightmost_bit)
+        v = self.v
+        x_value = v[decoder.x]
+        v[decoder.x] = x_value >> 1
+        v[0xF] = x_value & 0x01
 
     def subtract_vx_value_from_vy(self, decoder: Decoder) -> None:
         # 8XY7 - vx := vy - vx, if vy > vx then vf = 1 else vf = 0
-        x, y = decoder.x_y()
-        x_value = self.rg_vs[x].read()
-        y_value = self.rg_vs[y].read()
+        v = self.v
+        x_value = v[decoder.x]
+        y_value = v[decoder.y]
 
         # 2の補数表現を使って vy - yx を計算
         # python のビット反転は -(x + 1) と同じ
         # https://docs.python.org/ja/3/reference/expressions.html#unary-arithmetic-and-bitwise-operations
         result = y_value + (~x_value & 0xFF) + 1
-        carry = 1 if (result & 0x100) == 0x100 else 0
-        self.rg_vs[x].write(result & 0xFF)
-        self.rg_vs[0xF].write(carry)
+        v[decoder.x] = result & 0xFF
+        v[0xF] = result >> 8
 
     def left_shift(self, decoder: Decoder) -> None:
         # 8XYE - vx <<= 1, vf には vx の最上位ビットを格納
-        x, _ = decoder.x_y()
-        x_value = self.rg_vs[x].read()
-
-        leftmost_bit = (x_value & 0x80) >> 7
-        result = x_value << 1
-        self.rg_vs[x].write(result & 0xFF)
-        self.rg_vs[0xF].write(leftmost_bit)
+        v = self.v
+        x_value = v[decoder.x]
+        v[decoder.x] = (x_value << 1) & 0xFF
+        v[0xF] = x_value >> 7
 
     def skip_if_vx_neq_vy(self, decoder: Decoder) -> None:
-        x, y = decoder.x_y()
-        if self.rg_vs[x].read() != self.rg_vs[y].read():
-            self.rg_pc.write(self.rg_pc.read() + 2)
+        v = self.v
+        if v[decoder.x] != v[decoder.y]:
+            self.registers.pc += 2
 
     def set_address_to_i(self, decoder: Decoder) -> None:
-        address = decoder.nnn()
-        self.rg_i.write(address)
+        self.registers.i = decoder._nnn
 
     def jump_to_v0_plus(self, decoder: Decoder) -> None:
-        nnn = decoder.nnn()
-        address = self.rg_vs[0].read() + nnn
-        self.rg_pc.write(address)
+        self.registers.pc = self.v[0] + decoder._nnn
 
     def set_random_to_vx(self, decoder: Decoder) -> None:
-        x, nn = decoder.x_nn()
-        value = random.randint(0, 255) & nn
-        self.rg_vs[x].write(value)
+        self.v[decoder.x] = self.rng.next_byte() & decoder.nn
 
     def draw_sprite(self, decoder: Decoder) -> None:
         # スプライトは幅8bit高さN
-        x, y, n = decoder.x_y_n()
-        address = self.rg_i.read()
-        _bytes = [self.memory.read(i) for i in range(address, address + n)]
-        x_value = self.rg_vs[x].read()
-        y_value = self.rg_vs[y].read()
-        sprite = screen.bytes_to_sprite(_bytes)
-        collision_flag = self.screen.draw_sprite(Point(x_value, y_value), sprite)
-        self.rg_vs[0xF].write(collision_flag)
-
-    def skip_if_key_pressed(self, decoder: Decoder, pressed_key: str | None) -> None:
-        x = decoder.x_only()
-        x_value = self.rg_vs[x].read()
-        match _get_key_value(pressed_key):
-            case key_value if key_value == x_value:
-                self.rg_pc.write(self.rg_pc.read() + 2)
-            case _:
-                return
-
-    def skip_if_key_not_pressed(self, decoder: Decoder, pressed_key: str | None) -> None:
-        x = decoder.x_only()
-        x_value = self.rg_vs[x].read()
-        match _get_key_value(pressed_key):
-            case key_value if key_value != x_value:
-                self.rg_pc.write(self.rg_pc.read() + 2)
-            case _:
-                return
+        v = self.v
+        sprite = self.memory.read_bytes(self.registers.i, decoder.n)
+        v[0xF] = self.screen.draw_bytes(v[decoder.x], v[decoder.y], sprite)
+
+    def skip_if_key_pressed(self, decoder: Decoder) -> None:
+        # vx が 16 以上の場合はビットが立たないので押されていない扱いになる
+        if self.keypad.pressed >> self.v[decoder.x] & 1:
+            self.registers.pc += 2
+
+    def skip_if_key_not_pressed(self, decoder: Decoder) -> None:
+        if not self.keypad.pressed >> self.v[decoder.x] & 1:
+            self.registers.pc += 2
 
     def set_dt_value_to_vx(self, decoder: Decoder) -> None:
-        x = decoder.x_only()
-        self.rg_vs[x].write(self.rg_dt.read())
+        self.v[decoder.x] = self.registers.dt
 
     def wait_for_key(self, decoder: Decoder) -> None:
-        # TODO
-        pass
+        # 新しく押されたキーがあるまで WAITING のまま同じ命令を実行し直す
+        pressed = self.keypad.pressed
+        if self.state is CPUState.RUNNING:
+            self.state = CPUState.WAITING
+            self._held_keys = pressed
+        new_keys = pressed & ~self._held_keys
+        # 待ち始めたときに押されていたキーも、一度離せば次に押したときに入力とみなす
+        self._held_keys &= pressed
+        if new_keys:
+            self.v[decoder.x] = (new_keys & -new_keys).bit_length() - 1
+            self.state = CPUState.RUNNING
+        else:
+            self.registers.pc -= 2
+            self.yielded = True
 
     def set_vx_value_to_dt(self, decoder: Decoder) -> None:
-        x = decoder.x_only()
-        self.rg_dt.write(self.rg_vs[x].read())
+        self.registers.dt = self.v[decoder.x]
 
     def set_vx_value_to_st(self, decoder: Decoder) -> None:
-        x = decoder.x_only()
-        self.rg_st.write(self.rg_vs[x].read())
+        self.registers.st = self.v[decoder.x]
 
     def add_vx_value_to_i(self, decoder: Decoder) -> None:
-        x = decoder.x_only()
-        self.rg_i.write(self.rg_i.read() + self.rg_vs[x].read())
+        registers = self.registers
+        registers.i = (registers.i + self.v[decoder.x]) & 0xFFFF
 
     def set_font_address_to_i(self, decoder: Decoder) -> None:
-        x = decoder.x_only()
-        x_value = self.rg_vs[x].read()
+        x_value = self.v[decoder.x]
         # NOTE: font は1文字5バイトで順番に格納されているので、vxの値を5倍にする
-        address = FONT_START_ADDRESS + (x_value & 0xF) * 5
-        self.rg_i.write(address)
+        self.registers.i = FONT_START_ADDRESS + (x_value & 0xF) * 5
 
     def bcd(self, decoder: Decoder) -> None:
-        x = decoder.x_only()
-        x_value = self.rg_vs[x].read()
-        address = self.rg_i.read()
+        x_value = self.v[decoder.x]
         hundreds, tens, ones = x_value // 100, (x_value // 10) % 10, x_value % 10
-        self.memory.write(address, hundreds)
-        self.memory.write(address + 1, tens)
-        self.memory.write(address + 2, ones)
+        # write_bytes で書き込んだ範囲のデコード済み命令もまとめて無効化される
+        self.memory.write_bytes(self.registers.i, [hundreds, tens, ones])
 
     def save_vx(self, decoder: Decoder) -> None:
-        target = decoder.x_only()
-        address = self.rg_i.read()
-        for i in range(0, target + 1):
-            rg_x_value = self.rg_vs[i].read()
-            self.memory.write(address + i, rg_x_value)
+        self.memory.write_bytes(self.registers.i, self.v[: decoder.x + 1])
 
     def load_vx(self, decoder: Decoder) -> None:
-        target = decoder.x_only()
-        address = self.rg_i.read()
-        for i in range(0, target + 1):
-            value = self.memory.read(address + i)
-            self.rg_vs[i].write(value)
+        count = decoder.x + 1
+        self.v[:count] = self.memory.read_bytes(self.registers.i, count)
 
 
 def write_instruction(memory: Memory, address: int, code: int) -> int:
@@ -465,13 +665,11 @@ if __name__ == "__main__":
 
     memory = Memory()
     memory.load_fonts(FONT_START_ADDRESS)
-
-    with open(filename, "rb") as f:
-        for i, byte in enumerate(f.read()):
-            memory.write(DEFAULT_PC_ADDRESS + i, byte)
+    memory.load_rom(filename, DEFAULT_PC_ADDRESS)
 
     v_screen = VirtualScreen()
     cpu = Chip8CPU(memory, v_screen)
+    cpu.set_tracer(TextSink())
 
     while True:
         cpu.execute_instruction()
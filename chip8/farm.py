@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from compiler import ENGINES, create_engine
+from cpu import DEFAULT_PC_ADDRESS, FONT_START_ADDRESS, Chip8CPU
+from memory import MAX_SIZE, Memory
+from replay import screen_hash
+from rng import ByteRandom
+from scheduler import DEFAULT_CPU_HZ, FRAME_RATE, FrameScheduler
+from screen import SCREEN_BACKENDS, create_screen
+
+# 実行を終えた理由
+# budget: 上限まで実行した, halted: 自分自身へのジャンプで止まった,
+# waiting_for_key: FX0A でキー入力を待っている (ヘッドレスでは入力がないので進まない),
+# crash: 実行中に例外が起きた, invalid_rom: ROM を読み込めなかった
+REASONS = ("budget", "halted", "waiting_for_key", "crash", "invalid_rom")
+MAX_ROM_SIZE = MAX_SIZE - DEFAULT_PC_ADDRESS
+
+
+@dataclass(frozen=True)
+class FarmOptions:
+    """
+    各 ROM の実行条件。ワーカーのプロセスに渡すので pickle できる値だけを持つ。
+    """
+
+    max_instructions: int | None = None
+    max_frames: int | None = None
+    max_seconds: float | None = None
+    instructions_per_frame: int = DEFAULT_CPU_HZ // FRAME_RATE
+    engine: str = "interp"
+    screen: str = "packed"
+    seed: int | None = None
+
+
+def halt_reason(cpu: Chip8CPU) -> str | None:
+    """
+    入力のないヘッドレス実行で、これ以上状態が変わらない場合にその理由を返す。
+
+    Args:
+        cpu (Chip8CPU): フレームを実行し終えた CPU
+
+    Returns:
+        str | None: "halted" または "waiting_for_key"。実行を続けられる場合は None
+    """
+    if cpu.is_waiting:
+        return "waiting_for_key"
+    pc = cpu.registers.pc
+    ram = cpu.memory.memory
+    if pc + 1 < MAX_SIZE and ram[pc] == 0x10 | pc >> 8 and ram[pc + 1] == pc & 0xFF:
+        return "halted"
+    return None
+
+
+def run_rom(path: str, options: FarmOptions) -> dict[str, Any]:
+    """
+    1つの ROM をヘッドレスで実行して結果のレコードを返す。ワーカーのプロセスで呼び出す。
+
+    上限に達するか、halt_reason() が止まったと判定するか、例外が起きるまでフレーム単位で実行する。
+    例外は外に出さずにレコードの reason と error に入れる。
+
+    Args:
+        path (str): ROM ファイルのパス
+        options (FarmOptions): 実行条件
+
+    Returns:
+        dict[str, Any]: rom, size, reason, error, instructions, frames, seconds, ips, unknown_opcodes,
+            pc, seed, screen (画面の SHA-256) を持つレコード。
+            実行を始める前に終えた場合は rom, size, reason, error だけを持つ
+    """
+    record: dict[str, Any] = {"rom": path, "size": None, "reason": "budget", "error": None}
+    # 読み込めない ROM があっても他の ROM と同じ形のレコードを返すように、準備も例外を捕まえる
+    try:
+        record["size"] = size = os.path.getsize(path)
+        if size > MAX_ROM_SIZE:
+            record.update(reason="invalid_rom", error=f"ROM is too large: {size} bytes")
+            return record
+        memory = Memory()
+        memory.load_fonts(FONT_START_ADDRESS)
+        memory.load_rom(path, DEFAULT_PC_ADDRESS)
+        cpu = Chip8CPU(memory, create_screen(options.screen), ByteRandom(options.seed))
+        scheduler = FrameScheduler(cpu, create_engine(cpu, options.engine), options.instructions_per_frame)
+    except OSError as e:
+        record.update(reason="invalid_rom", error=f"{type(e).__name__}: {e}")
+        return record
+    except Exception as e:
+        record.update(reason="crash", error=f"{type(e).__name__}: {e}")
+        return record
+
+    start = time.perf_counter()
+    deadline = None if options.max_seconds is None else start + options.max_seconds
+    try:
+        while True:
+            if options.max_frames is not None and scheduler.frame_count >= options.max_frames:
+                break
+            if options.max_instructions is not None and cpu.instruction_count >= options.max_instructions:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            scheduler.run_frame()
+            reason = halt_reason(cpu)
+            if reason is not None:
+                record["reason"] = reason
+                break
+    except Exception as e:
+        record.update(reason="crash", error=f"{type(e).__name__}: {e}")
+    seconds = time.perf_counter() - start
+
+    record.update(
+        instructions=cpu.instruction_count,
+        frames=scheduler.frame_count,
+        seconds=seconds,
+        ips=cpu.instruction_count / seconds if seconds > 0 else 0.0,
+        unknown_opcodes=cpu.unknown_opcode_count,
+        pc=cpu.registers.pc,
+        seed=cpu.rng.seed,
+        screen=screen_hash(cpu.screen),
+    )
+    return record
+
+
+def find_roms(directory: str, pattern: str = "*") -> list[Path]:
+    """
+    directory 以下 (サブディレクトリを含む) の pattern に一致するファイルを名前順に返す。
+
+    Args:
+        directory (str): ROM のディレクトリ
+        pattern (str, optional): ファイル名のパターン. デフォルトは "*".
+
+    Returns:
+        list[Path]: ROM ファイルのパス
+    """
+    return sorted(path for path in Path(directory).rglob(pattern) if path.is_file())
+
+
+def run_farm(roms: list[Path], output: str, options: FarmOptions, max_workers: int | None = None) -> Counter[str]:
+    """
+    ROM をプロセスプールのワーカーに振り分けて実行し、終わった順に1行1レコードの JSON で output に書き出す。
+
+    Args:
+        roms (list[Path]): ROM ファイルのパス
+        output (str): 出力先の JSONL ファイル
+        options (FarmOptions): 各 ROM の実行条件
+        max_workers (int | None, optional): ワーカーのプロセス数. デフォルトは None (CPU のコア数).
+
+    Returns:
+        Counter[str]: 終了した理由ごとの ROM の数
+    """
+    reasons: Counter[str] = Counter()
+    with open(output, "w") as f, ProcessPoolExecutor(max_workers) as executor:
+        futures = {executor.submit(run_rom, str(rom), options): rom for rom in roms}
+        for future in as_completed(futures):
+            try:
+                record = future.result()
+            except Exception as e:
+                # ワーカーのプロセス自体が落ちた場合
+                rom = str(futures[future])
+                record = {"rom": rom, "size": None, "reason": "crash", "error": f"{type(e).__name__}: {e}"}
+            reasons[record["reason"]] += 1
+            f.write(json.dumps(record) + "\n")
+            # 途中で止めても終わった分は残るように、1件ごとに書き出す
+            f.flush()
+    return reasons
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="chip8 emulator (ROM farm)")
+    parser.add_argument("directory", help="ROM ファイルのディレクトリ")
+    parser.add_argument("-o", "--output", required=True, help="結果を書き出す JSONL ファイル")
+    parser.add_argument("--pattern", default="*", help="ROM ファイル名のパターン")
+    parser.add_argument("--workers", type=int, help="ワーカーのプロセス数 (省略すると CPU のコア数)")
+    parser.add_argument("--instructions", type=int, help="ROM ごとに実行する命令数")
+    parser.add_argument("--frames", type=int, help="ROM ごとに実行するフレーム数")
+    parser.add_argument("--seconds", type=float, help="ROM ごとの実行時間 (秒)")
+    parser.add_argument("--engine", choices=ENGINES, default="interp", help="実行エンジン")
+    parser.add_argument("--screen", choices=SCREEN_BACKENDS, default="packed", help="画面の実装")
+    parser.add_argument("--cpu-hz", type=int, default=DEFAULT_CPU_HZ, help="1秒あたりの命令数")
+    parser.add_argument("--seed", type=int, help="CXNN の乱数のシード (省略すると ROM ごとにランダム)")
+    args = parser.parse_args()
+    if args.instructions is None and args.frames is None and args.seconds is None:
+        parser.error("one of --instructions, --frames or --seconds is required")
+
+    roms = find_roms(args.directory, args.pattern)
+    if not roms:
+        parser.error(f"no ROM files in {args.directory}")
+    options = FarmOptions(
+        max_instructions=args.instructions,
+        max_frames=args.frames,
+        max_seconds=args.seconds,
+        instructions_per_frame=max(1, args.cpu_hz // FRAME_RATE),
+        engine=args.engine,
+        screen=args.screen,
+        seed=args.seed,
+    )
+    start = time.perf_counter()
+    reasons = run_farm(roms, args.output, options, args.workers)
+
+    print(f"roms: {len(roms)}")
+    print(f"seconds: {time.perf_counter() - start:.3f}")
+    for reason in REASONS:
+        if reasons[reason]:
+            print(f"{reason}: {reasons[reason]}")
+    if reasons["crash"] or reasons["invalid_rom"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
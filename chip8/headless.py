@@ -0,0 +1,175 @@
+import argparse
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from capture import CAPTURE_FORMATS, capture_format, create_capture
+from compiler import ENGINES, Engine, create_engine
+from cpu import DEFAULT_PC_ADDRESS, FONT_START_ADDRESS, Chip8CPU
+from memory import Memory
+from profiler import Profiler, write_profile
+from rng import ByteRandom
+from scheduler import DEFAULT_CPU_HZ, FRAME_RATE, FrameScheduler
+from screen import SCREEN_BACKENDS, Screen, create_screen
+from tracing import TRACE_KINDS, create_sink
+
+
+@dataclass
+class RunResult:
+    instructions: int
+    frames: int
+    seconds: float
+
+    @property
+    def ips(self) -> float:
+        return self.instructions / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def fps(self) -> float:
+        return self.frames / self.seconds if self.seconds > 0 else 0.0
+
+
+def run_headless(
+    cpu: Chip8CPU,
+    engine: Engine,
+    max_instructions: int | None = None,
+    max_frames: int | None = None,
+    max_seconds: float | None = None,
+    instructions_per_frame: int = DEFAULT_CPU_HZ // FRAME_RATE,
+    clock: Callable[[], float] = time.perf_counter,
+    frame_listeners: list[Callable[[Screen], None]] | None = None,
+) -> RunResult:
+    """
+    画面出力や待ち時間なしで、いずれかの上限に達するまでフレーム単位で実行する。
+
+    上限はフレームの区切りで確認するので、命令数は最大で1フレーム分だけ上限を超えることがある。
+
+    Args:
+        cpu (Chip8CPU): 実行する CPU
+        engine (Engine): 実行エンジン
+        max_instructions (int | None, optional): 実行する命令数の上限. デフォルトは None.
+        max_frames (int | None, optional): 実行するフレーム数の上限. デフォルトは None.
+        max_seconds (float | None, optional): 実行時間 (秒) の上限. デフォルトは None.
+        instructions_per_frame (int, optional): 1フレームあたりの命令数. デフォルトは DEFAULT_CPU_HZ // FRAME_RATE.
+        clock (Callable[[], float], optional): 時刻を返す関数. デフォルトは time.perf_counter.
+        frame_listeners (list[Callable[[Screen], None]] | None, optional): フレームの終わりに画面を渡して呼び出す関数.
+            デフォルトは None.
+
+    Returns:
+        RunResult: 実行した命令数、フレーム数、時間
+    """
+    if max_instructions is None and max_frames is None and max_seconds is None:
+        raise ValueError("at least one of max_instructions, max_frames or max_seconds is required")
+
+    scheduler = FrameScheduler(cpu, engine, instructions_per_frame, clock=clock)
+    if frame_listeners is not None:
+        scheduler.frame_listeners.extend(frame_listeners)
+    start_instructions = cpu.instruction_count
+    start = clock()
+    deadline = None if max_seconds is None else start + max_seconds
+    frames = 0
+    while True:
+        if max_frames is not None and frames >= max_frames:
+            break
+        if max_instructions is not None and cpu.instruction_count - start_instructions >= max_instructions:
+            break
+        if deadline is not None and clock() >= deadline:
+            break
+        scheduler.run_frame()
+        frames += 1
+
+    return RunResult(cpu.instruction_count - start_instructions, frames, clock() - start)
+
+
+def dump_screen(screen: Screen, on_char: str = "#", off_char: str = ".") -> str:
+    """
+    画面を文字列にする。
+
+    Args:
+        screen (Screen): 画面
+        on_char (str, optional): 点灯しているピクセルの文字. デフォルトは "#".
+        off_char (str, optional): 消えているピクセルの文字. デフォルトは ".".
+
+    Returns:
+        str: 1行ごとに改行で区切った文字列
+    """
+    return "\n".join("".join(on_char if pixel else off_char for pixel in row) for row in screen.pixels)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="chip8 emulator (headless)")
+    parser.add_argument("filename", help="ROM ファイル")
+    parser.add_argument("--instructions", type=int, help="実行する命令数")
+    parser.add_argument("--frames", type=int, help="実行するフレーム数")
+    parser.add_argument("--seconds", type=float, help="実行時間 (秒)")
+    parser.add_argument("--engine", choices=ENGINES, default="interp", help="実行エンジン")
+    parser.add_argument("--screen", choices=SCREEN_BACKENDS, default="list", help="画面の実装")
+    parser.add_argument("--cpu-hz", type=int, default=DEFAULT_CPU_HZ, help="1秒あたりの命令数")
+    parser.add_argument("--seed", type=int, help="CXNN の乱数のシード (省略するとランダム)")
+    parser.add_argument("--trace", choices=TRACE_KINDS, default="none", help="実行した命令の記録方法")
+    parser.add_argument("--trace-file", help="命令の記録の出力先")
+    parser.add_argument("--profile", action="store_true", help="終了時に命令ごとの実行回数を表示する")
+    parser.add_argument("--profile-json", help="命令ごとの実行回数を JSON で書き出すファイル")
+    parser.add_argument("--dump", action="store_true", help="終了時の画面とレジスタを表示する")
+    parser.add_argument("--capture", help="フレームごとの画面を書き出すファイル")
+    parser.add_argument("--capture-format", choices=CAPTURE_FORMATS, help="書き出す形式 (省略すると拡張子から決める)")
+    parser.add_argument("--capture-scale", type=int, default=1, help="書き出す画面の倍率")
+    args = parser.parse_args()
+    if args.instructions is None and args.frames is None and args.seconds is None:
+        parser.error("one of --instructions, --frames or --seconds is required")
+    if args.trace != "none" and args.engine != "interp":
+        parser.error("--trace requires --engine interp")
+    if args.capture is not None:
+        args.capture_format = args.capture_format or capture_format(args.capture)
+        if args.capture_format is None:
+            parser.error("--capture-format is required unless the file extension is .pbm, .ppm or .gif")
+    if args.capture_scale < 1:
+        parser.error("--capture-scale must be positive")
+    return args
+
+
+def main() -> None:
+    args = parse_args()
+    memory = Memory()
+    memory.load_fonts(FONT_START_ADDRESS)
+    memory.load_rom(args.filename, DEFAULT_PC_ADDRESS)
+    cpu = Chip8CPU(memory, create_screen(args.screen), ByteRandom(args.seed))
+    engine = create_engine(cpu, args.engine)
+    tracer = create_sink(args.trace, args.trace_file)
+    cpu.set_tracer(tracer)
+    profiler = None
+    if args.profile or args.profile_json:
+        profiler = Profiler()
+        profiler.attach(cpu)
+    capture = None if args.capture is None else create_capture(args.capture_format, args.capture, args.capture_scale)
+
+    try:
+        result = run_headless(
+            cpu,
+            engine,
+            max_instructions=args.instructions,
+            max_frames=args.frames,
+            max_seconds=args.seconds,
+            instructions_per_frame=max(1, args.cpu_hz // FRAME_RATE),
+            frame_listeners=None if capture is None else [capture],
+        )
+    finally:
+        if tracer is not None:
+            tracer.close()
+        if capture is not None:
+            capture.close()
+
+    print(f"instructions: {result.instructions}")
+    print(f"frames: {result.frames}")
+    print(f"seconds: {result.seconds:.3f}")
+    print(f"ips: {result.ips:.0f}")
+    print(f"skipped: {cpu.skipped_instruction_count}")
+    if args.dump:
+        print(dump_screen(cpu.screen))
+        print(cpu)
+    if profiler is not None:
+        write_profile(profiler, args.profile, args.profile_json)
+
+
+if __name__ == "__main__":
+    main()
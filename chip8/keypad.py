@@ -0,0 +1,114 @@
+import threading
+from collections.abc import Callable
+from enum import Enum
+from typing import Final, TypeAlias
+
+KEY_MAP = {
+    "1": 0x1,
+    "2": 0x2,
+    "3": 0x3,
+    "4": 0xC,
+    "q": 0x4,
+    "w": 0x5,
+    "e": 0x6,
+    "r": 0xD,
+    "a": 0x7,
+    "s": 0x8,
+    "d": 0x9,
+    "f": 0xE,
+    "z": 0xA,
+    "x": 0x0,
+    "c": 0xB,
+    "v": 0xF,
+}
+KEY_COUNT = 16
+ALL_KEYS_MASK = (1 << KEY_COUNT) - 1
+
+
+class KeepKeypad(Enum):
+    """
+    execute_instruction() や Engine.step() で cpu.keypad を変更しないことを表す。
+
+    以前の API では pressed_key=None が「どのキーも押されていない」を意味するので、それと区別するために使う。
+    """
+
+    KEEP = 0
+
+
+KEEP_KEYPAD: Final = KeepKeypad.KEEP
+# 押されているキーの文字 (以前の API)、None (すべて離す) または KEEP_KEYPAD
+PressedKey: TypeAlias = str | None | KeepKeypad
+
+
+def key_to_mask(key: str | None) -> int:
+    """
+    キーボードの文字を CHIP-8 のキーのビットマスクにする。
+
+    Args:
+        key (str | None): 押されているキーの文字
+
+    Returns:
+        int: 対応するキーのビットが立ったマスク。対応するキーがない場合は 0
+    """
+    if key is None:
+        return 0
+    value = KEY_MAP.get(key.lower())
+    return 0 if value is None else 1 << value
+
+
+class Keypad:
+    """
+    16 個のキーの状態を、キー k が押されているとき bit k が立つ整数で持つ。
+
+    入力スレッドなど CPU とは別のスレッドから更新してよい。
+    状態が変わるたびに version が増え、wait_for_change() で待っているスレッドを起こす。
+    """
+
+    def __init__(self) -> None:
+        self.pressed = 0
+        self.version = 0
+        self._changed = threading.Condition()
+
+    def set_state(self, mask: int) -> None:
+        """
+        押されているキーをまとめて設定する。
+
+        Args:
+            mask (int): キーのビットマスク
+        """
+        self._update(lambda pressed: mask)
+
+    def press(self, key: int) -> None:
+        bit = 1 << key
+        self._update(lambda pressed: pressed | bit)
+
+    def release(self, key: int) -> None:
+        bit = 1 << key
+        self._update(lambda pressed: pressed & ~bit)
+
+    def _update(self, update: Callable[[int], int]) -> None:
+        # 別のスレッドの更新を失わないように、読み出しから書き込みまでをロックの中で行う
+        with self._changed:
+            mask = update(self.pressed) & ALL_KEYS_MASK
+            if mask == self.pressed:
+                return
+            self.pressed = mask
+            self.version += 1
+            self._changed.notify_all()
+
+    def is_pressed(self, key: int) -> bool:
+        return self.pressed >> key & 1 == 1
+
+    def wait_for_change(self, version: int, timeout: float | None = None) -> bool:
+        """
+        version から状態が変わるまで待つ。
+
+        Args:
+            version (int): 待ち始める前に読んだ version
+            timeout (float | None, optional): 待つ秒数の上限. デフォルトは None (無制限).
+
+        Returns:
+            bool: 状態が変わった場合は True、timeout した場合は False
+        """
+        with self._changed:
+            return self._changed.wait_for(lambda: self.version != version, timeout)
@@ -1,13 +1,36 @@
+import argparse
+import asyncio
+import io
+import os
 import select
 import sys
 import termios
+import threading
 import time
 import tty
+from collections import deque
+from typing import TextIO
 
-import screen
+from compiler import ENGINES, create_engine
 from cpu import DEFAULT_PC_ADDRESS, FONT_START_ADDRESS, Chip8CPU
+from keypad import Keypad, key_to_mask
 from memory import Memory
-from screen import VirtualScreen
+from profiler import Profiler, write_profile
+from renderer import TerminalRenderer
+from replay import InputRecorder
+from rewind import DEFAULT_REWIND_SECONDS, RewindBuffer
+from rng import ByteRandom
+from scheduler import DEFAULT_CPU_HZ, FRAME_RATE, FrameScheduler
+from screen import SCREEN_BACKENDS, create_screen
+from shared_screen import SharedScreenWriter
+from tracing import TRACE_KINDS, create_sink
+
+# 押すたびに1フレーム前に戻るキー (Backspace)
+REWIND_KEYS = ("\x7f", "\x08")
+# 端末ではキーを離したことが分からないので、入力からこの秒数だけ押されていることにする
+KEY_HOLD_SECONDS = 0.1
+# 入力スレッドが終了の指示を確認する間隔
+INPUT_POLL_SECONDS = 0.1
 
 
 class NonBlockingConsole:
@@ -19,34 +42,359 @@ class NonBlockingConsole:
     def __exit__(self, type, value, traceback):
         termios.tcsetattr(sys.stdin, termios.TCSADRAIN, self.old_settings)
 
-    def get_data(self) -> str | None:
-        if select.select([sys.stdin], [], [], 0) == ([sys.stdin], [], []):
-            return sys.stdin.read(1)
-        return None
+
+class TerminalInput(threading.Thread):
+    """
+    標準入力を読み、CHIP-8 のキーは keypad に反映し、それ以外の文字は commands に積むスレッド。
+
+    端末ではキーを離したことが分からないので、最後に入力されてから hold_seconds 経ったキーを離したことにする。
+    """
+
+    def __init__(self, keypad: Keypad, hold_seconds: float = KEY_HOLD_SECONDS) -> None:
+        super().__init__(daemon=True)
+        self.keypad = keypad
+        self.hold_seconds = hold_seconds
+        self.commands: deque[str] = deque()
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+    def run(self) -> None:
+        fd = sys.stdin.fileno()
+        # キーごとの離したことにする時刻
+        release_at: dict[int, float] = {}
+        while not self._stop_event.is_set():
+            timeout = min(release_at.values(), default=time.monotonic() + INPUT_POLL_SECONDS) - time.monotonic()
+            readable, _, _ = select.select([fd], [], [], max(timeout, 0))
+            now = time.monotonic()
+            if readable:
+                for char in os.read(fd, 64).decode(errors="ignore"):
+                    mask = key_to_mask(char)
+                    if mask:
+                        key = mask.bit_length() - 1
+                        self.keypad.press(key)
+                        release_at[key] = now + self.hold_seconds
+                    else:
+                        self.commands.append(char)
+            for key in [key for key, deadline in release_at.items() if deadline <= now]:
+                self.keypad.release(key)
+                del release_at[key]
+
+
+class AsyncTerminalInput:
+    """
+    TerminalInput の asyncio 版。スレッドを使わず、loop.add_reader で fd が読めるようになったときに読む。
+
+    キーを離したことにする処理は loop.call_later で予約し、同じキーが押されるたびに予約し直す。
+    何か入力があるたびに changed をセットする。
+    """
+
+    def __init__(self, keypad: Keypad, fd: int, hold_seconds: float = KEY_HOLD_SECONDS) -> None:
+        self.keypad = keypad
+        self.fd = fd
+        self.hold_seconds = hold_seconds
+        self.commands: deque[str] = deque()
+        self.changed = asyncio.Event()
+        self._release_handles: dict[int, asyncio.TimerHandle] = {}
+
+    def start(self) -> None:
+        asyncio.get_running_loop().add_reader(self.fd, self._on_readable)
+
+    def stop(self) -> None:
+        asyncio.get_running_loop().remove_reader(self.fd)
+        for handle in self._release_handles.values():
+            handle.cancel()
+        self._release_handles.clear()
+
+    def _on_readable(self) -> None:
+        loop = asyncio.get_running_loop()
+        for char in os.read(self.fd, 64).decode(errors="ignore"):
+            mask = key_to_mask(char)
+            if mask:
+                key = mask.bit_length() - 1
+                self.keypad.press(key)
+                handle = self._release_handles.pop(key, None)
+                if handle is not None:
+                    handle.cancel()
+                self._release_handles[key] = loop.call_later(self.hold_seconds, self._release, key)
+            else:
+                self.commands.append(char)
+        self.changed.set()
+
+    def _release(self, key: int) -> None:
+        del self._release_handles[key]
+        self.keypad.release(key)
+        self.changed.set()
+
+
+class AsyncFrontend:
+    """
+    asyncio のイベントループの上で、入力・エミュレーション・描画を別々に動かすフロントエンド。
+
+    エミュレーションのタスクはフレームごとに実行して次のフレームの予定時刻まで await するだけで、
+    描画は別のタスクで行う。端末への書き込みはスレッドで行い、書き込みが終わるまでに進んだフレームは
+    まとめて最新の1フレームだけ描画するので、端末が詰まってもエミュレーションの速度は変わらない。
+    """
+
+    def __init__(
+        self,
+        scheduler: FrameScheduler,
+        rewind: RewindBuffer | None = None,
+        recorder: InputRecorder | None = None,
+        exporter: SharedScreenWriter | None = None,
+        display: bool = True,
+        input_fd: int | None = None,
+        output: TextIO = sys.stdout,
+    ) -> None:
+        """
+        Args:
+            scheduler (FrameScheduler): 実行するスケジューラ
+            rewind (RewindBuffer | None, optional): 巻き戻しに使う記録. デフォルトは None (巻き戻さない).
+            recorder (InputRecorder | None, optional): キー入力の記録先. デフォルトは None (記録しない).
+            exporter (SharedScreenWriter | None, optional): フレームごとに画面を書き出す先. デフォルトは None.
+            display (bool, optional): 画面を描画するかどうか. デフォルトは True.
+            input_fd (int | None, optional): 入力を読む fd. デフォルトは None (標準入力).
+            output (TextIO, optional): 描画の出力先. デフォルトは sys.stdout.
+        """
+        self.scheduler = scheduler
+        self.rewind = rewind
+        self.recorder = recorder
+        self.exporter = exporter
+        self.display = display
+        self.output = output
+        self.input = AsyncTerminalInput(Keypad(), sys.stdin.fileno() if input_fd is None else input_fd)
+        # 描画するフレームを文字列として受け取り、まとめて書き込む
+        self._render_buffer = io.StringIO()
+        self.renderer = TerminalRenderer(self._render_buffer)
+        self.render_count = 0
+        self._frame_ready = asyncio.Event()
+        self._stopped = False
+
+    async def run(self) -> None:
+        """
+        ESC が押されるまで実行する。
+        """
+        self.input.start()
+        render_task = asyncio.create_task(self._render()) if self.display else None
+        try:
+            await self._emulate()
+        finally:
+            self.input.stop()
+            self._stopped = True
+            self._frame_ready.set()
+            if render_task is not None:
+                await render_task
+                self.renderer.close()
+                self._write(self._take_rendered())
+
+    async def _emulate(self) -> None:
+        scheduler = self.scheduler
+        cpu = scheduler.cpu
+        terminal_input = self.input
+        if self.rewind is not None:
+            self.rewind.record()
+        while True:
+            command = terminal_input.commands.popleft() if terminal_input.commands else None
+            if command == "\x1b":
+                return
+            if self.rewind is not None and command in REWIND_KEYS:
+                self.rewind.step_back()
+            else:
+                # フレームの始めにキーの状態を反映し、それ以降の入力で changed がセットされる
+                terminal_input.changed.clear()
+                cpu.keypad.set_state(terminal_input.keypad.pressed)
+                if self.recorder is not None:
+                    self.recorder.record(cpu.keypad.pressed)
+                scheduler.run_frame()
+                if self.rewind is not None:
+                    self.rewind.record()
+            if self.exporter is not None:
+                self.exporter.publish(cpu.screen)
+            self._frame_ready.set()
+            await self._wait_for_next_frame()
+
+    async def _wait_for_next_frame(self) -> None:
+        scheduler = self.scheduler
+        delay = scheduler.advance_deadline()
+        if delay > 0 and scheduler.cpu.is_waiting:
+            # キー入力待ちの間は、入力があればすぐに次のフレームを始める
+            try:
+                await asyncio.wait_for(self.input.changed.wait(), delay)
+                scheduler.reset_deadline()
+            except TimeoutError:
+                pass
+        else:
+            # 遅れている場合も、入力と描画のタスクに1回は実行を譲る
+            await asyncio.sleep(max(delay, 0))
+        scheduler.update_rates()
+
+    async def _render(self) -> None:
+        loop = asyncio.get_running_loop()
+        scheduler = self.scheduler
+        while True:
+            await self._frame_ready.wait()
+            if self._stopped:
+                return
+            self._frame_ready.clear()
+            status = str(scheduler.cpu).splitlines() + [f"ips: {scheduler.ips:.0f}, fps: {scheduler.fps:.1f}"]
+            if self.renderer.render(scheduler.cpu.screen, status):
+                self.render_count += 1
+                # 書き込んでいる間もエミュレーションは進み、その間のフレームは次の描画にまとめられる
+                await loop.run_in_executor(None, self._write, self._take_rendered())
+
+    def _take_rendered(self) -> str:
+        text = self._render_buffer.getvalue()
+        self._render_buffer.seek(0)
+        self._render_buffer.truncate()
+        return text
+
+    def _write(self, text: str) -> None:
+        self.output.write(text)
+        self.output.flush()
+
+
+def run(
+    scheduler: FrameScheduler,
+    rewind: RewindBuffer | None,
+    recorder: InputRecorder | None,
+    exporter: SharedScreenWriter | None = None,
+    display: bool = True,
+) -> None:
+    """
+    ESC が押されるまで、キー入力の反映・1フレーム分の実行・描画を繰り返す。
+
+    Args:
+        scheduler (FrameScheduler): 実行するスケジューラ
+        rewind (RewindBuffer | None): 巻き戻しに使う記録. None の場合は巻き戻さない
+        recorder (InputRecorder | None): キー入力の記録先. None の場合は記録しない
+        exporter (SharedScreenWriter | None, optional): フレームごとに画面を書き出す先. デフォルトは None.
+        display (bool, optional): このプロセスで画面を描画するかどうか. デフォルトは True.
+    """
+    cpu = scheduler.cpu
+    if rewind is not None:
+        rewind.record()
+
+    renderer = TerminalRenderer()
+    input_keypad = Keypad()
+    terminal_input = TerminalInput(input_keypad)
+    keypad_version = input_keypad.version
+    with NonBlockingConsole():
+        terminal_input.start()
+        try:
+            while True:
+                command = terminal_input.commands.popleft() if terminal_input.commands else None
+                if command == "\x1b":
+                    break
+                if rewind is not None and command in REWIND_KEYS:
+                    rewind.step_back()
+                else:
+                    # フレームの途中でキーの状態が変わらないように、フレームの始めにまとめて反映する
+                    keypad_version = input_keypad.version
+                    cpu.keypad.set_state(input_keypad.pressed)
+                    if recorder is not None:
+                        recorder.record(cpu.keypad.pressed)
+                    scheduler.run_frame()
+                    if rewind is not None:
+                        rewind.record()
+                if exporter is not None:
+                    exporter.publish(cpu.screen)
+                if display:
+                    status = str(cpu).splitlines() + [f"ips: {scheduler.ips:.0f}, fps: {scheduler.fps:.1f}"]
+                    renderer.render(cpu.screen, status)
+                scheduler.wait_for_next_frame(input_keypad, keypad_version)
+        finally:
+            terminal_input.stop()
+            if display:
+                renderer.close()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="chip8 emulator")
+    parser.add_argument("filename", help="ROM ファイル")
+    parser.add_argument("--engine", choices=ENGINES, default="interp", help="実行エンジン")
+    parser.add_argument("--screen", choices=SCREEN_BACKENDS, default="list", help="画面の実装")
+    parser.add_argument("--cpu-hz", type=int, default=DEFAULT_CPU_HZ, help="1秒あたりの命令数")
+    parser.add_argument("--seed", type=int, help="CXNN の乱数のシード (省略するとランダム)")
+    parser.add_argument("--trace", choices=TRACE_KINDS, default="none", help="実行した命令の記録方法")
+    parser.add_argument("--trace-file", help="命令の記録の出力先")
+    parser.add_argument("--profile", action="store_true", help="終了時に命令ごとの実行回数を表示する")
+    parser.add_argument("--profile-json", help="命令ごとの実行回数を JSON で書き出すファイル")
+    parser.add_argument(
+        "--rewind-seconds",
+        type=float,
+        default=DEFAULT_REWIND_SECONDS,
+        help="Backspace で巻き戻せる秒数 (0 で無効)",
+    )
+    parser.add_argument("--record", help="キー入力を記録するファイル (replay.py で再生できる。巻き戻しは無効になる)")
+    parser.add_argument("--export", help="フレームごとに画面を書き出す共有メモリの名前 (viewer.py で表示できる)")
+    parser.add_argument("--export-file", help="共有メモリの代わりに画面を書き出す mmap するファイル")
+    parser.add_argument("--no-display", action="store_true", help="このプロセスでは画面を描画しない")
+    parser.add_argument(
+        "--frontend",
+        choices=("thread", "asyncio"),
+        default="thread",
+        help="入力をスレッドで読むか、asyncio で入力・実行・描画を別のタスクにするか",
+    )
+    args = parser.parse_args()
+    if args.trace != "none" and args.engine != "interp":
+        parser.error("--trace requires --engine interp")
+    if args.trace == "text" and args.trace_file is None:
+        parser.error("--trace text requires --trace-file")
+    if args.export is not None and args.export_file is not None:
+        parser.error("--export and --export-file are exclusive")
+    return args
 
 
 def main() -> None:
-    filename = sys.argv[1]
+    args = parse_args()
+    filename = args.filename
 
     memory = Memory()
     memory.load_fonts(FONT_START_ADDRESS)
 
-    with open(filename, "rb") as f:
-        for i, byte in enumerate(f.read()):
-            memory.write(DEFAULT_PC_ADDRESS + i, byte)
+    memory.load_rom(filename, DEFAULT_PC_ADDRESS)
 
-    v_screen = VirtualScreen()
-    cpu = Chip8CPU(memory, v_screen)
+    v_screen = create_screen(args.screen)
+    cpu = Chip8CPU(memory, v_screen, ByteRandom(args.seed))
+    engine = create_engine(cpu, args.engine)
+    tracer = create_sink(args.trace, args.trace_file)
+    cpu.set_tracer(tracer)
+    profiler = None
+    if args.profile or args.profile_json:
+        profiler = Profiler()
+        profiler.attach(cpu)
+    scheduler = FrameScheduler(cpu, engine, max(1, args.cpu_hz // FRAME_RATE))
+    recorder = None
+    rewind = None
+    if args.record is not None:
+        # 巻き戻すと記録した入力と実行が一致しなくなるので、記録中は巻き戻さない
+        recorder = InputRecorder(args.record, cpu.rng.seed, scheduler.instructions_per_frame, args.engine)
+    elif args.rewind_seconds > 0:
+        rewind = RewindBuffer(cpu, args.rewind_seconds)
 
-    with NonBlockingConsole() as nbc:
-        while True:
-            key_data = nbc.get_data()
-            if key_data == "\x1b":
-                break
-            cpu.execute_instruction(key_data)
-            print(cpu)
-            screen.render_to_console(cpu.screen, is_border=True)
-            time.sleep(0.05)
+    exporter = None
+    if args.export is not None or args.export_file is not None:
+        exporter = SharedScreenWriter(args.export, args.export_file)
+
+    try:
+        if args.frontend == "asyncio":
+            frontend = AsyncFrontend(scheduler, rewind, recorder, exporter, display=not args.no_display)
+            with NonBlockingConsole():
+                asyncio.run(frontend.run())
+        else:
+            run(scheduler, rewind, recorder, exporter, display=not args.no_display)
+    finally:
+        if tracer is not None:
+            tracer.close()
+        if recorder is not None:
+            recorder.close()
+        if exporter is not None:
+            exporter.close()
+    # 画面の描画が終わってから表示する
+    if profiler is not None:
+        write_profile(profiler, args.profile, args.profile_json)
 
 
 if __name__ == "__main__":
@@ -1,25 +1,124 @@
+from collections.abc import Callable, Sequence
 from itertools import chain
+from typing import Any
 
 MAX_SIZE = 4096
+# デコード済み命令をキャッシュする領域の先頭 (プログラムの開始アドレス)
+PROGRAM_START_ADDRESS = 0x200
 
 
 class Memory:
     def __init__(self) -> None:
         self.memory = bytearray(MAX_SIZE)
+        self._view = memoryview(self.memory)
+        # アドレスごとのデコード済み命令のキャッシュ
+        # 中身は実行する CPU が決める。PROGRAM_START_ADDRESS 以降のみ使う
+        self.decoded: list[Any | None] = [None] * MAX_SIZE
+        # コンパイル済みのコードが依存しているバイトに 1 を立てる
+        # 該当バイトに書き込みがあると write_listeners に (address, length) を通知する
+        self.watched = bytearray(MAX_SIZE)
+        self.write_listeners: list[Callable[[int, int], None]] = []
 
     def read(self, address: int) -> int:
         return self.memory[address]
 
+    def read_bytes(self, address: int, length: int) -> memoryview:
+        """
+        address から length バイトをコピーせずに返す。
+
+        Args:
+            address (int): 読み込みの先頭アドレス
+            length (int): 読み込むバイト数
+
+        Returns:
+            memoryview: メモリの該当範囲
+
+        Raises:
+            IndexError: 範囲がメモリの外にはみ出す場合
+        """
+        _check_range(address, length)
+        return self._view[address : address + length]
+
     def write(self, address: int, value: int) -> None:
         self.memory[address] = 0xFF & value
+        if address >= PROGRAM_START_ADDRESS:
+            # 命令は2バイトなので1つ前のアドレスから始まる命令も無効化する
+            self.decoded[address - 1] = None
+            self.decoded[address] = None
+            if self.watched[address]:
+                self._notify_write(address, 1)
+
+    def write_bytes(self, address: int, _bytes: Sequence[int] | bytes | bytearray | memoryview) -> None:
+        # スライス代入ははみ出した分だけ bytearray を伸ばしてしまうので先に確認する
+        _check_range(address, len(_bytes))
+        # bytes などはそのまま、int の列は値を確認しながら代入されるので、中間のコピーは作らない
+        self.memory[address : address + len(_bytes)] = _bytes
+        self.invalidate(address, len(_bytes))
+
+    def invalidate(self, address: int, length: int) -> None:
+        """
+        address から length バイトに書き込みがあったとして、その範囲にかかるデコード済み命令を破棄する。
+
+        Args:
+            address (int): 書き込みの先頭アドレス
+            length (int): 書き込んだバイト数
+        """
+        start = max(address - 1, PROGRAM_START_ADDRESS)
+        end = min(address + length, MAX_SIZE)
+        if start < end:
+            self.decoded[start:end] = [None] * (end - start)
+            if 1 in self.watched[address:end]:
+                self._notify_write(address, end - address)
+
+    def _notify_write(self, address: int, length: int) -> None:
+        for listener in self.write_listeners:
+            listener(address, length)
 
-    def write_bytes(self, address: int, _bytes: list[int]) -> None:
-        for i in range(0, len(_bytes)):
-            self.memory[address + i] = _bytes[i]
+    def restore(self, data: bytes | bytearray | memoryview) -> None:
+        """
+        メモリ全体を data で置き換える。
+
+        デコード済み命令は破棄し、コンパイル済みのコードにも書き込みとして通知する。
+
+        Args:
+            data (bytes | bytearray | memoryview): MAX_SIZE バイトのデータ
+        """
+        if len(data) != MAX_SIZE:
+            raise ValueError(f"memory image must be {MAX_SIZE} bytes: {len(data)}")
+        self.memory[:] = data
+        self.invalidate(0, MAX_SIZE)
+
+    def clear_decoded(self) -> None:
+        """
+        デコード済み命令のキャッシュをすべて破棄する。
+        """
+        self.decoded = [None] * MAX_SIZE
 
     def load_fonts(self, address: int) -> None:
         self.write_bytes(address, list(chain.from_iterable(FONTS)))
 
+    def load_rom(self, filename: str, address: int = PROGRAM_START_ADDRESS) -> int:
+        """
+        ROM ファイルの中身を address から書き込む。
+
+        Args:
+            filename (str): ROM ファイルのパス
+            address (int, optional): 書き込み開始アドレス. デフォルトは PROGRAM_START_ADDRESS.
+
+        Returns:
+            int: 書き込んだバイト数
+        """
+        with open(filename, "rb") as f:
+            data = f.read()
+        self.write_bytes(address, data)
+        return len(data)
+
+
+def _check_range(address: int, length: int) -> None:
+    # スライスは範囲外を黙って切り詰めるので、1バイトずつ読み書きした場合と同じく IndexError にする
+    if address < 0 or address + length > MAX_SIZE:
+        raise IndexError(f"memory access out of range: {address:#05x} + {length}")
+
 
 FONTS = [
     [0xF0, 0x90, 0x90, 0x90, 0xF0],  # 0
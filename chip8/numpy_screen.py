@@ -0,0 +1,86 @@
+from collections.abc import Sequence
+
+import numpy as np
+import numpy.typing as npt
+from screen import Point, Screen, Sprite
+
+
+class NumpyScreen(Screen):
+    """
+    (HEIGHT, WIDTH) の uint8 の NumPy 配列で画面を持つ VirtualScreen。
+
+    スプライトの描画は範囲全体への XOR 1回、衝突判定は AND と any 1回で行う。
+    buffer は clear() しても同じ配列を使い続けるので、描画側や録画側はコピーせずに参照できる。
+    """
+
+    def __init__(self) -> None:
+        self._buffer = np.zeros((self.HEIGHT, self.WIDTH), dtype=np.uint8)
+
+    @property
+    def buffer(self) -> npt.NDArray[np.uint8]:
+        """
+        画面の配列 (コピーではない)。
+
+        Returns:
+            npt.NDArray[np.uint8]: 点灯しているピクセルが 1 の (HEIGHT, WIDTH) の配列
+        """
+        return self._buffer
+
+    def __array__(self, dtype: npt.DTypeLike | None = None, copy: bool | None = None) -> npt.NDArray:
+        # NumPy の規約どおり、copy=True なら必ずコピーし、copy=False で型の変換 (コピー) が必要なら ValueError にする
+        if dtype is None or np.dtype(dtype) == self._buffer.dtype:
+            return self._buffer.copy() if copy else self._buffer
+        if copy is False:
+            raise ValueError(f"Unable to avoid copy while converting the screen to {np.dtype(dtype)}")
+        return self._buffer.astype(dtype)
+
+    def set_bit(self, point: Point, value: bool) -> None:
+        self._buffer[point.y, point.x] = value
+
+    def xor_bit(self, point: Point, value: bool) -> None:
+        self._buffer[point.y, point.x] ^= value
+
+    @property
+    def pixels(self) -> list[list[bool]]:
+        return self._buffer.astype(bool).tolist()
+
+    def get_pixel(self, point: Point) -> bool:
+        return bool(self._buffer[point.y, point.x])
+
+    def clear(self) -> None:
+        self._buffer.fill(0)
+
+    def draw_sprite(self, point: Point, splite: Sprite) -> int:
+        bits = np.array(splite.pixels, dtype=np.uint8).reshape(splite.y_size, splite.x_size)
+        return self._draw_bits(point.x, point.y, bits)
+
+    def draw_bytes(self, x: int, y: int, data: bytes | bytearray | memoryview) -> int:
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8)).reshape(-1, 8)
+        return self._draw_bits(x, y, bits)
+
+    def _draw_bits(self, x: int, y: int, bits: npt.NDArray[np.uint8]) -> int:
+        y_size, x_size = bits.shape
+        x %= self.WIDTH
+        y %= self.HEIGHT
+        if x + x_size <= self.WIDTH and y + y_size <= self.HEIGHT:
+            # はみ出さない場合はスライス (ビュー) に直接 XOR する
+            region = self._buffer[y : y + y_size, x : x + x_size]
+            collision_flag = int((region & bits).any())
+            region ^= bits
+            return collision_flag
+
+        # はみ出す場合は折り返した行と列で取り出して書き戻す
+        index = np.ix_((y + np.arange(y_size)) % self.HEIGHT, (x + np.arange(x_size)) % self.WIDTH)
+        region = self._buffer[index]
+        collision_flag = int((region & bits).any())
+        self._buffer[index] = region ^ bits
+        return collision_flag
+
+    def packed_rows(self) -> list[int]:
+        packed = np.packbits(self._buffer, axis=1)
+        return [int.from_bytes(row.tobytes(), "big") for row in packed]
+
+    def load_packed_rows(self, rows: Sequence[int]) -> None:
+        packed = np.array(rows, dtype=">u8").view(np.uint8)
+        # 同じ配列を使い続けるため、置き換えずに中身を書き込む
+        self._buffer[...] = np.unpackbits(packed).reshape(self.HEIGHT, self.WIDTH)
@@ -0,0 +1,152 @@
+import json
+import time
+from collections.abc import Callable
+from typing import Any
+
+from cpu import Chip8CPU, Decoder
+from memory import MAX_SIZE
+
+Instruction = Callable[[Decoder], None]
+
+
+class HandlerStats:
+    __slots__ = ("name", "count", "samples", "sampled_ns")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.count = 0
+        self.samples = 0
+        self.sampled_ns = 0
+
+    @property
+    def estimated_seconds(self) -> float:
+        """
+        計測した呼び出しの平均時間から推定した合計時間。
+        """
+        if self.samples == 0:
+            return 0.0
+        return self.sampled_ns / self.samples * self.count / 1e9
+
+
+class Profiler:
+    """
+    命令 (ハンドラ) ごとと pc ごとの実行回数を数え、ハンドラごとの時間をサンプリングする。
+
+    cpu.dispatch_table の各命令を数える関数で包むので、cpu.py のハンドラを変更せずに付け外しできる。
+    BlockEngine でブロック内に展開された命令は数えられないので、すべて数える場合はインタプリタで実行する。
+    """
+
+    def __init__(self, sample_interval: int = 64) -> None:
+        """
+        Args:
+            sample_interval (int, optional): 何回に1回時間を計るか. デフォルトは 64.
+        """
+        self.sample_interval = sample_interval
+        self.handlers: dict[str, HandlerStats] = {}
+        self.pc_counts = [0] * MAX_SIZE
+        self._cpu: Chip8CPU | None = None
+        self._original_table: list[Instruction] = []
+
+    def attach(self, cpu: Chip8CPU) -> None:
+        if self._cpu is not None:
+            raise RuntimeError("profiler is already attached")
+        self._cpu = cpu
+        self._original_table = cpu.dispatch_table
+        wrappers: dict[Instruction, Instruction] = {}
+        for instruction in set(cpu.dispatch_table):
+            wrappers[instruction] = self._wrap(cpu, instruction)
+        cpu.dispatch_table = [wrappers[instruction] for instruction in cpu.dispatch_table]
+        # デコード済みのキャッシュには包む前の命令が入っているので捨てる
+        cpu.memory.clear_decoded()
+
+    def detach(self) -> None:
+        if self._cpu is None:
+            return
+        self._cpu.dispatch_table = self._original_table
+        self._cpu.memory.clear_decoded()
+        self._cpu = None
+
+    def _wrap(self, cpu: Chip8CPU, instruction: Instruction) -> Instruction:
+        name = instruction.__name__
+        stats = self.handlers.setdefault(name, HandlerStats(name))
+        pc_counts = self.pc_counts
+        interval = self.sample_interval
+        registers = cpu.registers
+        perf_counter_ns = time.perf_counter_ns
+
+        def profiled(decoder: Decoder) -> None:
+            stats.count += 1
+            # 命令の実行前に pc は次の命令を指している
+            pc_counts[(registers.pc - 2) % MAX_SIZE] += 1
+            if stats.count % interval:
+                instruction(decoder)
+                return
+            start = perf_counter_ns()
+            instruction(decoder)
+            stats.sampled_ns += perf_counter_ns() - start
+            stats.samples += 1
+
+        profiled.__name__ = name
+        return profiled
+
+    def to_dict(self, top_pcs: int = 50) -> dict[str, Any]:
+        handlers = sorted(self.handlers.values(), key=lambda stats: stats.count, reverse=True)
+        counts = self.pc_counts
+        pcs = sorted((address for address, count in enumerate(counts) if count), key=counts.__getitem__, reverse=True)
+        return {
+            "total": sum(stats.count for stats in handlers),
+            "handlers": [
+                {
+                    "name": stats.name,
+                    "count": stats.count,
+                    "samples": stats.samples,
+                    "estimated_seconds": stats.estimated_seconds,
+                }
+                for stats in handlers
+                if stats.count
+            ],
+            "pcs": [{"pc": address, "count": counts[address]} for address in pcs[:top_pcs]],
+        }
+
+    def report(self, top_pcs: int = 10) -> str:
+        """
+        実行回数の多い順に並べた表を返す。
+
+        Args:
+            top_pcs (int, optional): 表示する pc の数. デフォルトは 10.
+
+        Returns:
+            str: 表
+        """
+        data = self.to_dict(top_pcs)
+        total = data["total"] or 1
+        lines = [f"{'handler':<28} {'count':>12} {'%':>6} {'est. time':>10}"]
+        for handler in data["handlers"]:
+            lines.append(
+                f"{handler['name']:<28} {handler['count']:>12} {handler['count'] / total:>6.1%}"
+                f" {handler['estimated_seconds']:>9.3f}s"
+            )
+        lines.append("")
+        lines.append(f"{'pc':<28} {'count':>12} {'%':>6}")
+        for pc in data["pcs"]:
+            lines.append(f"{pc['pc']:#06x}{'':<22} {pc['count']:>12} {pc['count'] / total:>6.1%}")
+        return "\n".join(lines)
+
+    def dump_json(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def write_profile(profiler: Profiler, show_report: bool, json_path: str | None) -> None:
+    """
+    コマンドの終了時にプロファイルの結果を表示・保存する。
+
+    Args:
+        profiler (Profiler): 結果を持つプロファイラ
+        show_report (bool): 表を表示するかどうか
+        json_path (str | None): JSON を書き出すファイル
+    """
+    if show_report:
+        print(profiler.report())
+    if json_path is not None:
+        profiler.dump_json(json_path)
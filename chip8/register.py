@@ -37,3 +37,67 @@ class Register16(Register):
 
     def write(self, value: int) -> None:
         self.value = 0xFFFF & value
+
+
+class RegisterFile:
+    """
+    CPU のレジスタをまとめて持つ。
+
+    V0-VF は16バイトの bytearray に、I, PC, SP, DT, ST は int の属性に置く。
+    命令の実行中は Register オブジェクトを経由せずにこれらを直接読み書きする。
+    v は同じ bytearray を使い続けるので、まとめて書き換えるときはスライス代入を使う。
+    """
+
+    __slots__ = ("v", "i", "pc", "sp", "dt", "st")
+
+    def __init__(self, pc: int = 0) -> None:
+        self.v = bytearray(16)
+        self.i = 0
+        self.pc = pc
+        self.sp = 0
+        self.dt = 0
+        self.st = 0
+
+
+class VRegisterView(Register):
+    """
+    RegisterFile.v の1バイトを Register として読み書きする。
+    """
+
+    __slots__ = ("_v", "_index")
+
+    def __init__(self, registers: RegisterFile, index: int) -> None:
+        self._v = registers.v
+        self._index = index
+
+    def __str__(self) -> str:
+        return f"0x{self._v[self._index]:02x}"
+
+    def read(self) -> int:
+        return self._v[self._index]
+
+    def write(self, value: int) -> None:
+        self._v[self._index] = 0xFF & value
+
+
+class FieldRegisterView(Register):
+    """
+    RegisterFile の I, PC などの属性を Register として読み書きする。
+    """
+
+    __slots__ = ("_registers", "_name", "_mask", "_width")
+
+    def __init__(self, registers: RegisterFile, name: str, bits: int) -> None:
+        self._registers = registers
+        self._name = name
+        self._mask = (1 << bits) - 1
+        self._width = bits // 4
+
+    def __str__(self) -> str:
+        return f"0x{self.read():0{self._width}x}"
+
+    def read(self) -> int:
+        return getattr(self._registers, self._name)
+
+    def write(self, value: int) -> None:
+        setattr(self._registers, self._name, self._mask & value)
@@ -0,0 +1,91 @@
+import sys
+from typing import TextIO
+
+import vt100
+from screen import Screen
+
+
+class TerminalRenderer:
+    """
+    前回の描画から変わった行だけをカーソル移動で書き換えるコンソール描画。
+
+    1フレーム分の出力は1つの文字列にまとめて1回で書き込み、何も変わっていなければ何も出力しない。
+    """
+
+    def __init__(
+        self, output: TextIO = sys.stdout, on_char: str = "█", off_char: str = " ", is_border: bool = True
+    ) -> None:
+        self.output = output
+        self.is_border = is_border
+        # 1バイト (8ピクセル) ごとの文字列
+        self._byte_to_text = [
+            "".join(on_char if byte >> shift & 1 else off_char for shift in range(7, -1, -1)) for byte in range(0x100)
+        ]
+        self._rows: list[int | None] = []
+        self._status: list[str] = []
+        self._is_first_frame = True
+
+    def invalidate(self) -> None:
+        """
+        次の render で画面全体を描き直すようにする。
+        """
+        self._rows = []
+        self._status = []
+        self._is_first_frame = True
+
+    def _row_to_text(self, row: int, width: int) -> str:
+        byte_to_text = self._byte_to_text
+        return "".join(byte_to_text[row >> shift & 0xFF] for shift in range(width - 8, -1, -8))
+
+    def render(self, screen: Screen, status: list[str] | None = None) -> bool:
+        """
+        画面と状態表示の行のうち、前回から変わったものだけを描画する。
+
+        Args:
+            screen (Screen): 描画する画面
+            status (list[str] | None, optional): 画面の下に表示する行. デフォルトは None.
+
+        Returns:
+            bool: 何か出力した場合は True
+        """
+        status = status or []
+        rows = screen.packed_rows()
+        border_vertical = "│" if self.is_border else ""
+        # 枠の分だけ画面の行を下にずらす
+        top = 2 if self.is_border else 1
+        status_top = top + screen.HEIGHT + (1 if self.is_border else 0)
+
+        parts = []
+        if self._is_first_frame:
+            parts.append(vt100.clear_screen() + vt100.hide_cursor())
+            if self.is_border:
+                horizontal_line = "─" * screen.WIDTH
+                parts.append(vt100.move_cursor(1, 1) + "┌" + horizontal_line + "┐")
+                parts.append(vt100.move_cursor(top + screen.HEIGHT, 1) + "└" + horizontal_line + "┘")
+            self._rows = [None] * screen.HEIGHT
+            self._is_first_frame = False
+
+        for y, row in enumerate(rows):
+            if self._rows[y] != row:
+                line = self._row_to_text(row, screen.WIDTH)
+                parts.append(vt100.move_cursor(top + y, 1) + border_vertical + line + border_vertical)
+                self._rows[y] = row
+
+        for i in range(max(len(status), len(self._status))):
+            line = status[i] if i < len(status) else ""
+            if i >= len(self._status) or self._status[i] != line:
+                parts.append(vt100.move_cursor(status_top + i, 1) + line + vt100.erase_to_end_of_line())
+        self._status = list(status)
+
+        if not parts:
+            return False
+        self.output.write("".join(parts))
+        self.output.flush()
+        return True
+
+    def close(self) -> None:
+        """
+        カーソルを表示に戻す。
+        """
+        self.output.write(vt100.show_cursor())
+        self.output.flush()
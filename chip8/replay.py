@@ -0,0 +1,174 @@
+import argparse
+import hashlib
+import struct
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import NamedTuple
+
+from compiler import ENGINES, Engine, create_engine
+from cpu import DEFAULT_PC_ADDRESS, FONT_START_ADDRESS, Chip8CPU
+from headless import RunResult, dump_screen
+from memory import Memory
+from rng import ByteRandom
+from scheduler import FrameScheduler
+from screen import SCREEN_BACKENDS, Screen, create_screen
+
+FILE_MAGIC = b"C8IN"
+FILE_VERSION = 1
+# magic, version, 乱数の seed, 1フレームあたりの命令数, 実行エンジン (ENGINES の番号)
+# ブロック単位のエンジンはフレームの区切りが命令単位と異なるので、再生は記録と同じエンジンで行う
+FILE_HEADER = struct.Struct("<4sHQIB")
+# フレーム番号, そのフレームから押されているキーのビットマスク (bit k がキー k)
+EVENT_FORMAT = struct.Struct("<IH")
+
+
+class InputEvent(NamedTuple):
+    frame: int
+    keys: int
+
+
+@dataclass
+class InputLog:
+    seed: int
+    instructions_per_frame: int
+    engine: str
+    frames: int
+    events: list[InputEvent]
+
+
+class InputRecorder:
+    """
+    フレームごとのキーの状態を、変わったときだけ固定長 6 バイトのイベントとしてファイルに書き込む。
+
+    close() で最後にフレーム数を終端のイベントとして書く。
+    """
+
+    def __init__(self, path: str, seed: int, instructions_per_frame: int, engine: str = "interp") -> None:
+        """
+        Args:
+            path (str): 出力先のファイル
+            seed (int): CPU の乱数の seed
+            instructions_per_frame (int): 1フレームあたりの命令数
+            engine (str, optional): 実行エンジン. デフォルトは "interp".
+        """
+        self.file = open(path, "wb")
+        header = FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, seed, instructions_per_frame, ENGINES.index(engine))
+        self.file.write(header)
+        self.frame = 0
+        self._keys = 0
+
+    def record(self, keys: int) -> None:
+        """
+        次のフレームの間押されているキーを記録する。フレームを実行する前に1回呼び出す。
+
+        Args:
+            keys (int): キーのビットマスク
+        """
+        if keys != self._keys:
+            self.file.write(EVENT_FORMAT.pack(self.frame, keys))
+            self._keys = keys
+        self.frame += 1
+
+    def close(self) -> None:
+        self.file.write(EVENT_FORMAT.pack(self.frame, 0))
+        self.file.close()
+
+
+def read_input_log(path: str) -> InputLog:
+    """
+    InputRecorder で書き出したファイルを読み込む。
+
+    Args:
+        path (str): ファイルのパス
+
+    Returns:
+        InputLog: seed、1フレームあたりの命令数、実行エンジン、フレーム数とイベント
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < FILE_HEADER.size + EVENT_FORMAT.size:
+        raise ValueError(f"input log is too short: {path}")
+    magic, version, seed, instructions_per_frame, engine = FILE_HEADER.unpack_from(data)
+    if magic != FILE_MAGIC or version != FILE_VERSION or engine >= len(ENGINES):
+        raise ValueError(f"unsupported input log: {path}")
+    events = [InputEvent(*event) for event in EVENT_FORMAT.iter_unpack(data[FILE_HEADER.size :])]
+    # 最後のイベントは終端 (フレーム数)
+    end = events.pop()
+    return InputLog(seed, instructions_per_frame, ENGINES[engine], end.frame, events)
+
+
+def replay(
+    cpu: Chip8CPU,
+    engine: Engine,
+    log: InputLog,
+    clock: Callable[[], float] = time.perf_counter,
+) -> RunResult:
+    """
+    記録したキーの状態をフレームごとに与えながら、待ち時間なしで記録と同じフレーム数だけ実行する。
+
+    cpu は記録したときと同じ ROM を読み込み、ByteRandom(log.seed) を渡して作っておく。
+    engine は log.engine と同じ種類のエンジンにする。
+
+    Args:
+        cpu (Chip8CPU): 実行する CPU
+        engine (Engine): 実行エンジン
+        log (InputLog): 記録
+        clock (Callable[[], float], optional): 時刻を返す関数. デフォルトは time.perf_counter.
+
+    Returns:
+        RunResult: 実行した命令数、フレーム数、時間
+    """
+    scheduler = FrameScheduler(cpu, engine, log.instructions_per_frame, clock=clock)
+    start_instructions = cpu.instruction_count
+    start = clock()
+    events = iter(log.events)
+    event = next(events, None)
+    for frame in range(log.frames):
+        while event is not None and event.frame == frame:
+            cpu.keypad.set_state(event.keys)
+            event = next(events, None)
+        scheduler.run_frame()
+    return RunResult(cpu.instruction_count - start_instructions, log.frames, clock() - start)
+
+
+def screen_hash(screen: Screen) -> str:
+    """
+    画面の内容の SHA-256 を返す。
+
+    Args:
+        screen (Screen): 画面
+
+    Returns:
+        str: packed_rows() を行ごとに8バイトのビッグエンディアンで並べたものの16進数のハッシュ
+    """
+    data = b"".join(row.to_bytes(screen.WIDTH // 8, "big") for row in screen.packed_rows())
+    return hashlib.sha256(data).hexdigest()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="chip8 emulator (replay)")
+    parser.add_argument("filename", help="ROM ファイル")
+    parser.add_argument("input_log", help="main.py --record で記録したファイル")
+    parser.add_argument("--screen", choices=SCREEN_BACKENDS, default="list", help="画面の実装")
+    parser.add_argument("--dump", action="store_true", help="終了時の画面とレジスタを表示する")
+    args = parser.parse_args()
+
+    log = read_input_log(args.input_log)
+    memory = Memory()
+    memory.load_fonts(FONT_START_ADDRESS)
+    memory.load_rom(args.filename, DEFAULT_PC_ADDRESS)
+    cpu = Chip8CPU(memory, create_screen(args.screen), ByteRandom(log.seed))
+    result = replay(cpu, create_engine(cpu, log.engine), log)
+
+    print(f"instructions: {result.instructions}")
+    print(f"frames: {result.frames}")
+    print(f"seconds: {result.seconds:.3f}")
+    print(f"screen: {screen_hash(cpu.screen)}")
+    if args.dump:
+        print(dump_screen(cpu.screen))
+        print(cpu)
+
+
+if __name__ == "__main__":
+    main()
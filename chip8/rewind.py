@@ -0,0 +1,224 @@
+from collections import deque
+
+from cpu import SNAPSHOT_FRAMEBUFFER_OFFSET, SNAPSHOT_RAM_OFFSET, SNAPSHOT_ROW_BYTES, Chip8CPU
+from scheduler import FRAME_RATE
+
+DEFAULT_REWIND_SECONDS = 10
+DEFAULT_KEYFRAME_INTERVAL = FRAME_RATE
+# メモリの差分を取る単位。まず RAM_BLOCK_SIZE で比べ、違うところだけ RAM_CHUNK_SIZE で比べ直す
+RAM_BLOCK_SIZE = 256
+RAM_CHUNK_SIZE = 32
+
+# (snapshot 内の位置, 変わった後のバイト列) のタプル
+Delta = tuple[tuple[int, bytes], ...]
+
+
+def diff_snapshots(previous: bytes, current: bytes) -> Delta:
+    """
+    Chip8CPU.snapshot() の2つの結果の差分を取る。
+
+    レジスタなどの先頭部分は変わっていればまとめて1つ、メモリは RAM_CHUNK_SIZE バイトごと、
+    画面は1行ごとに、変わった部分だけを持つ。
+
+    Args:
+        previous (bytes): 前のフレームのスナップショット
+        current (bytes): 今のフレームのスナップショット
+
+    Returns:
+        Delta: previous に適用すると current になる差分
+    """
+    if previous == current:
+        return ()
+
+    changes = []
+    if previous[:SNAPSHOT_RAM_OFFSET] != current[:SNAPSHOT_RAM_OFFSET]:
+        changes.append((0, current[:SNAPSHOT_RAM_OFFSET]))
+
+    for block in range(SNAPSHOT_RAM_OFFSET, SNAPSHOT_FRAMEBUFFER_OFFSET, RAM_BLOCK_SIZE):
+        if previous[block : block + RAM_BLOCK_SIZE] == current[block : block + RAM_BLOCK_SIZE]:
+            continue
+        for start in range(block, block + RAM_BLOCK_SIZE, RAM_CHUNK_SIZE):
+            chunk = current[start : start + RAM_CHUNK_SIZE]
+            if previous[start : start + RAM_CHUNK_SIZE] != chunk:
+                changes.append((start, chunk))
+
+    if previous[SNAPSHOT_FRAMEBUFFER_OFFSET:] != current[SNAPSHOT_FRAMEBUFFER_OFFSET:]:
+        for start in range(SNAPSHOT_FRAMEBUFFER_OFFSET, len(current), SNAPSHOT_ROW_BYTES):
+            row = current[start : start + SNAPSHOT_ROW_BYTES]
+            if previous[start : start + SNAPSHOT_ROW_BYTES] != row:
+                changes.append((start, row))
+    return tuple(changes)
+
+
+def apply_delta(snapshot: bytearray, delta: Delta) -> None:
+    """
+    diff_snapshots() の差分を snapshot に上書きする。
+
+    Args:
+        snapshot (bytearray): 書き換えるスナップショット
+        delta (Delta): 差分
+    """
+    for start, data in delta:
+        snapshot[start : start + len(data)] = data
+
+
+class _Segment:
+    """
+    キーフレーム1つと、それに続くフレームの差分。
+    """
+
+    __slots__ = ("first_frame", "keyframe", "deltas")
+
+    def __init__(self, first_frame: int, keyframe: bytes) -> None:
+        self.first_frame = first_frame
+        self.keyframe = keyframe
+        self.deltas: list[Delta] = []
+
+    def __len__(self) -> int:
+        return 1 + len(self.deltas)
+
+    def build(self, count: int) -> bytearray:
+        """
+        キーフレームに count 個の差分を適用したスナップショットを返す。
+        """
+        snapshot = bytearray(self.keyframe)
+        for delta in self.deltas[:count]:
+            apply_delta(snapshot, delta)
+        return snapshot
+
+
+class RewindBuffer:
+    """
+    直近のフレームの状態を差分で保持し、過去のフレームに戻せるようにする。
+
+    keyframe_interval フレームごとに完全なスナップショット (キーフレーム) を持ち、
+    その間のフレームは前のフレームからの差分だけを持つ。
+    どのフレームへの移動もキーフレームから最大 keyframe_interval - 1 個の差分を適用するだけで済む。
+    保持するフレームは max_frames 個以上 max_frames + keyframe_interval 個未満で、
+    古いものはキーフレームの区切りでまとめて捨てる。
+    """
+
+    def __init__(
+        self,
+        cpu: Chip8CPU,
+        seconds: float = DEFAULT_REWIND_SECONDS,
+        frame_rate: int = FRAME_RATE,
+        keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL,
+    ) -> None:
+        """
+        Args:
+            cpu (Chip8CPU): 状態を記録する CPU
+            seconds (float, optional): 保持する秒数. デフォルトは DEFAULT_REWIND_SECONDS.
+            frame_rate (int, optional): 1秒あたりのフレーム数. デフォルトは FRAME_RATE.
+            keyframe_interval (int, optional): キーフレームの間隔 (フレーム数). デフォルトは DEFAULT_KEYFRAME_INTERVAL.
+        """
+        if keyframe_interval < 1:
+            raise ValueError(f"keyframe_interval must be positive: {keyframe_interval}")
+        self.cpu = cpu
+        self.max_frames = max(1, int(seconds * frame_rate))
+        self.keyframe_interval = keyframe_interval
+        self._segments: deque[_Segment] = deque()
+        self._frame_count = 0
+        self._previous: bytes | None = None
+
+    def __len__(self) -> int:
+        return self._frame_count
+
+    @property
+    def first_frame(self) -> int:
+        """
+        保持している最も古いフレームの番号。
+        """
+        if not self._segments:
+            raise IndexError("rewind buffer is empty")
+        return self._segments[0].first_frame
+
+    @property
+    def last_frame(self) -> int:
+        """
+        保持している最も新しいフレームの番号。
+        """
+        return self.first_frame + self._frame_count - 1
+
+    @property
+    def nbytes(self) -> int:
+        """
+        保持しているキーフレームと差分のバイト数の合計。
+        """
+        total = 0
+        for segment in self._segments:
+            total += len(segment.keyframe)
+            total += sum(len(data) for delta in segment.deltas for _, data in delta)
+        return total
+
+    def record(self) -> int:
+        """
+        CPU の今の状態を新しいフレームとして記録する。フレームの終わりに1回呼び出す。
+
+        Returns:
+            int: 記録したフレームの番号
+        """
+        current = self.cpu.snapshot()
+        frame = self.last_frame + 1 if self._segments else 0
+        if self._previous is None or len(self._segments[-1]) >= self.keyframe_interval:
+            self._segments.append(_Segment(frame, current))
+        else:
+            self._segments[-1].deltas.append(diff_snapshots(self._previous, current))
+        self._previous = current
+        self._frame_count += 1
+
+        # 先頭のセグメントを捨てても max_frames 個残る場合だけ捨てる
+        while self._frame_count - len(self._segments[0]) >= self.max_frames:
+            self._frame_count -= len(self._segments.popleft())
+        return frame
+
+    def snapshot_at(self, frame: int) -> bytes:
+        """
+        frame 番目のフレームのスナップショットを返す。
+
+        Args:
+            frame (int): フレームの番号
+
+        Returns:
+            bytes: Chip8CPU.restore() に渡せるスナップショット
+        """
+        segment, index = self._find(frame)
+        return bytes(segment.build(index))
+
+    def seek(self, frame: int) -> None:
+        """
+        CPU を frame 番目のフレームの状態に戻し、それより新しいフレームを捨てる。
+
+        Args:
+            frame (int): フレームの番号
+        """
+        segment, index = self._find(frame)
+        snapshot = bytes(segment.build(index))
+        self.cpu.restore(snapshot)
+
+        while self._segments[-1] is not segment:
+            self._frame_count -= len(self._segments.pop())
+        self._frame_count -= len(segment.deltas) - index
+        del segment.deltas[index:]
+        self._previous = snapshot
+
+    def step_back(self, frames: int = 1) -> int:
+        """
+        CPU を frames フレーム前の状態に戻す。保持している最も古いフレームより前には戻らない。
+
+        Args:
+            frames (int, optional): 戻るフレーム数. デフォルトは 1.
+
+        Returns:
+            int: 戻った先のフレームの番号
+        """
+        frame = max(self.first_frame, self.last_frame - frames)
+        self.seek(frame)
+        return frame
+
+    def _find(self, frame: int) -> tuple[_Segment, int]:
+        if not self._segments or not self.first_frame <= frame <= self.last_frame:
+            raise IndexError(f"frame is not retained: {frame}")
+        # セグメントは keyframe_interval フレームずつなので位置を計算で求められる
+        segment = self._segments[(frame - self.first_frame) // self.keyframe_interval]
+        return segment, frame - segment.first_frame
@@ -0,0 +1,67 @@
+import hashlib
+import os
+
+# 1回のハッシュで生成するバイト数 (blake2b の最大のダイジェスト長)
+BLOCK_SIZE = 64
+SEED_MASK = (1 << 64) - 1
+
+
+def random_seed() -> int:
+    """
+    OS の乱数から 64 ビットのシードを作る。
+    """
+    return int.from_bytes(os.urandom(8), "little")
+
+
+class ByteRandom:
+    """
+    CXNN 用の、シードを指定できる乱数のバイト列。
+
+    n バイト目の値は (seed, n // BLOCK_SIZE) を blake2b でハッシュした BLOCK_SIZE バイトから取る。
+    BLOCK_SIZE バイトずつまとめて生成するので命令ごとの関数呼び出しは1回で済み、
+    状態は seed と position (何バイト使ったか) の2つの整数だけなので保存・復元も O(1) で行える。
+    """
+
+    __slots__ = ("seed", "position", "_key", "_block", "_block_start")
+
+    def __init__(self, seed: int | None = None) -> None:
+        """
+        Args:
+            seed (int | None, optional): シード. デフォルトは None (random_seed() で作る).
+        """
+        self.set_state(random_seed() if seed is None else seed, 0)
+
+    def set_state(self, seed: int, position: int) -> None:
+        """
+        シードと使ったバイト数を設定する。
+
+        Args:
+            seed (int): シード (下位 64 ビットを使う)
+            position (int): 次に返すバイトの位置
+        """
+        self.seed = seed & SEED_MASK
+        self.position = position
+        self._key = self.seed.to_bytes(8, "little")
+        self._block = b""
+        self._block_start = -BLOCK_SIZE
+
+    def _load_block(self, position: int) -> None:
+        block_number = position // BLOCK_SIZE
+        digest = hashlib.blake2b(block_number.to_bytes(8, "little"), key=self._key, digest_size=BLOCK_SIZE)
+        self._block = digest.digest()
+        self._block_start = block_number * BLOCK_SIZE
+
+    def next_byte(self) -> int:
+        """
+        次の1バイトを返す。
+
+        Returns:
+            int: 0 から 255 の値
+        """
+        position = self.position
+        offset = position - self._block_start
+        if not 0 <= offset < BLOCK_SIZE:
+            self._load_block(position)
+            offset = position - self._block_start
+        self.position = position + 1
+        return self._block[offset]
@@ -0,0 +1,134 @@
+import time
+from collections.abc import Callable
+
+from compiler import Engine
+from cpu import Chip8CPU
+from keypad import Keypad
+from screen import Screen
+
+FRAME_RATE = 60
+DEFAULT_CPU_HZ = 600
+# これ以上遅れた場合は追いつこうとせずに基準の時刻を今に合わせる
+MAX_LAG_FRAMES = 5
+
+
+class FrameScheduler:
+    """
+    1フレームごとに決まった数の命令を実行し、タイマーを 60Hz で減らすスケジューラ。
+
+    待ち時間は次のフレームの予定時刻から計算するので、sleep の誤差が積み重ならない。
+    """
+
+    def __init__(
+        self,
+        cpu: Chip8CPU,
+        engine: Engine,
+        instructions_per_frame: int = DEFAULT_CPU_HZ // FRAME_RATE,
+        frame_rate: int = FRAME_RATE,
+        clock: Callable[[], float] = time.perf_counter,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.cpu = cpu
+        self.engine = engine
+        self.instructions_per_frame = instructions_per_frame
+        self.frame_period = 1 / frame_rate
+        self.clock = clock
+        self.sleep = sleep
+
+        # run_frame() の終わりに、そのフレームの画面を渡して呼び出す (録画など)
+        self.frame_listeners: list[Callable[[Screen], None]] = []
+        self.frame_count = 0
+        self.ips = 0.0
+        self.fps = 0.0
+        self._next_deadline = clock()
+        self._measure_start = self._next_deadline
+        self._measure_instructions = cpu.instruction_count
+        self._measure_frames = 0
+
+    def run_frame(self) -> int:
+        """
+        1フレーム分の命令を実行してタイマーを1つ進める。
+
+        キーの状態は cpu.keypad から読む。
+        CPU が FX0A でキー入力待ち (CPUState.WAITING) になった場合は、そのフレームの残りの命令は実行しない。
+        タイマーを待つアイドルループを検出した場合は、残りの命令を実際には実行せずに実行したことにする。
+
+        Returns:
+            int: 実行した命令数
+        """
+        executed = 0
+        budget = self.instructions_per_frame
+        step = self.engine.step
+        cpu = self.cpu
+        # スケジューラの外で実行した命令が立てたものは使わない
+        cpu.yielded = False
+        while executed < budget:
+            executed += step()
+            if cpu.yielded:
+                cpu.yielded = False
+                if cpu.is_waiting:
+                    break
+                # アイドルループはタイマーが進むまで状態が変わらないので、残りの命令は実行したことにする
+                executed += cpu.skip_idle_loop(budget - executed)
+        cpu.tick_timers()
+        self.frame_count += 1
+        for listener in self.frame_listeners:
+            listener(cpu.screen)
+        return executed
+
+    def wait_for_next_frame(self, keypad: Keypad | None = None, keypad_version: int = 0) -> None:
+        """
+        次のフレームの予定時刻まで待ち、IPS と FPS を更新する。
+
+        keypad を渡した場合、CPU がキー入力待ちの間は keypad の状態が変わった時点で待つのをやめ、
+        次のフレームをすぐに始められるようにする。
+
+        Args:
+            keypad (Keypad | None, optional): 入力を受け取るキーパッド. デフォルトは None.
+            keypad_version (int, optional): 今のフレームに反映した keypad.version. デフォルトは 0.
+        """
+        delay = self.advance_deadline()
+        if delay > 0:
+            if keypad is not None and self.cpu.is_waiting:
+                if keypad.wait_for_change(keypad_version, delay):
+                    # 入力があったので、次のフレームの予定時刻を今にする
+                    self.reset_deadline()
+            else:
+                self.sleep(delay)
+        self.update_rates()
+
+    def advance_deadline(self) -> float:
+        """
+        次のフレームの予定時刻を1フレーム分進め、今からその時刻までの秒数を返す。
+
+        MAX_LAG_FRAMES より遅れている場合は、追いつこうとせずに予定時刻を今にする。
+
+        Returns:
+            float: 待つ秒数。遅れている場合は 0 以下
+        """
+        self._next_deadline += self.frame_period
+        delay = self._next_deadline - self.clock()
+        if delay < -self.frame_period * MAX_LAG_FRAMES:
+            self._next_deadline = self.clock()
+        return delay
+
+    def reset_deadline(self) -> None:
+        """
+        次のフレームの予定時刻を今にする。
+        """
+        self._next_deadline = self.clock()
+
+    def update_rates(self) -> None:
+        """
+        1フレーム待ち終えたことを数え、1秒ごとに IPS と FPS を計算し直す。
+        """
+        self._measure_frames += 1
+        now = self.clock()
+        elapsed = now - self._measure_start
+        # 1秒ごとに計測し直す
+        if elapsed >= 1.0:
+            self.ips = (self.cpu.instruction_count - self._measure_instructions) / elapsed
+            self.fps = self._measure_frames / elapsed
+            self._measure_start = now
+            self._measure_instructions = self.cpu.instruction_count
+            self._measure_frames = 0
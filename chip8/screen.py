@@ -1,4 +1,7 @@
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Sequence
 from dataclasses import dataclass
+from itertools import chain
 
 
 @dataclass
@@ -20,18 +23,98 @@ class Sprite:
         return "\n".join(["".join([f"{1 if pixel else 0}" for pixel in row]) for row in self.pixels])
 
 
+# 1バイトを左 (最上位ビット) から並べた8ピクセルにしたもの
+BYTE_TO_BITS: tuple[tuple[bool, ...], ...] = tuple(
+    tuple(byte >> shift & 1 == 1 for shift in range(7, -1, -1)) for byte in range(0x100)
+)
+# 1バイトのうち立っているビットの位置 (左端が 0)
+BYTE_TO_SET_BITS: tuple[tuple[int, ...], ...] = tuple(
+    tuple(i for i, bit in enumerate(bits) if bit) for bits in BYTE_TO_BITS
+)
+# 0/1 のバイト列を "0"/"1" の文字列に変換する bytes.translate 用の表
+_BIT_CHARS = bytes.maketrans(b"\x00\x01", b"01")
+
+
 def bytes_to_sprite(_bytes: list[int]) -> Sprite:
-    pixels = []
-    for byte in _bytes:
-        bits = [bit == "1" for bit in f"{byte:08b}"]
-        pixels.append(bits)
+    pixels = [list(BYTE_TO_BITS[byte]) for byte in _bytes]
     return Sprite(8, len(_bytes), pixels)
 
 
-class VirtualScreen:
+class Screen(ABC):
     WIDTH: int = 64
     HEIGHT: int = 32
 
+    @abstractmethod
+    def set_bit(self, point: Point, value: bool) -> None:
+        pass
+
+    @abstractmethod
+    def xor_bit(self, point: Point, value: bool) -> None:
+        pass
+
+    @property
+    @abstractmethod
+    def pixels(self) -> list[list[bool]]:
+        pass
+
+    @abstractmethod
+    def get_pixel(self, point: Point) -> bool:
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        pass
+
+    @abstractmethod
+    def draw_sprite(self, point: Point, splite: Sprite) -> int:
+        pass
+
+    @abstractmethod
+    def draw_bytes(self, x: int, y: int, data: bytes | bytearray | memoryview) -> int:
+        """
+        (x, y) に幅8ピクセルのスプライトを XOR で描画する。
+
+        data の1バイトがスプライトの1行になる。はみ出した部分は反対側に折り返す。
+
+        Args:
+            x (int): 描画する x 座標
+            y (int): 描画する y 座標
+            data (bytes | bytearray | memoryview): スプライトのデータ
+
+        Returns:
+            int: もともとあったピクセルが消えた場合は 1、それ以外は 0
+        """
+        pass
+
+    @abstractmethod
+    def packed_rows(self) -> list[int]:
+        """
+        各行を 64 ビットの整数にしたものを返す。
+
+        左端 (x = 0) のピクセルが最上位ビットになる。
+
+        Returns:
+            list[int]: 行ごとの整数のリスト
+        """
+        pass
+
+    @abstractmethod
+    def load_packed_rows(self, rows: Sequence[int]) -> None:
+        """
+        packed_rows() の形式の行で画面全体を置き換える。
+
+        Args:
+            rows (Sequence[int]): HEIGHT 行分の整数 (左端が最上位ビット)
+        """
+        pass
+
+
+class VirtualScreen(Screen):
+    # 描画開始の x 座標ごとの、スプライトの各列を折り返した x 座標
+    _COLUMNS: tuple[tuple[int, ...], ...] = tuple(
+        tuple((x + i) % Screen.WIDTH for i in range(8)) for x in range(Screen.WIDTH)
+    )
+
     def __init__(self) -> None:
         self._pixels = [[False] * self.WIDTH for _ in range(self.HEIGHT)]
 
@@ -65,8 +148,148 @@ class VirtualScreen:
                     collision_flag = 1
         return collision_flag
 
+    def draw_bytes(self, x: int, y: int, data: bytes | bytearray | memoryview) -> int:
+        pixels = self._pixels
+        columns = self._COLUMNS[x % self.WIDTH]
+        height = self.HEIGHT
+        collision_flag = 0
+        for i, byte in enumerate(data):
+            row_pixels = pixels[(y + i) % height]
+            # 立っているビットだけ反転する
+            for bit in BYTE_TO_SET_BITS[byte]:
+                column = columns[bit]
+                if row_pixels[column]:
+                    row_pixels[column] = False
+                    collision_flag = 1
+                else:
+                    row_pixels[column] = True
+        return collision_flag
+
+    def packed_rows(self) -> list[int]:
+        # bool のリストを 0/1 のバイト列にし、"0"/"1" の文字列として2進数で読む
+        return [int(bytes(row_pixels).translate(_BIT_CHARS), 2) for row_pixels in self._pixels]
+
+    def load_packed_rows(self, rows: Sequence[int]) -> None:
+        row_bytes = self.WIDTH // 8
+        self._pixels = [
+            list(chain.from_iterable(map(BYTE_TO_BITS.__getitem__, row.to_bytes(row_bytes, "big")))) for row in rows
+        ]
+
+
+class PackedScreen(Screen):
+    """
+    1行 (64 ピクセル) を1つの整数で持つ VirtualScreen。
+
+    スプライトの1行の描画は回転と XOR、衝突判定は AND 1回で済む。
+    """
+
+    ROW_MASK: int = (1 << Screen.WIDTH) - 1
+
+    def __init__(self) -> None:
+        self._rows = [0] * self.HEIGHT
+
+    def _bit(self, x: int) -> int:
+        return 1 << (self.WIDTH - 1 - x)
+
+    def set_bit(self, point: Point, value: bool) -> None:
+        if value:
+            self._rows[point.y] |= self._bit(point.x)
+        else:
+            self._rows[point.y] &= ~self._bit(point.x)
+
+    def xor_bit(self, point: Point, value: bool) -> None:
+        if value:
+            self._rows[point.y] ^= self._bit(point.x)
+
+    @property
+    def pixels(self) -> list[list[bool]]:
+        shifts = range(self.WIDTH - 1, -1, -1)
+        return [[row >> shift & 1 == 1 for shift in shifts] for row in self._rows]
+
+    def get_pixel(self, point: Point) -> bool:
+        return self._rows[point.y] & self._bit(point.x) != 0
+
+    def clear(self) -> None:
+        self._rows = [0] * self.HEIGHT
+
+    def draw_sprite(self, point: Point, splite: Sprite) -> int:
+        sprite_rows = []
+        for sprite_pixels in splite.pixels:
+            value = 0
+            for pixel in sprite_pixels:
+                value = value << 1 | pixel
+            sprite_rows.append(value)
+        return self.draw_rows(point.x, point.y, sprite_rows, splite.x_size)
+
+    def draw_bytes(self, x: int, y: int, data: bytes | bytearray | memoryview) -> int:
+        return self.draw_rows(x, y, data)
+
+    def draw_rows(self, x: int, y: int, sprite_rows: Iterable[int], x_size: int = 8) -> int:
+        """
+        (x, y) に1行 x_size ビットのスプライトを XOR で描画する。
+
+        はみ出した部分は反対側に折り返す。
+
+        Args:
+            x (int): 描画する x 座標
+            y (int): 描画する y 座標
+            sprite_rows (Iterable[int]): スプライトの各行 (左端が最上位ビット)
+            x_size (int, optional): スプライトの幅. デフォルトは 8.
+
+        Returns:
+            int: もともとあったピクセルが消えた場合は 1、それ以外は 0
+        """
+        width = self.WIDTH
+        mask = self.ROW_MASK
+        rows = self._rows
+        x %= width
+        collision_flag = 0
+        for i, sprite_row in enumerate(sprite_rows):
+            row_y = (y + i) % self.HEIGHT
+            # 左端に寄せてから x だけ右に回転する
+            bits = sprite_row << (width - x_size)
+            bits = ((bits >> x) | (bits << (width - x))) & mask
+            row = rows[row_y]
+            if row & bits:
+                collision_flag = 1
+            rows[row_y] = row ^ bits
+        return collision_flag
+
+    def packed_rows(self) -> list[int]:
+        return list(self._rows)
+
+    def load_packed_rows(self, rows: Sequence[int]) -> None:
+        self._rows = [row & self.ROW_MASK for row in rows]
+
+
+SCREEN_BACKENDS = ("list", "packed", "numpy")
+
+
+def create_screen(backend: str = "list") -> Screen:
+    """
+    backend に対応する画面を作る。
+
+    Args:
+        backend (str, optional): "list"、"packed" または "numpy". デフォルトは "list".
+
+    Returns:
+        Screen: 画面
+    """
+    match backend:
+        case "list":
+            return VirtualScreen()
+        case "packed":
+            return PackedScreen()
+        case "numpy":
+            # numpy は必須の依存ではないので使うときだけ読み込む
+            from numpy_screen import NumpyScreen
+
+            return NumpyScreen()
+        case _:
+            raise ValueError(f"unknown screen backend: {backend}")
+
 
-def render_to_console(screen: VirtualScreen, on_char: str = "█", off_char: str = " ", is_border: bool = False) -> None:
+def render_to_console(screen: Screen, on_char: str = "█", off_char: str = " ", is_border: bool = False) -> None:
     border_horizontal = "─"
     border_vertical = "│"
     border_upper_left = "┌"
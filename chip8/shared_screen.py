@@ -0,0 +1,175 @@
+import mmap
+import os
+import struct
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import NamedTuple
+
+from screen import Screen
+
+SEGMENT_MAGIC = b"C8FB"
+SEGMENT_VERSION = 1
+# magic, version, 幅, 高さ, 書き込み側が閉じたら 1
+HEADER_FORMAT = struct.Struct("<4sHHHB")
+# 書き込み中は奇数になるシーケンス番号と、フレーム番号。8バイト境界に置く
+COUNTER_FORMAT = struct.Struct("<Q")
+SEQUENCE_OFFSET = 16
+FRAME_OFFSET = 24
+# 画面は cpu.py のスナップショットと同じく1行を左端が最上位ビットのビッグエンディアンの 64 ビット整数にする
+ROWS_FORMAT = struct.Struct(f">{Screen.HEIGHT}Q")
+ROWS_OFFSET = 32
+SEGMENT_SIZE = ROWS_OFFSET + ROWS_FORMAT.size
+_CLOSED_OFFSET = HEADER_FORMAT.size - 1
+# 書き込み中だった場合に読み直す回数
+DEFAULT_READ_RETRIES = 100
+
+
+class SharedFrame(NamedTuple):
+    number: int
+    rows: tuple[int, ...]
+
+
+Segment = shared_memory.SharedMemory | mmap.mmap
+
+
+def _open_segment(name: str | None, path: str | None, create: bool) -> tuple[memoryview, Segment]:
+    """
+    共有メモリまたはファイルを mmap した領域を開く。
+
+    Returns:
+        tuple[memoryview, Segment]: 領域と、閉じるときに使う SharedMemory または mmap
+    """
+    if path is not None:
+        if create:
+            with open(path, "wb") as f:
+                f.truncate(SEGMENT_SIZE)
+        fd = os.open(path, os.O_RDWR if create else os.O_RDONLY)
+        try:
+            mapped = mmap.mmap(fd, SEGMENT_SIZE, access=mmap.ACCESS_WRITE if create else mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+        return memoryview(mapped), mapped
+
+    if create:
+        memory = shared_memory.SharedMemory(name, create=True, size=SEGMENT_SIZE)
+    else:
+        memory = shared_memory.SharedMemory(name)
+        if sys.version_info < (3, 13):
+            # 読み込み側の終了時に resource_tracker が共有メモリを消さないようにする (3.13 以降は track=False)
+            resource_tracker.unregister(memory._name, "shared_memory")  # type: ignore[attr-defined]
+    assert memory.buf is not None
+    return memory.buf, memory
+
+
+class SharedScreenWriter:
+    """
+    画面とフレーム番号を共有メモリ (または mmap したファイル) に書き出す。
+
+    読み込み側は別プロセスで SharedScreenReader を使う。書き込みはシーケンスロックで行い、
+    書き込み中はシーケンス番号を奇数にするので、読み込み側は書き込み側を待たせずに一貫したフレームを読める。
+    """
+
+    def __init__(self, name: str | None = None, path: str | None = None) -> None:
+        """
+        Args:
+            name (str | None, optional): 共有メモリの名前. デフォルトは None (自動で付ける).
+            path (str | None, optional): 共有メモリの代わりに mmap するファイル. デフォルトは None.
+        """
+        self._buffer, self._segment = _open_segment(name, path, create=True)
+        # 読み込み側に渡す名前 (ファイルの場合はパス)
+        self.name = self._segment.name if isinstance(self._segment, shared_memory.SharedMemory) else path
+        HEADER_FORMAT.pack_into(self._buffer, 0, SEGMENT_MAGIC, SEGMENT_VERSION, Screen.WIDTH, Screen.HEIGHT, 0)
+        self._sequence = 0
+        self.frame = 0
+
+    def publish(self, screen: Screen) -> int:
+        """
+        画面を次のフレームとして書き出す。フレームの終わりに1回呼び出す。
+
+        Args:
+            screen (Screen): 画面
+
+        Returns:
+            int: 書き出したフレームの番号 (1 から始まる)
+        """
+        buffer = self._buffer
+        rows = screen.packed_rows()
+        self.frame += 1
+        COUNTER_FORMAT.pack_into(buffer, SEQUENCE_OFFSET, self._sequence + 1)
+        COUNTER_FORMAT.pack_into(buffer, FRAME_OFFSET, self.frame)
+        ROWS_FORMAT.pack_into(buffer, ROWS_OFFSET, *rows)
+        self._sequence += 2
+        COUNTER_FORMAT.pack_into(buffer, SEQUENCE_OFFSET, self._sequence)
+        return self.frame
+
+    def close(self) -> None:
+        """
+        読み込み側に終了を知らせて領域を閉じる。共有メモリの場合は削除する。
+        """
+        self._buffer[_CLOSED_OFFSET] = 1
+        self._buffer.release()
+        self._segment.close()
+        if isinstance(self._segment, shared_memory.SharedMemory):
+            self._segment.unlink()
+
+
+class SharedScreenReader:
+    """
+    SharedScreenWriter が書き出した画面を読み込む。
+    """
+
+    def __init__(self, name: str | None = None, path: str | None = None) -> None:
+        """
+        Args:
+            name (str | None, optional): 共有メモリの名前. デフォルトは None.
+            path (str | None, optional): mmap するファイル. デフォルトは None.
+
+        Raises:
+            ValueError: 形式やバージョン、画面の大きさが違う場合
+        """
+        if (name is None) == (path is None):
+            raise ValueError("either name or path is required")
+        self._buffer, self._segment = _open_segment(name, path, create=False)
+        magic, version, width, height, _ = HEADER_FORMAT.unpack_from(self._buffer)
+        if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION or (width, height) != (Screen.WIDTH, Screen.HEIGHT):
+            self.close()
+            raise ValueError(f"unsupported shared screen: {name or path}")
+
+    @property
+    def closed(self) -> bool:
+        """
+        書き込み側が閉じたかどうか。
+        """
+        return self._buffer[_CLOSED_OFFSET] == 1
+
+    def read(self, retries: int = DEFAULT_READ_RETRIES) -> SharedFrame | None:
+        """
+        最新のフレームを読み込む。
+
+        シーケンス番号が読み込みの前後で同じで偶数なら、その間に書き込みはなかったので一貫している。
+
+        Args:
+            retries (int, optional): 書き込み中だった場合に読み直す回数. デフォルトは DEFAULT_READ_RETRIES.
+
+        Returns:
+            SharedFrame | None: フレーム番号と各行。まだ1フレームも書き出されていないか、
+                retries 回とも書き込み中だった場合は None
+        """
+        buffer = self._buffer
+        for _ in range(retries + 1):
+            (before,) = COUNTER_FORMAT.unpack_from(buffer, SEQUENCE_OFFSET)
+            if before & 1:
+                # 書き込み側に実行を譲ってから読み直す
+                time.sleep(0)
+                continue
+            (number,) = COUNTER_FORMAT.unpack_from(buffer, FRAME_OFFSET)
+            rows = ROWS_FORMAT.unpack_from(buffer, ROWS_OFFSET)
+            (after,) = COUNTER_FORMAT.unpack_from(buffer, SEQUENCE_OFFSET)
+            if before == after:
+                return SharedFrame(number, rows) if number > 0 else None
+        return None
+
+    def close(self) -> None:
+        self._buffer.release()
+        self._segment.close()
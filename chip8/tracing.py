@@ -0,0 +1,170 @@
+import struct
+import sys
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from typing import BinaryIO, NamedTuple, TextIO
+
+# pc, opcode, I, V0-VF の固定長 22 バイト
+RECORD_FORMAT = struct.Struct("<HHH16B")
+RECORD_SIZE = RECORD_FORMAT.size
+
+FILE_MAGIC = b"C8TR"
+FILE_VERSION = 1
+FILE_HEADER = struct.Struct("<4sHH")
+
+TRACE_KINDS = ("none", "text", "binary", "ring")
+
+
+class TraceRecord(NamedTuple):
+    pc: int
+    opcode: int
+    i: int
+    vs: tuple[int, ...]
+
+    def __str__(self) -> str:
+        return f"pc={self.pc:04x} op={self.opcode:04x} i={self.i:04x} v={' '.join(f'{v:02x}' for v in self.vs)}"
+
+
+def unpack_record(data: bytes | bytearray | memoryview, offset: int = 0) -> TraceRecord:
+    pc, opcode, i, *vs = RECORD_FORMAT.unpack_from(data, offset)
+    return TraceRecord(pc, opcode, i, tuple(vs))
+
+
+class TraceSink(ABC):
+    @abstractmethod
+    def write(self, pc: int, opcode: int, i: int, vs: bytes | bytearray) -> None:
+        """
+        命令を実行する直前の状態を1件記録する。
+
+        Args:
+            pc (int): 命令のアドレス
+            opcode (int): 命令
+            i (int): I レジスタ
+            vs (bytes | bytearray): V0-VF
+        """
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class TextSink(TraceSink):
+    """
+    1件ごとに1行のテキストで書き出す。
+
+    path を指定した場合はそのファイルを開いて書き込み、close() で閉じる。output に渡したストリームは閉じない。
+    """
+
+    def __init__(self, output: TextIO = sys.stdout, path: str | None = None) -> None:
+        self._owns_output = path is not None
+        self.output = open(path, "w") if path is not None else output
+
+    def write(self, pc: int, opcode: int, i: int, vs: bytes | bytearray) -> None:
+        self.output.write(f"{TraceRecord(pc, opcode, i, tuple(vs))}\n")
+
+    def close(self) -> None:
+        if self._owns_output:
+            self.output.close()
+        else:
+            self.output.flush()
+
+
+def _write_header(output: BinaryIO) -> None:
+    output.write(FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, RECORD_SIZE))
+
+
+class BinaryFileSink(TraceSink):
+    """
+    固定長のレコードをそのままファイルに書き込む。1000万命令で 220MB 程度になる。
+    """
+
+    def __init__(self, path: str) -> None:
+        self.file = open(path, "wb")
+        _write_header(self.file)
+
+    def write(self, pc: int, opcode: int, i: int, vs: bytes | bytearray) -> None:
+        self.file.write(RECORD_FORMAT.pack(pc, opcode, i, *vs))
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class RingBufferSink(TraceSink):
+    """
+    直近 capacity 件だけをメモリ上に残す。
+
+    path を指定した場合は close() のときに残っているレコードをバイナリ形式で書き出す。
+    """
+
+    def __init__(self, capacity: int = 100_000, path: str | None = None) -> None:
+        self.capacity = capacity
+        self.path = path
+        self._buffer = bytearray(capacity * RECORD_SIZE)
+        self._count = 0
+
+    def write(self, pc: int, opcode: int, i: int, vs: bytes | bytearray) -> None:
+        RECORD_FORMAT.pack_into(self._buffer, (self._count % self.capacity) * RECORD_SIZE, pc, opcode, i, *vs)
+        self._count += 1
+
+    def records(self) -> list[TraceRecord]:
+        """
+        残っているレコードを古い順に返す。
+
+        Returns:
+            list[TraceRecord]: レコードのリスト
+        """
+        first = max(0, self._count - self.capacity)
+        return [unpack_record(self._buffer, (n % self.capacity) * RECORD_SIZE) for n in range(first, self._count)]
+
+    def close(self) -> None:
+        if self.path is None:
+            return
+        with open(self.path, "wb") as f:
+            _write_header(f)
+            for record in self.records():
+                f.write(RECORD_FORMAT.pack(record.pc, record.opcode, record.i, *record.vs))
+
+
+def read_trace(path: str) -> Iterator[TraceRecord]:
+    """
+    BinaryFileSink や RingBufferSink が書き出したファイルを読み込む。
+
+    Args:
+        path (str): ファイルのパス
+
+    Yields:
+        Iterator[TraceRecord]: 記録した順のレコード
+    """
+    with open(path, "rb") as f:
+        magic, version, record_size = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+        if magic != FILE_MAGIC or version != FILE_VERSION or record_size != RECORD_SIZE:
+            raise ValueError(f"unsupported trace file: {path}")
+        while data := f.read(RECORD_SIZE * 4096):
+            for offset in range(0, len(data), RECORD_SIZE):
+                yield unpack_record(data, offset)
+
+
+def create_sink(kind: str, path: str | None = None) -> TraceSink | None:
+    """
+    種類に対応するトレースの出力先を作る。
+
+    Args:
+        kind (str): "none"、"text"、"binary" または "ring"
+        path (str | None, optional): 出力先のファイル. text で省略した場合は標準出力. デフォルトは None.
+
+    Returns:
+        TraceSink | None: 出力先。"none" の場合は None
+    """
+    match kind:
+        case "none":
+            return None
+        case "text":
+            return TextSink(path=path)
+        case "binary":
+            if path is None:
+                raise ValueError("binary trace requires a path")
+            return BinaryFileSink(path)
+        case "ring":
+            return RingBufferSink(path=path)
+        case _:
+            raise ValueError(f"unknown trace kind: {kind}")
@@ -0,0 +1,54 @@
+import argparse
+import time
+
+from renderer import TerminalRenderer
+from scheduler import FRAME_RATE
+from screen import PackedScreen
+from shared_screen import SharedScreenReader
+
+
+def view(reader: SharedScreenReader, interval: float = 1 / FRAME_RATE) -> None:
+    """
+    書き込み側が閉じるまで、interval 秒ごとに最新のフレームを読み込んで変わっていれば描画する。
+
+    描画が間に合わない間に書き出されたフレームは読み飛ばす。
+
+    Args:
+        reader (SharedScreenReader): 画面の読み込み元
+        interval (float, optional): 読み込む間隔 (秒). デフォルトは 1 / FRAME_RATE.
+    """
+    screen = PackedScreen()
+    renderer = TerminalRenderer()
+    last_number = 0
+    skipped = 0
+    try:
+        while not reader.closed:
+            frame = reader.read()
+            if frame is not None and frame.number != last_number:
+                if last_number:
+                    skipped += frame.number - last_number - 1
+                last_number = frame.number
+                screen.load_packed_rows(frame.rows)
+                renderer.render(screen, [f"frame: {frame.number}, skipped: {skipped}"])
+            time.sleep(interval)
+    finally:
+        renderer.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="chip8 emulator (viewer)")
+    parser.add_argument("name", help="main.py --export で指定した共有メモリの名前 (--file の場合はファイルのパス)")
+    parser.add_argument("--file", action="store_true", help="共有メモリの代わりに mmap したファイルから読む")
+    args = parser.parse_args()
+
+    reader = SharedScreenReader(path=args.name) if args.file else SharedScreenReader(name=args.name)
+    try:
+        view(reader)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
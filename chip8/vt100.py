@@ -7,3 +7,20 @@ def clear_screen() -> str:
 
 def return_cursor_to_home() -> str:
     return f"{ESCAPE}[H"
+
+
+def move_cursor(row: int, column: int) -> str:
+    # row, column は 1 始まり
+    return f"{ESCAPE}[{row};{column}H"
+
+
+def erase_to_end_of_line() -> str:
+    return f"{ESCAPE}[K"
+
+
+def hide_cursor() -> str:
+    return f"{ESCAPE}[?25l"
+
+
+def show_cursor() -> str:
+    return f"{ESCAPE}[?25h"
@@ -0,0 +1,132 @@
+import random
+
+import pytest
+
+from chip8.compiler import create_engine
+from chip8.cpu import DEFAULT_PC_ADDRESS, FONT_START_ADDRESS, Chip8CPU
+from chip8.memory import Memory
+from chip8.rng import ByteRandom
+from chip8.scheduler import FrameScheduler
+from chip8.screen import PackedScreen
+
+pytest.importorskip("numpy")
+from chip8.batch import BatchCPU  # noqa: E402
+
+# ほぼすべての命令を通るループ
+PROGRAM = {
+    0x200: [
+        0x6A05,  # vA := 5
+        0xC03F,  # v0 := random & 0x3F
+        0xC11F,  # v1 := random & 0x1F
+        0xF029,  # i := font(v0)
+        0xD015,  # draw (v0, v1) 5 行
+        0x2230,  # call 0x230
+        0xE29E,  # キー v2 が押されていればスキップ
+        0x7301,  # v3 += 1
+        0xE2A1,  # キー v2 が押されていなければスキップ
+        0x7401,  # v4 += 1
+        0x8014,  # v0 += v1
+        0x8125,  # v1 -= v2
+        0x8236,  # v2 >>= 1
+        0x830E,  # v3 <<= 1
+        0x8457,  # v4 := v5 - v4
+        0x8FA4,  # vF += vA
+        0x8568,  # 未対応の命令
+        0xF70A,  # v7 := キー入力
+        0x1202,  # jump 0x202
+    ],
+    0x230: [
+        0xA300,  # i := 0x300
+        0xF333,  # bcd v3
+        0xF555,  # save v0..v5
+        0xF01E,  # i += v0
+        0xF265,  # load v0..v2
+        0xF015,  # dt := v0
+        0xF318,  # st := v3
+        0xF607,  # v6 := dt
+        0x5670,  # v6 == v7 ならスキップ
+        0x9670,  # v6 != v7 ならスキップ
+        0x3600,  # v6 == 0 ならスキップ
+        0x4601,  # v6 != 1 ならスキップ
+        0x8161,  # v1 |= v6
+        0x8262,  # v2 &= v6
+        0x8363,  # v3 ^= v6
+        0x8560,  # v5 := v6
+        0x0123,  # 未対応の命令
+        0x7AFF,  # vA -= 1
+        0x4A00,  # vA != 0 ならスキップ
+        0x00E0,  # clear
+        0x00EE,  # return
+    ],
+}
+INSTRUCTIONS_PER_FRAME = 25
+
+
+def create_memory() -> Memory:
+    memory = Memory()
+    memory.load_fonts(FONT_START_ADDRESS)
+    for address, codes in PROGRAM.items():
+        memory.write_bytes(address, [byte for code in codes for byte in code.to_bytes(2, "big")])
+    return memory
+
+
+def test_batch_matches_cpu():
+    count = 16
+    seeds = list(range(count))
+    batch = BatchCPU(create_memory(), count, seeds)
+    cpus = [Chip8CPU(create_memory(), PackedScreen(), ByteRandom(seed)) for seed in seeds]
+    schedulers = [FrameScheduler(cpu, create_engine(cpu, "interp"), INSTRUCTIONS_PER_FRAME) for cpu in cpus]
+
+    rng = random.Random(0)
+    for _ in range(60):
+        for index, (cpu, scheduler) in enumerate(zip(cpus, schedulers)):
+            # 台ごとに違うキーを押す (押さないフレームもある)
+            keys = rng.choice([0, 0, 1 << rng.randrange(16), rng.randrange(0x10000)])
+            cpu.keypad.set_state(keys)
+            batch.keys[index] = keys
+            scheduler.run_frame()
+        batch.run_frame(INSTRUCTIONS_PER_FRAME)
+
+        for index, cpu in enumerate(cpus):
+            assert batch.snapshot(index) == cpu.snapshot()
+    assert batch.instruction_count.tolist() == [cpu.instruction_count for cpu in cpus]
+    assert batch.unknown_opcode_count.tolist() == [cpu.unknown_opcode_count for cpu in cpus]
+    # キー入力待ちで止まったフレームがある
+    assert min(batch.instruction_count) < 60 * INSTRUCTIONS_PER_FRAME
+
+
+def test_wait_for_key_stops_frame():
+    # 0x200: F30A: v3 := キー入力
+    # 0x202: 1200: jump 0x200
+    memory = Memory()
+    memory.write_bytes(DEFAULT_PC_ADDRESS, [0xF3, 0x0A, 0x12, 0x00])
+    batch = BatchCPU(memory, 3, [0, 1, 2])
+    batch.keys[:] = [0, 0x0010, 0]
+    batch.run_frame(10)
+    # 待ち始めたときに押されていたキーは入力とみなさない
+    assert batch.waiting.tolist() == [True, True, True]
+    assert batch.instruction_count.tolist() == [1, 1, 1]
+
+    batch.keys[:] = [0x0100, 0x0030, 0]
+    batch.run_frame(10)
+    assert batch.waiting.tolist() == [True, True, True]
+    assert batch.v[:, 3].tolist() == [8, 5, 0]
+    assert batch.instruction_count.tolist() == [4, 4, 2]
+
+
+def test_restore_from_cpu():
+    cpu = Chip8CPU(create_memory(), PackedScreen(), ByteRandom(7))
+    scheduler = FrameScheduler(cpu, create_engine(cpu, "interp"), INSTRUCTIONS_PER_FRAME)
+    for _ in range(3):
+        scheduler.run_frame()
+
+    batch = BatchCPU(Memory(), 2, [0, 0])
+    batch.restore(1, cpu.snapshot())
+    assert batch.snapshot(1) == cpu.snapshot()
+    for _ in range(3):
+        scheduler.run_frame()
+        batch.run_frame(INSTRUCTIONS_PER_FRAME)
+    assert batch.snapshot(1) == cpu.snapshot()
+
+    with pytest.raises(ValueError):
+        batch.restore(0, b"C8SS")
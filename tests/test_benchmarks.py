@@ -0,0 +1,23 @@
+import pytest
+
+from benchmarks.suite import compare, run_workload
+from benchmarks.workloads import WORKLOADS
+
+
+@pytest.mark.parametrize("name", WORKLOADS)
+def test_workload_runs(name: str):
+    result = run_workload(name, "interp", "packed", frames=1)
+    assert result["instructions"] >= 1000
+    assert result["peak_memory"] > 0
+
+
+def test_compare_flags_regressions():
+    key = {"workload": "alu", "engine": "interp", "screen": "list"}
+    base = {"results": [{**key, "ips": 100, "fps": 10, "peak_memory": 100}]}
+    current = {"results": [{**key, "ips": 85, "fps": 10, "peak_memory": 125}]}
+
+    regressions = compare(base, current, threshold=0.1)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("alu/interp/list ips")
+    assert regressions[1].startswith("alu/interp/list peak_memory")
+    assert compare(base, current, threshold=0.3) == []
@@ -0,0 +1,233 @@
+import io
+import struct
+
+import pytest
+
+from chip8.capture import GifCapture, PnmCapture, capture_format, create_capture
+from chip8.compiler import create_engine
+from chip8.cpu import DEFAULT_PC_ADDRESS, Chip8CPU
+from chip8.headless import run_headless
+from chip8.memory import Memory
+from chip8.screen import PackedScreen, VirtualScreen
+
+
+class KeepOpen(io.BytesIO):
+    # close() の後も書き出した内容を読めるようにする
+    def close(self) -> None:
+        pass
+
+
+def screen_with(rows: dict[int, int]) -> PackedScreen:
+    screen = PackedScreen()
+    screen.load_packed_rows([rows.get(y, 0) for y in range(32)])
+    return screen
+
+
+def parse_pnm(data: bytes) -> list[tuple[bytes, int, int, int, bytes]]:
+    """
+    連結した PNM を (magic, フレーム数, 幅, 高さ, 画素) のリストにする。
+    """
+    images = []
+    stream = io.BytesIO(data)
+    while magic := stream.readline().strip():
+        frames = int(stream.readline().split()[-1])
+        width, height = map(int, stream.readline().split())
+        if magic == b"P4":
+            size = width // 8 * height
+        else:
+            assert stream.readline() == b"255\n"
+            size = width * height * 3
+        images.append((magic, frames, width, height, stream.read(size)))
+    return images
+
+
+def lzw_decode(data: bytes, min_code_size: int) -> list[int]:
+    clear = 1 << min_code_size
+    end = clear + 1
+    value = int.from_bytes(data, "little")
+    position = 0
+    pixels: list[int] = []
+    table: list[list[int]] = []
+    width = min_code_size + 1
+    previous: list[int] | None = None
+    while True:
+        code = value >> position & ((1 << width) - 1)
+        position += width
+        if code == clear:
+            table = [[i] for i in range(clear)] + [[], []]
+            width = min_code_size + 1
+            previous = None
+            continue
+        if code == end:
+            return pixels
+        if code < len(table):
+            entry = table[code]
+        else:
+            # まだ辞書にないコードは直前の列 + その先頭
+            assert previous is not None
+            entry = previous + previous[:1]
+        if previous is not None:
+            table.append(previous + entry[:1])
+            if len(table) == 1 << width and width < 12:
+                width += 1
+        pixels.extend(entry)
+        previous = entry
+
+
+def parse_gif(data: bytes) -> tuple[tuple[int, int], int, list[tuple[int, list[int]]]]:
+    """
+    GIF を (大きさ, ループ回数, [(delay, 画素)]) にする。
+    """
+    assert data[:6] == b"GIF89a"
+    width, height, flags, _, _ = struct.unpack_from("<HHBBB", data, 6)
+    position = 13 + 3 * (2 << (flags & 7))
+    loop = -1
+    frames = []
+    delay = 0
+    while data[position] != 0x3B:
+        if data[position] == 0x21:
+            label = data[position + 1]
+            position += 2
+            blocks = b""
+            while data[position]:
+                blocks += data[position + 1 : position + 1 + data[position]]
+                position += 1 + data[position]
+            position += 1
+            if label == 0xF9:
+                delay = struct.unpack_from("<H", blocks, 1)[0]
+            elif label == 0xFF:
+                loop = struct.unpack_from("<H", blocks, 12)[0]
+        else:
+            assert data[position] == 0x2C
+            assert struct.unpack_from("<HHHHB", data, position + 1) == (0, 0, width, height, 0)
+            min_code_size = data[position + 10]
+            position += 11
+            blocks = b""
+            while data[position]:
+                blocks += data[position + 1 : position + 1 + data[position]]
+                position += 1 + data[position]
+            position += 1
+            frames.append((delay, lzw_decode(blocks, min_code_size)))
+    return (width, height), loop, frames
+
+
+def test_pbm_folds_identical_frames():
+    output = KeepOpen()
+    capture = PnmCapture(output, "pbm")
+    first = screen_with({0: 1 << 63})
+    second = screen_with({31: 1})
+    for screen in [first, first, first, second, second, first]:
+        capture(screen)
+    capture.close()
+
+    images = parse_pnm(output.getvalue())
+    assert [(magic, frames, width, height) for magic, frames, width, height, _ in images] == [
+        (b"P4", 3, 64, 32),
+        (b"P4", 2, 64, 32),
+        (b"P4", 1, 64, 32),
+    ]
+    assert capture.frame_count == 6
+    assert capture.written_count == 3
+    # 点灯しているピクセルは白 (0)
+    pixels = images[0][4]
+    assert pixels[0] == 0x7F
+    assert pixels[1:] == b"\xff" * (8 * 32 - 1)
+
+
+def test_ppm_scale():
+    output = KeepOpen()
+    capture = PnmCapture(output, "ppm", scale=2)
+    capture(screen_with({1: 1 << 62}))
+    capture.close()
+
+    [(magic, frames, width, height, pixels)] = parse_pnm(output.getvalue())
+    assert (magic, frames, width, height) == (b"P6", 1, 128, 64)
+    lit = [(i // 3 % width, i // 3 // width) for i in range(0, len(pixels), 3) if pixels[i : i + 3] == b"\xff\xff\xff"]
+    assert lit == [(2, 2), (3, 2), (2, 3), (3, 3)]
+
+
+@pytest.mark.parametrize("scale", [1, 3])
+def test_gif(scale: int):
+    output = KeepOpen()
+    capture = GifCapture(output, scale=scale)
+    first = screen_with({0: 0xF0F0 << 48, 31: 1})
+    second = screen_with({})
+    for screen in [first] * 6 + [second] * 3:
+        capture(screen)
+    capture.close()
+
+    size, loop, frames = parse_gif(output.getvalue())
+    width, height = 64 * scale, 32 * scale
+    assert size == (width, height)
+    assert loop == 0
+    # 6 フレーム = 10cs, 9 フレーム = 15cs
+    assert [delay for delay, _ in frames] == [10, 5]
+    pixels = frames[0][1]
+    assert len(pixels) == width * height
+    lit = {(i % width // scale, i // width // scale) for i, pixel in enumerate(pixels) if pixel}
+    assert lit == {(0, 0), (1, 0), (2, 0), (3, 0), (8, 0), (9, 0), (10, 0), (11, 0), (63, 31)}
+    assert not any(frames[1][1])
+
+
+def test_gif_long_delay():
+    output = KeepOpen()
+    capture = GifCapture(output)
+    screen = screen_with({})
+    # 0xFFFF cs を超える長さは同じ画像を続けて書く
+    for _ in range(40000):
+        capture(screen)
+    capture.close()
+
+    _, _, frames = parse_gif(output.getvalue())
+    assert [delay for delay, _ in frames] == [0xFFFF, 40000 * 100 // 60 - 0xFFFF]
+
+
+def test_gif_with_pillow():
+    image_module = pytest.importorskip("PIL.Image")
+    output = KeepOpen()
+    capture = GifCapture(output, scale=2)
+    capture(screen_with({0: 1 << 63}))
+    capture(screen_with({5: 1}))
+    capture.close()
+
+    image = image_module.open(io.BytesIO(output.getvalue()))
+    assert image.size == (128, 64)
+    assert image.n_frames == 2
+    assert image.convert("L").getbbox() == (0, 0, 2, 2)
+    image.seek(1)
+    assert image.convert("L").getbbox() == (126, 10, 128, 12)
+
+
+def test_empty_capture():
+    output = KeepOpen()
+    capture = GifCapture(output)
+    capture.close()
+    assert output.getvalue() == b""
+
+
+def test_capture_format(tmp_path):
+    assert capture_format("out.GIF") == "gif"
+    assert capture_format("frames.pbm") == "pbm"
+    assert capture_format("frames.png") is None
+    with pytest.raises(ValueError):
+        create_capture("png", str(tmp_path / "frames.png"))
+    assert not (tmp_path / "frames.png").exists()
+
+
+def test_run_headless_capture(tmp_path):
+    # 0x200: A206: I = 0x206
+    # 0x202: D011: (v0, v1) に 0x206 の 1 行のスプライトを描画
+    # 0x204: 1202: jump 0x202 (描画するたびに点滅する)
+    # 0x206: 80
+    memory = Memory()
+    memory.write_bytes(DEFAULT_PC_ADDRESS, [0xA2, 0x06, 0xD0, 0x11, 0x12, 0x02, 0x80])
+    cpu = Chip8CPU(memory, VirtualScreen())
+    path = tmp_path / "frames.pbm"
+    capture = create_capture("pbm", str(path))
+    run_headless(cpu, create_engine(cpu, "interp"), max_frames=4, instructions_per_frame=2, frame_listeners=[capture])
+    capture.close()
+
+    # 各フレームで 1 回ずつ描画するので、点灯と消灯を繰り返す
+    images = parse_pnm(path.read_bytes())
+    assert sum(frames for _, frames, _, _, _ in images) == 4
+    assert [pixels[0] for _, _, _, _, pixels in images] == [0x7F, 0xFF, 0x7F, 0xFF]
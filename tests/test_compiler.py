@@ -0,0 +1,148 @@
+import random
+
+import pytest
+
+from chip8.compiler import BlockEngine, compile_block, create_engine
+from chip8.cpu import DEFAULT_PC_ADDRESS, FONT_START_ADDRESS, Chip8CPU
+from chip8.memory import Memory
+from chip8.rng import ByteRandom
+from chip8.screen import VirtualScreen
+
+# tests/test_cpu.py で使っている命令 (+ 複数命令のプログラム)
+PROGRAMS = [
+    [0x00, 0xE0],
+    [0x00, 0xEE],
+    [0x13, 0x33],
+    [0x23, 0x33],
+    [0x30, 0x10],
+    [0x40, 0x10],
+    [0x50, 0x10],
+    [0x6F, 0x10],
+    [0x70, 0xFF],
+    [0x80, 0xF0],
+    [0x80, 0xF1],
+    [0x8F, 0x02],
+    [0x80, 0xF3],
+    [0x80, 0x14],
+    [0x8F, 0x04],
+    [0x80, 0x15],
+    [0x80, 0x16],
+    [0x8F, 0x06],
+    [0x80, 0x17],
+    [0x80, 0x1E],
+    [0x90, 0x10],
+    [0xA3, 0x33],
+    [0xB3, 0x03],
+    [0xC0, 0x0F],
+    [0xD0, 0x15],
+    [0xE0, 0x9E],
+    [0xE0, 0xA1],
+    [0xF0, 0x07],
+    [0xF0, 0x15],
+    [0xF0, 0x18],
+    [0xF0, 0x1E],
+    [0xF0, 0x29],
+    [0xF0, 0x33],
+    [0xF2, 0x55],
+    [0xF2, 0x65],
+    [0x22, 0x06, 0x00, 0x00, 0x00, 0x00, 0x00, 0xEE],
+    # ALU のループ: v0 を数えながら v1 に足し込む
+    [0x60, 0x00, 0x61, 0x00, 0x70, 0x01, 0x81, 0x04, 0x82, 0x15, 0x30, 0x20, 0x12, 0x04, 0xF2, 0x33],
+]
+
+
+def create_cpu(program: list[int], seed: int) -> Chip8CPU:
+    memory = Memory()
+    memory.load_fonts(FONT_START_ADDRESS)
+    memory.write_bytes(DEFAULT_PC_ADDRESS, program)
+    cpu = Chip8CPU(memory, VirtualScreen(), ByteRandom(seed))
+
+    rng = random.Random(seed)
+    for register in cpu.rg_vs:
+        register.write(rng.randrange(0x100))
+    cpu.rg_i.write(0x300 + rng.randrange(0x100))
+    cpu.rg_dt.write(rng.randrange(0x100))
+    cpu.rg_st.write(rng.randrange(0x100))
+    cpu.rg_sp.write(1)
+    cpu.stack[0] = 0x222
+    return cpu
+
+
+def state(cpu: Chip8CPU) -> tuple:
+    return (
+        [register.read() for register in cpu.rg_vs],
+        cpu.rg_i.read(),
+        cpu.rg_pc.read(),
+        cpu.rg_sp.read(),
+        cpu.rg_dt.read(),
+        cpu.rg_st.read(),
+        list(cpu.stack),
+        bytes(cpu.memory.memory),
+        cpu.screen.pixels,
+        cpu.unknown_opcode_count,
+        cpu.instruction_count,
+        cpu.rng.position,
+    )
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("program", PROGRAMS, ids=lambda program: "".join(f"{byte:02x}" for byte in program[:2]))
+def test_engines_match(program: list[int], seed: int):
+    block_cpu = create_cpu(program, seed)
+    block_engine = create_engine(block_cpu, "block")
+    for _ in range(5):
+        block_engine.step("1")
+
+    interp_cpu = create_cpu(program, seed)
+    interp_engine = create_engine(interp_cpu, "interp")
+    while interp_cpu.instruction_count < block_cpu.instruction_count:
+        interp_engine.step("1")
+
+    assert state(block_cpu) == state(interp_cpu)
+
+
+def test_block_ends_at_branch():
+    # 6001 7001 1200: ジャンプで終わる3命令のブロック
+    memory = Memory()
+    memory.write_bytes(DEFAULT_PC_ADDRESS, [0x60, 0x01, 0x70, 0x01, 0x12, 0x00])
+    cpu = Chip8CPU(memory, VirtualScreen())
+
+    block = compile_block(cpu, DEFAULT_PC_ADDRESS)
+    assert (block.start, block.end, block.length) == (0x200, 0x206, 3)
+
+
+def test_block_instructions_are_not_cache_hits():
+    # 0x200: 6001: v0 := 0x01
+    # 0x202: 7001: v0 += 1
+    # 0x204: 1200: jump 0x200
+    memory = Memory()
+    memory.write_bytes(DEFAULT_PC_ADDRESS, [0x60, 0x01, 0x70, 0x01, 0x12, 0x00])
+    cpu = Chip8CPU(memory, VirtualScreen())
+    engine = BlockEngine(cpu)
+
+    for _ in range(10):
+        engine.step()
+    assert cpu.instruction_count == 30
+    assert cpu.compiled_instruction_count == 30
+    # ブロックは memory.decoded を引かないので、ヒットにもミスにも数えない
+    assert (cpu.cache_hits, cpu.cache_misses) == (0, 0)
+
+
+def test_block_invalidated_on_write():
+    # 0x200: 6101: v1 := 0x01  (F055 で 6109 に書き換えられる)
+    # 0x202: A201: i := 0x201
+    # 0x204: F055: save v0 to 0x201
+    # 0x206: 1200: jump 0x200
+    memory = Memory()
+    memory.write_bytes(DEFAULT_PC_ADDRESS, [0x61, 0x01, 0xA2, 0x01, 0xF0, 0x55, 0x12, 0x00])
+    cpu = Chip8CPU(memory, VirtualScreen())
+    cpu.rg_vs[0].write(0x09)
+    engine = BlockEngine(cpu)
+
+    engine.step()
+    assert cpu.rg_vs[1].read() == 0x01
+    assert DEFAULT_PC_ADDRESS not in engine.blocks
+
+    engine.step()  # jump 0x200
+    engine.step()
+    assert cpu.rg_vs[1].read() == 0x09
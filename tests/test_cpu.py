@@ -2,7 +2,7 @@ from itertools import chain
 
 import pytest
 
-from chip8.cpu import DEFAULT_PC_ADDRESS, FONT_START_ADDRESS, Chip8CPU
+from chip8.cpu import DEFAULT_PC_ADDRESS, FONT_START_ADDRESS, Chip8CPU, decode
 from chip8.memory import Memory
 from chip8.screen import Point, VirtualScreen
 
@@ -601,3 +601,153 @@ def test_call_and_ret():
     cpu.execute_instruction()  # call
     cpu.execute_instruction()  # ret
     assert cpu.rg_pc.read() == 0x202
+
+
+def test_unknown_opcode():
+    # 0NNN - 未対応の命令は pc を進めるだけで回数を数える
+    test_data = [0x01, 0x23]
+    memory = create_test_memory(test_data)
+    cpu = Chip8CPU(memory, VirtualScreen())
+
+    cpu.execute_instruction()
+    assert cpu.rg_pc.read() == DEFAULT_PC_ADDRESS + 2
+    assert cpu.unknown_opcode_count == 1
+
+
+def test_dispatch_table_covers_all_opcodes():
+    cpu = Chip8CPU(Memory(), VirtualScreen())
+    assert len(cpu.dispatch_table) == 0x10000
+    assert cpu.dispatch_table[0x00E0] == cpu.clear_screen
+    assert cpu.dispatch_table[0x0000] == cpu.unknown_instruction
+    assert cpu.dispatch_table[0x8AB4] == cpu.add_vy_value_to_vx
+    assert cpu.dispatch_table[0x8AB8] == cpu.unknown_instruction
+    assert cpu.dispatch_table[0xE39E] == cpu.skip_if_key_pressed
+    assert cpu.dispatch_table[0xF365] == cpu.load_vx
+
+
+def test_decode():
+    decoder = decode(0xD12F)
+    assert (decoder.x, decoder.y, decoder.n, decoder.nn, decoder.nnn()) == (0x1, 0x2, 0xF, 0x2F, 0x12F)
+    assert decoder.x_y_n() == (0x1, 0x2, 0xF)
+    # 同じ opcode の Decoder は使い回す
+    assert decode(0xD12F) is decoder
+
+
+def test_decoded_cache():
+    # 0x200: 6001: v0 := 0x01
+    # 0x202: 1200: jump 0x200
+    test_data = [0x60, 0x01, 0x12, 0x00]
+    memory = create_test_memory(test_data)
+    cpu = Chip8CPU(memory, VirtualScreen())
+
+    for _ in range(4):
+        cpu.execute_instruction()
+    assert cpu.cache_misses == 2
+    assert cpu.cache_hits == 2
+
+
+def test_self_modifying_code():
+    # 0x200: 6001: v0 := 0x01
+    # 0x202: 6102: v1 := 0x02  (FX55 で 6101 に書き換えられる)
+    # 0x204: A203: i := 0x203
+    # 0x206: F155: save v0..v1 to 0x203..0x204
+    # 0x208: 1202: jump 0x202
+    test_data = [0x60, 0x01, 0x61, 0x02, 0xA2, 0x03, 0xF1, 0x55, 0x12, 0x02]
+    memory = create_test_memory(test_data)
+    cpu = Chip8CPU(memory, VirtualScreen())
+
+    for _ in range(5):
+        cpu.execute_instruction()
+    assert memory.read(0x203) == 0x01
+    assert memory.read(0x204) == 0x02
+    # 0x202 は 6101 (v1 := 0x01) に変わっている
+    cpu.execute_instruction()
+    assert cpu.rg_vs[1].read() == 0x01
+
+
+def test_register_views():
+    memory = create_test_memory([])
+    cpu = Chip8CPU(memory, VirtualScreen())
+
+    # rg_* から書き込んだ値は registers に反映され、幅に合わせて切り詰められる
+    cpu.rg_vs[0xA].write(0x1FF)
+    cpu.rg_i.write(0x12345)
+    cpu.rg_sp.write(0x103)
+    assert cpu.v[0xA] == 0xFF
+    assert cpu.registers.i == 0x2345
+    assert cpu.registers.sp == 0x03
+
+    cpu.registers.pc = 0x300
+    cpu.v[0x1] = 0x42
+    assert cpu.rg_pc.read() == 0x300
+    assert cpu.rg_vs[0x1].read() == 0x42
+    assert str(cpu.rg_pc) == "0x0300"
+    assert str(cpu.rg_vs[0x1]) == "0x42"
+
+
+def test_00EE_empty_stack():
+    # スタックが空のときの 00EE はスタックの最後の要素を読まずにエラーにする
+    memory = create_test_memory([0x00, 0xEE])
+    cpu = Chip8CPU(memory, VirtualScreen())
+
+    with pytest.raises(IndexError, match="stack underflow"):
+        cpu.execute_instruction()
+    assert cpu.rg_sp.read() == 0
+    assert str(cpu.rg_sp) == "0x00"
+    cpu.snapshot()
+
+
+def test_2NNN_stack_overflow():
+    # 0x200: 2200: call 0x200 (17 回目でスタックがあふれる)
+    memory = create_test_memory([0x22, 0x00])
+    cpu = Chip8CPU(memory, VirtualScreen())
+
+    for _ in range(len(cpu.stack)):
+        cpu.execute_instruction()
+    with pytest.raises(IndexError, match="stack overflow"):
+        cpu.execute_instruction()
+    assert cpu.rg_sp.read() == len(cpu.stack)
+
+
+@pytest.mark.parametrize("opcode", [0xF365, 0xD013])
+def test_read_past_end_of_memory(opcode: int):
+    # FX65 と DXYN で I から読む範囲がメモリの外にはみ出す場合は、レジスタを切り詰めずにエラーにする
+    memory = create_test_memory([opcode >> 8, opcode & 0xFF])
+    cpu = Chip8CPU(memory, VirtualScreen())
+    cpu.rg_i.write(0xFFE)
+
+    with pytest.raises(IndexError):
+        cpu.execute_instruction()
+    assert len(cpu.v) == 16
+    assert not any(chain.from_iterable(cpu.screen.pixels))
+
+
+def test_FX33_past_end_of_memory():
+    memory = create_test_memory([0xF0, 0x33])
+    cpu = Chip8CPU(memory, VirtualScreen())
+    cpu.rg_i.write(0xFFF)
+
+    with pytest.raises(IndexError):
+        cpu.execute_instruction()
+    assert len(cpu.memory.memory) == 0x1000
+
+
+@pytest.mark.parametrize(
+    "data", [[0x60, 0x01], (0x60, 0x01), b"\x60\x01", bytearray(b"\x60\x01"), memoryview(b"\x60\x01")]
+)
+def test_write_bytes_accepts_byte_sequences(data):
+    memory = Memory()
+    memory.write_bytes(DEFAULT_PC_ADDRESS, data)
+    assert memory.memory[DEFAULT_PC_ADDRESS : DEFAULT_PC_ADDRESS + 3] == b"\x60\x01\x00"
+    assert len(memory.memory) == 0x1000
+
+
+def test_load_rom(tmp_path):
+    path = tmp_path / "test.ch8"
+    path.write_bytes(b"\x60\x01\x12\x00")
+    memory = Memory()
+
+    assert memory.load_rom(str(path)) == 4
+    cpu = Chip8CPU(memory, VirtualScreen())
+    cpu.execute_instruction()
+    assert cpu.rg_vs[0].read() == 0x01
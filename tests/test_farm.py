@@ -0,0 +1,84 @@
+import json
+
+from chip8.farm import FarmOptions, find_roms, run_farm, run_rom
+
+ROMS = {
+    # 0x200: 7001: v0 += 1, 0x202: 1200: jump 0x200
+    "loop.ch8": [0x70, 0x01, 0x12, 0x00],
+    # 0x200: 6005: v0 := 5, 0x202: 1202: jump 0x202
+    "halt.ch8": [0x60, 0x05, 0x12, 0x02],
+    # 0x200: F00A: v0 := キー入力
+    "key.ch8": [0xF0, 0x0A],
+    # 0x200: 0123: 未対応の命令, 0x202: 1FFE: jump 0xFFE (0x1000 の命令を読み込もうとして例外になる)
+    "sub/crash.ch8": [0x01, 0x23, 0x1F, 0xFE],
+    "large.ch8": [0] * 0x1000,
+}
+
+
+def write_roms(directory) -> None:
+    for name, data in ROMS.items():
+        path = directory / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(bytes(data))
+
+
+def test_run_rom_reasons(tmp_path):
+    write_roms(tmp_path)
+    options = FarmOptions(max_frames=5, instructions_per_frame=10, seed=1)
+
+    loop = run_rom(str(tmp_path / "loop.ch8"), options)
+    assert loop["reason"] == "budget"
+    assert loop["frames"] == 5
+    assert loop["instructions"] == 50
+    assert loop["seed"] == 1
+    assert len(loop["screen"]) == 64
+
+    halt = run_rom(str(tmp_path / "halt.ch8"), options)
+    assert halt["reason"] == "halted"
+    assert halt["frames"] == 1
+    assert halt["pc"] == 0x202
+
+    assert run_rom(str(tmp_path / "key.ch8"), options)["reason"] == "waiting_for_key"
+
+    crash = run_rom(str(tmp_path / "sub" / "crash.ch8"), options)
+    assert crash["reason"] == "crash"
+    assert crash["error"].startswith("IndexError")
+    # 0x0123 と 0xFFE の 0x0000
+    assert crash["unknown_opcodes"] == 2
+
+    large = run_rom(str(tmp_path / "large.ch8"), options)
+    assert (large["reason"], large["size"]) == ("invalid_rom", 0x1000)
+
+
+def test_run_rom_unreadable(tmp_path):
+    options = FarmOptions(max_frames=1)
+    # 存在しないファイルとディレクトリも、他の ROM と同じ形のレコードにする
+    missing = run_rom(str(tmp_path / "missing.ch8"), options)
+    assert missing == {
+        "rom": str(tmp_path / "missing.ch8"),
+        "size": None,
+        "reason": "invalid_rom",
+        "error": missing["error"],
+    }
+    assert missing["error"].startswith("FileNotFoundError")
+
+    directory = run_rom(str(tmp_path), options)
+    assert directory["reason"] == "invalid_rom"
+    assert directory["error"]
+
+
+def test_run_farm(tmp_path):
+    roms_directory = tmp_path / "roms"
+    roms_directory.mkdir()
+    write_roms(roms_directory)
+    roms = find_roms(str(roms_directory), "*.ch8")
+    assert [rom.name for rom in roms] == ["halt.ch8", "key.ch8", "large.ch8", "loop.ch8", "crash.ch8"]
+
+    output = tmp_path / "results.jsonl"
+    reasons = run_farm(roms, str(output), FarmOptions(max_instructions=100, seed=1), max_workers=2)
+    assert reasons == {"budget": 1, "halted": 1, "waiting_for_key": 1, "crash": 1, "invalid_rom": 1}
+
+    records = {record["rom"]: record for record in map(json.loads, output.read_text().splitlines())}
+    assert set(records) == {str(rom) for rom in roms}
+    assert records[str(roms_directory / "loop.ch8")]["instructions"] >= 100
+    assert records[str(roms_directory / "loop.ch8")]["size"] == 4
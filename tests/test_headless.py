@@ -0,0 +1,40 @@
+import pytest
+
+from chip8.compiler import create_engine
+from chip8.cpu import DEFAULT_PC_ADDRESS, Chip8CPU
+from chip8.headless import dump_screen, run_headless
+from chip8.memory import Memory
+from chip8.screen import VirtualScreen
+
+
+def create_cpu() -> Chip8CPU:
+    # 0x200: A206: I = 0x206
+    # 0x202: D011: (v0, v1) に 0x206 の 1 行のスプライトを描画
+    # 0x204: 1204: jump 0x204
+    # 0x206: 80
+    memory = Memory()
+    memory.write_bytes(DEFAULT_PC_ADDRESS, [0xA2, 0x06, 0xD0, 0x11, 0x12, 0x04, 0x80])
+    return Chip8CPU(memory, VirtualScreen())
+
+
+@pytest.mark.parametrize("engine_name", ["interp", "block"])
+def test_run_headless_frames(engine_name: str):
+    cpu = create_cpu()
+    result = run_headless(cpu, create_engine(cpu, engine_name), max_frames=3, instructions_per_frame=10)
+    assert result.frames == 3
+    assert result.instructions == 30
+    assert dump_screen(cpu.screen).splitlines()[0] == "#" + "." * 63
+
+
+def test_run_headless_instructions():
+    cpu = create_cpu()
+    result = run_headless(cpu, create_engine(cpu, "interp"), max_instructions=25, instructions_per_frame=10)
+    # 上限はフレームの区切りで確認する
+    assert result.instructions == 30
+    assert result.frames == 3
+
+
+def test_run_headless_requires_limit():
+    cpu = create_cpu()
+    with pytest.raises(ValueError):
+        run_headless(cpu, create_engine(cpu, "interp"))
@@ -0,0 +1,148 @@
+import threading
+import time
+
+import pytest
+
+from chip8.compiler import create_engine
+from chip8.cpu import DEFAULT_PC_ADDRESS, Chip8CPU, CPUState
+from chip8.keypad import KEY_MAP, Keypad, key_to_mask
+from chip8.memory import Memory
+from chip8.scheduler import FrameScheduler
+from chip8.screen import VirtualScreen
+
+
+def create_cpu(program: list[int]) -> Chip8CPU:
+    memory = Memory()
+    memory.write_bytes(DEFAULT_PC_ADDRESS, program)
+    return Chip8CPU(memory, VirtualScreen())
+
+
+def test_key_to_mask():
+    for key, value in KEY_MAP.items():
+        assert key_to_mask(key) == 1 << value
+    assert key_to_mask("X") == 1
+    assert key_to_mask("p") == 0
+    assert key_to_mask(None) == 0
+
+
+def test_keypad_state():
+    keypad = Keypad()
+    keypad.press(0x3)
+    keypad.press(0xF)
+    assert keypad.pressed == 0x8008
+    assert keypad.is_pressed(0xF)
+    keypad.release(0x3)
+    assert not keypad.is_pressed(0x3)
+    version = keypad.version
+    # 変わらない場合は version も増えない
+    keypad.set_state(0x8000)
+    assert keypad.version == version
+
+
+def test_press_and_release_from_threads():
+    # スレッドごとに別のキーを押したり離したりしても、他のスレッドの更新を失わない
+    keypad = Keypad()
+
+    def toggle(key: int) -> None:
+        for _ in range(2000):
+            keypad.press(key)
+            keypad.release(key)
+        keypad.press(key)
+
+    threads = [threading.Thread(target=toggle, args=(key,)) for key in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert keypad.pressed == 0xFFFF
+
+
+def test_wait_for_change():
+    keypad = Keypad()
+    version = keypad.version
+    assert not keypad.wait_for_change(version, 0.01)
+
+    timer = threading.Timer(0.01, keypad.press, (0x1,))
+    timer.start()
+    assert keypad.wait_for_change(version, 5)
+    timer.join()
+    # 待ち始める前に変わっていた場合はすぐに戻る
+    assert keypad.wait_for_change(version, 0)
+
+
+def test_EX9E_tests_key_bit():
+    # E19E: キー v1 が押されていればスキップ
+    cpu = create_cpu([0xE1, 0x9E])
+    cpu.keypad.set_state(key_to_mask("1") | key_to_mask("2"))
+    cpu.rg_vs[1].write(0x2)
+    cpu.execute_instruction()
+    assert cpu.rg_pc.read() == 0x204
+
+
+@pytest.mark.parametrize("engine_name", ["interp", "block"])
+def test_pressed_key_none_releases_keys(engine_name: str):
+    # 0x200: E19E: キー v1 が押されていればスキップ
+    # 0x202: 1200: jump 0x200
+    # 0x204: 1200: jump 0x200
+    cpu = create_cpu([0xE1, 0x9E, 0x12, 0x00, 0x12, 0x00])
+    cpu.rg_vs[1].write(0x2)
+    engine = create_engine(cpu, engine_name)
+
+    # 以前の API: 文字を渡すとそのキーだけが押され、None を渡すとすべて離される
+    engine.step("2")
+    assert cpu.keypad.pressed == key_to_mask("2")
+    engine.step()
+    engine.step(None)
+    assert cpu.keypad.pressed == 0
+    assert cpu.rg_pc.read() == 0x202
+
+    # 省略した場合は keypad を変更しない
+    cpu.keypad.press(0x2)
+    engine.step()
+    engine.step()
+    assert cpu.keypad.pressed == key_to_mask("2")
+    assert cpu.rg_pc.read() == 0x204
+
+
+def test_FX0A_waits_for_new_key():
+    # F30A: v3 := 押されたキー
+    cpu = create_cpu([0xF3, 0x0A])
+    # 待ち始める前から押されているキーは、一度離すまで入力とみなさない
+    cpu.keypad.press(0x7)
+    for _ in range(3):
+        cpu.execute_instruction()
+        assert cpu.state is CPUState.WAITING
+        assert cpu.rg_pc.read() == 0x200
+
+    cpu.keypad.set_state(0)
+    cpu.execute_instruction()
+    cpu.keypad.press(0x7)
+    cpu.execute_instruction()
+    assert cpu.state is CPUState.RUNNING
+    assert cpu.rg_vs[3].read() == 0x7
+    assert cpu.rg_pc.read() == 0x202
+
+
+def test_scheduler_wakes_on_key():
+    # 0x200: F00A: v0 := 押されたキー
+    # 0x202: 1202: jump 0x202
+    cpu = create_cpu([0xF0, 0x0A, 0x12, 0x02])
+    # 1 フレーム 10 秒なので、キー入力で起きなければテストが終わらない
+    scheduler = FrameScheduler(cpu, create_engine(cpu, "interp"), 10, frame_rate=1 / 10)
+    dt_before = cpu.rg_dt.read()
+    # キー入力待ちになったら残りの命令は実行しない
+    assert scheduler.run_frame() == 1
+    assert cpu.state is CPUState.WAITING
+    assert cpu.rg_dt.read() == dt_before
+
+    input_keypad = Keypad()
+    timer = threading.Timer(0.01, input_keypad.press, (0xA,))
+    start = time.perf_counter()
+    timer.start()
+    scheduler.wait_for_next_frame(input_keypad, input_keypad.version)
+    assert time.perf_counter() - start < 5
+    timer.join()
+
+    cpu.keypad.set_state(input_keypad.pressed)
+    assert scheduler.run_frame() == 10
+    assert cpu.rg_vs[0].read() == 0xA
@@ -0,0 +1,50 @@
+import asyncio
+import io
+import os
+
+from chip8.compiler import create_engine
+from chip8.cpu import DEFAULT_PC_ADDRESS, FONT_START_ADDRESS, Chip8CPU
+from chip8.main import AsyncFrontend
+from chip8.memory import Memory
+from chip8.scheduler import FrameScheduler
+from chip8.screen import VirtualScreen
+
+
+def create_scheduler() -> FrameScheduler:
+    # 0x200: F00A: v0 := キー入力
+    # 0x202: F029: i := font(v0)
+    # 0x204: D115: draw (v1, v1) 5 行
+    # 0x206: 1206: jump 0x206
+    memory = Memory()
+    memory.load_fonts(FONT_START_ADDRESS)
+    memory.write_bytes(DEFAULT_PC_ADDRESS, [0xF0, 0x0A, 0xF0, 0x29, 0xD1, 0x15, 0x12, 0x06])
+    cpu = Chip8CPU(memory, VirtualScreen())
+    return FrameScheduler(cpu, create_engine(cpu, "interp"), 10)
+
+
+def test_async_frontend():
+    scheduler = create_scheduler()
+    output = io.StringIO()
+    read_fd, write_fd = os.pipe()
+    frontend = AsyncFrontend(scheduler, input_fd=read_fd, output=output)
+
+    async def main() -> None:
+        loop = asyncio.get_running_loop()
+        # キー入力待ちの間に "e" (0x6) を押し、しばらくしてから ESC で終了する
+        loop.call_later(0.05, os.write, write_fd, b"e")
+        loop.call_later(0.3, os.write, write_fd, b"\x1b")
+        await frontend.run()
+
+    try:
+        asyncio.run(main())
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+
+    cpu = scheduler.cpu
+    assert cpu.v[0] == 0x6
+    assert cpu.screen.packed_rows()[1] != 0
+    assert scheduler.frame_count > 5
+    # 描画が間に合わない間のフレームはまとめて1回で描画する
+    assert 0 < frontend.render_count <= scheduler.frame_count
+    assert "█" in output.getvalue()
@@ -0,0 +1,30 @@
+from chip8.cpu import DEFAULT_PC_ADDRESS, Chip8CPU
+from chip8.memory import Memory
+from chip8.profiler import Profiler
+from chip8.screen import VirtualScreen
+
+
+def test_profiler_counts_handlers_and_pcs():
+    # 0x200: 7001: v0 += 1
+    # 0x202: 1200: jump 0x200
+    memory = Memory()
+    memory.write_bytes(DEFAULT_PC_ADDRESS, [0x70, 0x01, 0x12, 0x00])
+    cpu = Chip8CPU(memory, VirtualScreen())
+    cpu.execute_instruction()
+
+    profiler = Profiler(sample_interval=2)
+    profiler.attach(cpu)
+    for _ in range(5):
+        cpu.execute_instruction()
+    profiler.detach()
+    cpu.execute_instruction()
+
+    assert profiler.handlers["jump_to_address"].count == 3
+    assert profiler.handlers["add_value_to_vx"].count == 2
+    assert profiler.handlers["jump_to_address"].samples == 1
+    assert profiler.pc_counts[0x202] == 3
+    assert profiler.pc_counts[0x200] == 2
+    data = profiler.to_dict()
+    assert data["total"] == 5
+    assert [handler["name"] for handler in data["handlers"]] == ["jump_to_address", "add_value_to_vx"]
+    assert cpu.rg_vs[0].read() == 4
@@ -0,0 +1,25 @@
+import io
+
+from chip8.renderer import TerminalRenderer
+from chip8.screen import PackedScreen, Point
+
+
+def test_render_only_changed_rows():
+    output = io.StringIO()
+    renderer = TerminalRenderer(output, on_char="#", off_char=".")
+    screen = PackedScreen()
+
+    # 最初のフレームは全体を描画する
+    assert renderer.render(screen, ["pc: 0x200"])
+    assert output.getvalue().count("." * 64) == 32
+
+    # 何も変わっていなければ何も出力しない
+    output.seek(0)
+    output.truncate()
+    assert not renderer.render(screen, ["pc: 0x200"])
+    assert output.getvalue() == ""
+
+    # 変わった行と状態表示だけを出力する
+    screen.set_bit(Point(1, 3), True)
+    assert renderer.render(screen, ["pc: 0x202"])
+    assert output.getvalue() == "\x1b[5;1H│.#" + "." * 62 + "│" + "\x1b[35;1Hpc: 0x202\x1b[K"
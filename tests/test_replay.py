@@ -0,0 +1,56 @@
+import pytest
+
+from chip8.compiler import create_engine
+from chip8.cpu import DEFAULT_PC_ADDRESS, FONT_START_ADDRESS, Chip8CPU
+from chip8.keypad import key_to_mask
+from chip8.memory import Memory
+from chip8.replay import InputRecorder, read_input_log, replay, screen_hash
+from chip8.rng import ByteRandom
+from chip8.scheduler import FrameScheduler
+from chip8.screen import PackedScreen, VirtualScreen
+
+# 0x200: C00F: v0 := random & 0x0F
+# 0x202: F029: i := font(v0)
+# 0x204: E19E: キー v1 (= 0, "x") が押されていればスキップ
+# 0x206: 1200: jump 0x200
+# 0x208: D235: draw (v2, v3) 5 行
+# 0x20A: 7205: v2 += 5
+# 0x20C: 1200: jump 0x200
+PROGRAM = [0xC0, 0x0F, 0xF0, 0x29, 0xE1, 0x9E, 0x12, 0x00, 0xD2, 0x35, 0x72, 0x05, 0x12, 0x00]
+INSTRUCTIONS_PER_FRAME = 9
+
+
+def create_cpu(seed: int, screen=None) -> Chip8CPU:
+    memory = Memory()
+    memory.load_fonts(FONT_START_ADDRESS)
+    memory.write_bytes(DEFAULT_PC_ADDRESS, PROGRAM)
+    return Chip8CPU(memory, screen or VirtualScreen(), ByteRandom(seed))
+
+
+@pytest.mark.parametrize("engine_name", ["interp", "block"])
+def test_replay_reproduces_screen(tmp_path, engine_name: str):
+    path = str(tmp_path / "input.bin")
+    cpu = create_cpu(seed=5)
+    scheduler = FrameScheduler(cpu, create_engine(cpu, engine_name), INSTRUCTIONS_PER_FRAME)
+    recorder = InputRecorder(path, cpu.rng.seed, INSTRUCTIONS_PER_FRAME, engine_name)
+    keys = [None] * 3 + ["x"] * 10 + [None] * 5 + ["X"] * 7 + ["1"] * 2
+    for key in keys:
+        cpu.keypad.set_state(key_to_mask(key))
+        recorder.record(cpu.keypad.pressed)
+        scheduler.run_frame()
+    recorder.close()
+
+    log = read_input_log(path)
+    assert log.seed == 5
+    assert log.engine == engine_name
+    assert log.frames == len(keys)
+    # キーが変わったフレームだけを記録する
+    assert [event.frame for event in log.events] == [3, 13, 18, 25]
+
+    replayed = create_cpu(log.seed, PackedScreen())
+    # 画面の実装が違っても同じ結果になる
+    result = replay(replayed, create_engine(replayed, log.engine), log)
+    assert result.frames == len(keys)
+    assert replayed.instruction_count == cpu.instruction_count
+    assert screen_hash(replayed.screen) == screen_hash(cpu.screen)
+    assert replayed.snapshot() == cpu.snapshot()
@@ -0,0 +1,89 @@
+import pytest
+
+from chip8.compiler import create_engine
+from chip8.cpu import DEFAULT_PC_ADDRESS, FONT_START_ADDRESS, Chip8CPU
+from chip8.memory import Memory
+from chip8.rewind import RewindBuffer, apply_delta, diff_snapshots
+from chip8.scheduler import FrameScheduler
+from chip8.screen import PackedScreen
+
+# 0x200: F029: i := font(v0)
+# 0x202: D125: draw (v1, v2) 5 行
+# 0x204: A300: i := 0x300
+# 0x206: F033: bcd v0
+# 0x208: 7001: v0 += 1
+# 0x20A: 7103: v1 += 3
+# 0x20C: 1200: jump 0x200
+PROGRAM = [0xF0, 0x29, 0xD1, 0x25, 0xA3, 0x00, 0xF0, 0x33, 0x70, 0x01, 0x71, 0x03, 0x12, 0x00]
+
+
+def create_scheduler() -> FrameScheduler:
+    memory = Memory()
+    memory.load_fonts(FONT_START_ADDRESS)
+    memory.write_bytes(DEFAULT_PC_ADDRESS, PROGRAM)
+    cpu = Chip8CPU(memory, PackedScreen())
+    return FrameScheduler(cpu, create_engine(cpu, "interp"), 7)
+
+
+def record_frames(scheduler: FrameScheduler, rewind: RewindBuffer, frames: int) -> list[bytes]:
+    snapshots = []
+    for _ in range(frames):
+        scheduler.run_frame()
+        rewind.record()
+        snapshots.append(scheduler.cpu.snapshot())
+    return snapshots
+
+
+def test_diff_snapshots():
+    scheduler = create_scheduler()
+    previous = scheduler.cpu.snapshot()
+    scheduler.run_frame()
+    current = scheduler.cpu.snapshot()
+
+    delta = diff_snapshots(previous, current)
+    restored = bytearray(previous)
+    apply_delta(restored, delta)
+    assert restored == current
+    # 変わった部分だけを持つ
+    assert sum(len(data) for _, data in delta) < len(current) // 10
+    assert diff_snapshots(current, current) == ()
+
+
+def test_snapshot_at_every_retained_frame():
+    scheduler = create_scheduler()
+    rewind = RewindBuffer(scheduler.cpu, seconds=1, frame_rate=20, keyframe_interval=7)
+    snapshots = record_frames(scheduler, rewind, 50)
+
+    # 20 フレーム以上、20 + 7 フレーム未満を保持する
+    assert 20 <= len(rewind) < 27
+    assert rewind.last_frame == 49
+    for frame in range(rewind.first_frame, rewind.last_frame + 1):
+        assert rewind.snapshot_at(frame) == snapshots[frame]
+    with pytest.raises(IndexError):
+        rewind.snapshot_at(rewind.first_frame - 1)
+    # キーフレーム以外は差分だけなので、全フレームのスナップショットより小さい
+    assert rewind.nbytes < len(rewind) * len(snapshots[0]) // 3
+
+
+def test_step_back_and_continue():
+    scheduler = create_scheduler()
+    cpu = scheduler.cpu
+    rewind = RewindBuffer(cpu, keyframe_interval=4)
+    snapshots = record_frames(scheduler, rewind, 10)
+
+    assert rewind.step_back() == 8
+    assert cpu.snapshot() == snapshots[8]
+    assert rewind.step_back(3) == 5
+    assert cpu.snapshot() == snapshots[5]
+    assert rewind.last_frame == 5
+
+    # 戻った位置から記録し直しても、同じ実行をたどる
+    record_frames(scheduler, rewind, 4)
+    assert rewind.last_frame == 9
+    assert cpu.snapshot() == snapshots[9]
+    rewind.seek(2)
+    assert cpu.snapshot() == snapshots[2]
+
+    # 最も古いフレームより前には戻らない
+    assert rewind.step_back(100) == 0
+    assert cpu.snapshot() == snapshots[0]
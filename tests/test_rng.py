@@ -0,0 +1,48 @@
+from chip8.cpu import DEFAULT_PC_ADDRESS, Chip8CPU
+from chip8.memory import Memory
+from chip8.rng import BLOCK_SIZE, ByteRandom
+from chip8.screen import VirtualScreen
+
+
+def test_same_seed_same_bytes():
+    rng_a, rng_b = ByteRandom(1), ByteRandom(1)
+    values = [rng_a.next_byte() for _ in range(BLOCK_SIZE * 3)]
+    assert values == [rng_b.next_byte() for _ in range(BLOCK_SIZE * 3)]
+    assert values != [ByteRandom(2).next_byte() for _ in range(BLOCK_SIZE * 3)]
+    assert rng_a.position == BLOCK_SIZE * 3
+
+
+def test_set_state_resumes_sequence():
+    rng = ByteRandom(7)
+    values = [rng.next_byte() for _ in range(200)]
+
+    # ブロックの途中から再開しても同じ値が続く
+    resumed = ByteRandom()
+    resumed.set_state(7, 100)
+    assert [resumed.next_byte() for _ in range(100)] == values[100:]
+
+
+def test_cxnn_is_reproducible_with_snapshot():
+    # 0x200: C0FF: v0 := random
+    # 0x202: 1200: jump 0x200
+    memory = Memory()
+    memory.write_bytes(DEFAULT_PC_ADDRESS, [0xC0, 0xFF, 0x12, 0x00])
+    cpu = Chip8CPU(memory, VirtualScreen(), ByteRandom(3))
+    for _ in range(10):
+        cpu.execute_instruction()
+    data = cpu.snapshot()
+
+    values = []
+    for _ in range(10):
+        cpu.execute_instruction()
+        values.append(cpu.rg_vs[0].read())
+
+    # 乱数の状態もスナップショットに含まれる
+    restored = Chip8CPU(Memory(), VirtualScreen())
+    restored.restore(data)
+    restored_values = []
+    for _ in range(10):
+        restored.execute_instruction()
+        restored_values.append(restored.rg_vs[0].read())
+    assert restored_values == values
+    assert restored.rng.seed == 3
@@ -0,0 +1,152 @@
+import pytest
+
+from chip8.compiler import create_engine
+from chip8.cpu import DEFAULT_PC_ADDRESS, Chip8CPU
+from chip8.memory import Memory
+from chip8.rng import ByteRandom
+from chip8.scheduler import FrameScheduler
+from chip8.screen import VirtualScreen
+from chip8.tracing import RingBufferSink
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def create_scheduler(clock: FakeClock) -> FrameScheduler:
+    # 0x200: 7001: v0 += 1
+    # 0x202: 1200: jump 0x200
+    memory = Memory()
+    memory.write_bytes(DEFAULT_PC_ADDRESS, [0x70, 0x01, 0x12, 0x00])
+    cpu = Chip8CPU(memory, VirtualScreen())
+    return FrameScheduler(cpu, create_engine(cpu, "interp"), 10, clock=clock, sleep=clock.sleep)
+
+
+def test_run_frame_ticks_timers():
+    scheduler = create_scheduler(FakeClock())
+    scheduler.cpu.rg_dt.write(2)
+    scheduler.cpu.rg_st.write(1)
+
+    assert scheduler.run_frame() == 10
+    assert scheduler.cpu.rg_dt.read() == 1
+    assert scheduler.cpu.rg_st.read() == 0
+
+    scheduler.run_frame()
+    scheduler.run_frame()
+    assert scheduler.cpu.rg_dt.read() == 0
+    assert scheduler.cpu.rg_st.read() == 0
+    assert scheduler.cpu.instruction_count == 30
+
+
+def test_wait_compensates_drift():
+    clock = FakeClock()
+    scheduler = create_scheduler(clock)
+
+    # 1フレーム目の処理に 10ms かかった場合は残りの時間だけ待つ
+    clock.now += 0.010
+    scheduler.wait_for_next_frame()
+    assert abs(clock.now - 1 / 60) < 1e-9
+
+    for _ in range(59):
+        scheduler.run_frame()
+        scheduler.wait_for_next_frame()
+    assert abs(clock.now - 1.0) < 1e-9
+    assert round(scheduler.fps) == 60
+    assert round(scheduler.ips) == 590
+
+
+def create_reference(program: list[int]) -> Chip8CPU:
+    memory = Memory()
+    memory.write_bytes(DEFAULT_PC_ADDRESS, program)
+    return Chip8CPU(memory, VirtualScreen(), ByteRandom(0))
+
+
+def create_reference_scheduler(program: list[int], engine_name: str, instructions_per_frame: int) -> FrameScheduler:
+    # アイドルループを飛ばさずにすべての命令を実行する
+    cpu = create_reference(program)
+    cpu.skip_idle_loop = lambda max_instructions: 0  # type: ignore[method-assign]
+    return FrameScheduler(cpu, create_engine(cpu, engine_name), instructions_per_frame)
+
+
+@pytest.mark.parametrize("engine_name", ["interp", "block"])
+def test_skip_jump_to_self(engine_name: str):
+    # 0x200: 6005: v0 := 5
+    # 0x202: 1202: jump 0x202
+    program = [0x60, 0x05, 0x12, 0x02]
+    cpu = create_reference(program)
+    scheduler = FrameScheduler(cpu, create_engine(cpu, engine_name), 100)
+    for _ in range(3):
+        assert scheduler.run_frame() == 100
+    assert cpu.skipped_instruction_count > 250
+
+    reference = create_reference_scheduler(program, engine_name, 100)
+    for _ in range(3):
+        reference.run_frame()
+    assert cpu.instruction_count == reference.cpu.instruction_count
+    assert cpu.snapshot() == reference.cpu.snapshot()
+
+
+def test_skipped_instructions_are_not_cache_hits():
+    # 0x200: 6005: v0 := 5
+    # 0x202: 1202: jump 0x202
+    cpu = create_reference([0x60, 0x05, 0x12, 0x02])
+    executed = 0
+    execute_instruction = cpu.execute_instruction
+
+    def counting_execute_instruction(*args: object) -> None:
+        nonlocal executed
+        executed += 1
+        execute_instruction(*args)
+
+    cpu.execute_instruction = counting_execute_instruction  # type: ignore[method-assign]
+    scheduler = FrameScheduler(cpu, create_engine(cpu, "interp"), 100)
+    for _ in range(100):
+        scheduler.run_frame()
+
+    assert cpu.instruction_count == 10000
+    assert cpu.skipped_instruction_count > 9000
+    assert cpu.cache_hits + cpu.cache_misses == executed
+    assert cpu.cache_misses == 2
+
+
+@pytest.mark.parametrize("engine_name", ["interp", "block"])
+@pytest.mark.parametrize("instructions_per_frame", [9, 10, 11])
+def test_skip_timer_wait_loop(engine_name: str, instructions_per_frame: int):
+    # 0x200: 6004: v0 := 4
+    # 0x202: F015: dt := v0
+    # 0x204: F107: v1 := dt
+    # 0x206: 3100: v1 == 0 ならスキップ
+    # 0x208: 1204: jump 0x204
+    # 0x20A: 7201: v2 += 1
+    # 0x20C: 1202: jump 0x202
+    program = [0x60, 0x04, 0xF0, 0x15, 0xF1, 0x07, 0x31, 0x00, 0x12, 0x04, 0x72, 0x01, 0x12, 0x02]
+    cpu = create_reference(program)
+    scheduler = FrameScheduler(cpu, create_engine(cpu, engine_name), instructions_per_frame)
+    reference = create_reference_scheduler(program, engine_name, instructions_per_frame)
+    for _ in range(20):
+        assert scheduler.run_frame() == reference.run_frame()
+        # タイマーから見える状態はフレームごとに飛ばさない場合と同じ
+        assert cpu.snapshot() == reference.cpu.snapshot()
+    assert cpu.instruction_count == reference.cpu.instruction_count
+    assert cpu.skipped_instruction_count > 0
+    assert cpu.v[2] > 0
+
+
+def test_tracing_disables_skip():
+    cpu = create_reference([0x12, 0x00])
+    sink = RingBufferSink()
+    cpu.set_tracer(sink)
+    scheduler = FrameScheduler(cpu, create_engine(cpu, "interp"), 10)
+    scheduler.run_frame()
+    # 記録する場合はすべての命令を実際に実行する
+    assert cpu.skipped_instruction_count == 0
+    assert len(sink.records()) == 10
@@ -0,0 +1,116 @@
+import random
+
+import pytest
+
+from chip8.screen import PackedScreen, Point, Screen, VirtualScreen, bytes_to_sprite
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_packed_screen_matches_virtual_screen(seed: int):
+    rng = random.Random(seed)
+    virtual_screen = VirtualScreen()
+    packed_screen = PackedScreen()
+
+    for _ in range(50):
+        # 画面端での折り返しも含めてランダムに描画する
+        point = Point(rng.randrange(0x100), rng.randrange(0x100))
+        sprite = bytes_to_sprite([rng.randrange(0x100) for _ in range(rng.randrange(1, 16))])
+        expected = virtual_screen.draw_sprite(point, sprite)
+        assert packed_screen.draw_sprite(point, sprite) == expected
+        assert packed_screen.pixels == virtual_screen.pixels
+    assert packed_screen.packed_rows() == virtual_screen.packed_rows()
+
+
+def test_packed_screen_bits():
+    screen = PackedScreen()
+    screen.set_bit(Point(0, 0), True)
+    screen.set_bit(Point(63, 31), True)
+    assert screen.get_pixel(Point(0, 0))
+    assert screen.get_pixel(Point(63, 31))
+    assert screen.packed_rows()[0] == 1 << 63
+    assert screen.packed_rows()[31] == 1
+
+    screen.xor_bit(Point(0, 0), True)
+    screen.set_bit(Point(63, 31), False)
+    assert screen.packed_rows() == [0] * 32
+
+    screen.set_bit(Point(1, 1), True)
+    screen.clear()
+    assert not screen.get_pixel(Point(1, 1))
+
+
+@pytest.mark.parametrize("screen_class", [VirtualScreen, PackedScreen])
+def test_draw_bytes_matches_draw_sprite(screen_class):
+    rng = random.Random(0)
+    sprite_screen = screen_class()
+    bytes_screen = screen_class()
+
+    for _ in range(50):
+        x, y = rng.randrange(0x100), rng.randrange(0x100)
+        data = bytes(rng.randrange(0x100) for _ in range(rng.randrange(1, 16)))
+        expected = sprite_screen.draw_sprite(Point(x, y), bytes_to_sprite(list(data)))
+        assert bytes_screen.draw_bytes(x, y, memoryview(data)) == expected
+        assert bytes_screen.pixels == sprite_screen.pixels
+
+
+def test_numpy_screen_matches_virtual_screen():
+    pytest.importorskip("numpy")
+    from chip8.numpy_screen import NumpyScreen
+
+    rng = random.Random(0)
+    virtual_screen = VirtualScreen()
+    numpy_screen = NumpyScreen()
+    buffer = numpy_screen.buffer
+
+    for _ in range(50):
+        x, y = rng.randrange(0x100), rng.randrange(0x100)
+        data = bytes(rng.randrange(0x100) for _ in range(rng.randrange(1, 16)))
+        assert numpy_screen.draw_bytes(x, y, data) == virtual_screen.draw_bytes(x, y, data)
+        assert numpy_screen.pixels == virtual_screen.pixels
+    assert numpy_screen.packed_rows() == virtual_screen.packed_rows()
+
+    # clear しても同じ配列を使い続ける
+    numpy_screen.clear()
+    assert numpy_screen.buffer is buffer
+    assert not buffer.any()
+
+    # load_packed_rows も同じ配列に書き込む
+    rows = virtual_screen.packed_rows()
+    numpy_screen.load_packed_rows(rows)
+    assert numpy_screen.buffer is buffer
+    assert numpy_screen.pixels == virtual_screen.pixels
+
+
+def test_numpy_screen_array_protocol():
+    np = pytest.importorskip("numpy")
+    from chip8.numpy_screen import NumpyScreen
+
+    screen = NumpyScreen()
+    screen.set_bit(Point(3, 1), True)
+    buffer = screen.buffer
+
+    # 型が同じならコピーせずに配列そのものを返し、copy=True のときだけコピーする
+    assert np.asarray(screen) is buffer
+    assert np.asarray(screen, dtype=np.uint8, copy=False) is buffer
+    copied = np.array(screen, copy=True)
+    assert copied is not buffer
+    assert np.array_equal(copied, buffer)
+
+    # 型の変換はコピーになるので、copy=False ならエラーにする
+    converted = np.asarray(screen, dtype=bool)
+    assert converted.dtype == bool
+    assert converted[1, 3]
+    with pytest.raises(ValueError):
+        np.asarray(screen, dtype=bool, copy=False)
+
+
+@pytest.mark.parametrize("screen_class", [VirtualScreen, PackedScreen])
+def test_load_packed_rows(screen_class):
+    rng = random.Random(0)
+    rows = [rng.getrandbits(64) for _ in range(Screen.HEIGHT)]
+    rows[0] = 1 << 63
+    screen = screen_class()
+    screen.load_packed_rows(rows)
+    assert screen.packed_rows() == rows
+    assert screen.get_pixel(Point(0, 0))
+    assert not screen.get_pixel(Point(1, 0))
@@ -0,0 +1,91 @@
+import multiprocessing
+
+import pytest
+
+from chip8.screen import VirtualScreen
+from chip8.shared_screen import (
+    COUNTER_FORMAT,
+    SEGMENT_SIZE,
+    SEQUENCE_OFFSET,
+    SharedScreenReader,
+    SharedScreenWriter,
+)
+
+
+def create_screen() -> VirtualScreen:
+    screen = VirtualScreen()
+    screen.draw_bytes(60, 30, b"\xf0\x90\xf0")
+    return screen
+
+
+@pytest.mark.parametrize("use_file", [False, True])
+def test_publish_and_read(tmp_path, use_file: bool):
+    writer = SharedScreenWriter(path=str(tmp_path / "screen.bin")) if use_file else SharedScreenWriter()
+    reader = SharedScreenReader(path=writer.name) if use_file else SharedScreenReader(name=writer.name)
+    try:
+        # まだ1フレームも書き出していない
+        assert reader.read() is None
+
+        screen = create_screen()
+        assert writer.publish(screen) == 1
+        frame = reader.read()
+        assert frame is not None
+        assert frame.number == 1
+        assert list(frame.rows) == screen.packed_rows()
+
+        screen.clear()
+        writer.publish(screen)
+        frame = reader.read()
+        assert frame is not None
+        assert frame.number == 2
+        assert not any(frame.rows)
+        assert not reader.closed
+    finally:
+        writer.close()
+    assert reader.closed
+    reader.close()
+
+
+def test_read_while_writing():
+    writer = SharedScreenWriter()
+    reader = SharedScreenReader(name=writer.name)
+    try:
+        writer.publish(create_screen())
+        # 書き込み中 (シーケンス番号が奇数) の間は読まない
+        COUNTER_FORMAT.pack_into(writer._buffer, SEQUENCE_OFFSET, 3)
+        assert reader.read(retries=2) is None
+        COUNTER_FORMAT.pack_into(writer._buffer, SEQUENCE_OFFSET, 4)
+        assert reader.read() is not None
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_invalid_segment(tmp_path):
+    path = tmp_path / "screen.bin"
+    path.write_bytes(bytes(SEGMENT_SIZE))
+    with pytest.raises(ValueError):
+        SharedScreenReader(path=str(path))
+
+
+def read_in_child(name: str, queue) -> None:
+    reader = SharedScreenReader(name=name)
+    frame = reader.read()
+    queue.put(None if frame is None else (frame.number, list(frame.rows)))
+    reader.close()
+
+
+def test_read_from_other_process():
+    writer = SharedScreenWriter()
+    try:
+        screen = create_screen()
+        writer.publish(screen)
+        context = multiprocessing.get_context("spawn")
+        queue = context.Queue()
+        process = context.Process(target=read_in_child, args=(writer.name, queue))
+        process.start()
+        assert queue.get(timeout=30) == (1, screen.packed_rows())
+        process.join(timeout=30)
+        assert process.exitcode == 0
+    finally:
+        writer.close()
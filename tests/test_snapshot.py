@@ -0,0 +1,88 @@
+import pytest
+
+from chip8.compiler import create_engine
+from chip8.cpu import DEFAULT_PC_ADDRESS, FONT_START_ADDRESS, SNAPSHOT_FORMAT, Chip8CPU, CPUState
+from chip8.memory import Memory
+from chip8.screen import PackedScreen, Screen, VirtualScreen
+
+# 0x200: 6005: v0 := 5
+# 0x202: 610A: v1 := 10
+# 0x204: F015: dt := v0
+# 0x206: F118: st := v1
+# 0x208: F029: i := font(v0)
+# 0x20A: D015: draw (v0, v1) 5 行
+# 0x20C: 2212: call 0x212
+# 0x20E: 7001: v0 += 1
+# 0x210: 1208: jump 0x208
+# 0x212: 7102: v1 += 2
+# 0x214: 00EE: return
+PROGRAM = [0x60, 0x05, 0x61, 0x0A, 0xF0, 0x15, 0xF1, 0x18, 0xF0, 0x29, 0xD0, 0x15, 0x22, 0x12, 0x70, 0x01, 0x12, 0x08]
+PROGRAM += [0x71, 0x02, 0x00, 0xEE]
+
+
+def create_cpu(screen: Screen | None = None) -> Chip8CPU:
+    memory = Memory()
+    memory.load_fonts(FONT_START_ADDRESS)
+    memory.write_bytes(DEFAULT_PC_ADDRESS, PROGRAM)
+    return Chip8CPU(memory, screen or VirtualScreen())
+
+
+def run(cpu: Chip8CPU, instructions: int) -> None:
+    for count in range(instructions):
+        cpu.execute_instruction()
+        if count % 10 == 0:
+            cpu.tick_timers()
+
+
+def test_snapshot_round_trip():
+    cpu = create_cpu()
+    run(cpu, 57)
+    data = cpu.snapshot()
+    assert len(data) == SNAPSHOT_FORMAT.size
+
+    restored = create_cpu(PackedScreen())
+    restored.restore(data)
+    assert restored.snapshot() == data
+    assert str(restored) == str(cpu)
+    assert restored.screen.pixels == cpu.screen.pixels
+    assert restored.memory.memory == cpu.memory.memory
+
+    # 復元した CPU は元の CPU と同じように実行が続く
+    run(cpu, 100)
+    run(restored, 100)
+    assert restored.snapshot() == cpu.snapshot()
+
+
+def test_restore_rewinds_state():
+    cpu = create_cpu()
+    engine = create_engine(cpu, "block")
+    for _ in range(20):
+        engine.step()
+    data = cpu.snapshot()
+
+    cpu.memory.write(0x20F, 0x02)  # 7001 -> 7002
+    cpu.state = CPUState.WAITING
+    for _ in range(20):
+        engine.step()
+    assert cpu.snapshot() != data
+
+    cpu.restore(data)
+    assert cpu.snapshot() == data
+    # メモリを書き戻したのでコンパイル済みのブロックも作り直され、書き換え前のプログラムを実行する
+    executed = sum(engine.step() for _ in range(20))
+    expected = create_cpu()
+    expected.restore(data)
+    for _ in range(executed):
+        expected.execute_instruction()
+    assert cpu.snapshot() == expected.snapshot()
+
+
+def test_restore_rejects_invalid_data():
+    cpu = create_cpu()
+    data = cpu.snapshot()
+    with pytest.raises(ValueError):
+        cpu.restore(data[:-1])
+    with pytest.raises(ValueError):
+        cpu.restore(b"XXXX" + data[4:])
+    with pytest.raises(ValueError):
+        cpu.restore(data[:4] + bytes([0xFF]) + data[5:])
@@ -0,0 +1,77 @@
+import io
+
+from chip8.cpu import DEFAULT_PC_ADDRESS, Chip8CPU
+from chip8.memory import Memory
+from chip8.screen import VirtualScreen
+from chip8.tracing import BinaryFileSink, RingBufferSink, TextSink, create_sink, read_trace
+
+
+def create_cpu() -> Chip8CPU:
+    # 0x200: 7001: v0 += 1
+    # 0x202: 1200: jump 0x200
+    memory = Memory()
+    memory.write_bytes(DEFAULT_PC_ADDRESS, [0x70, 0x01, 0x12, 0x00])
+    return Chip8CPU(memory, VirtualScreen())
+
+
+def test_ring_buffer_keeps_latest_records():
+    cpu = create_cpu()
+    sink = RingBufferSink(capacity=3)
+    cpu.set_tracer(sink)
+    for _ in range(6):
+        cpu.execute_instruction()
+
+    records = sink.records()
+    assert [(record.pc, record.opcode) for record in records] == [(0x202, 0x1200), (0x200, 0x7001), (0x202, 0x1200)]
+    # 命令を実行する前の状態を記録する
+    assert records[1].vs[0] == 0x02
+    assert records[2].vs[0] == 0x03
+
+
+def test_set_tracer_none_restores_untraced_loop():
+    cpu = create_cpu()
+    sink = RingBufferSink(capacity=3)
+    cpu.set_tracer(sink)
+    cpu.set_tracer(None)
+    cpu.execute_instruction()
+    assert "execute_instruction" not in vars(cpu)
+    assert sink.records() == []
+
+
+def test_binary_file_round_trip(tmp_path):
+    path = str(tmp_path / "trace.bin")
+    cpu = create_cpu()
+    sink = BinaryFileSink(path)
+    cpu.set_tracer(sink)
+    for _ in range(4):
+        cpu.execute_instruction()
+    sink.close()
+
+    records = list(read_trace(path))
+    assert len(records) == 4
+    assert records[2].pc == 0x200
+    assert records[2].vs[0] == 0x01
+
+
+def test_text_sink_closes_own_file(tmp_path):
+    path = tmp_path / "trace.txt"
+    cpu = create_cpu()
+    sink = create_sink("text", str(path))
+    assert isinstance(sink, TextSink)
+    cpu.set_tracer(sink)
+    for _ in range(2):
+        cpu.execute_instruction()
+    sink.close()
+
+    assert sink.output.closed
+    assert path.read_text().splitlines()[1].startswith("pc=0202 op=1200")
+
+
+def test_text_sink_leaves_stream_open():
+    output = io.StringIO()
+    sink = TextSink(output)
+    sink.write(0x200, 0x7001, 0, bytes(16))
+    sink.close()
+
+    assert not output.closed
+    assert output.getvalue().startswith("pc=0200 op=7001")